@@ -0,0 +1,345 @@
+"""
+Durable Alert Outbox
+SQLite (WAL) outbox for SMS alerts: detection code only inserts a row, a
+background sender delivers it with exponential backoff and dead-letters
+messages that keep failing; anything unsent is replayed after a restart
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+DEAD = 'dead'
+STATES = (PENDING, SENDING, SENT, DEAD)
+
+# Twilio errors that will fail the same way on every retry
+# (invalid / unverified number, auth failure, unsubscribed recipient, not a mobile number)
+PERMANENT_ERROR_CODES = {21211, 20003, 21608, 21610, 21614}
+
+
+class PermanentSendError(Exception):
+    """Raised by a sender when retrying cannot help; the message is dead-lettered at once"""
+
+
+class AlertOutbox:
+    """
+    Persistent queue of outgoing SMS messages, one row per contact
+
+    enqueue() is a single INSERT into a WAL database (no network, no fsync
+    per commit), so it is safe to call from a frame loop, and the message
+    survives a crash as soon as it returns. Each row has an idempotency key:
+    enqueueing the same key twice is a no-op, and the key is handed to the
+    sender so an endpoint that supports it can drop duplicate deliveries.
+
+    The sender thread claims due rows (state 'sending'), calls
+    sender(message) on a small thread pool and marks each row 'sent', or
+    schedules a retry after base_delay * 2^(attempts-1) seconds (+-20%
+    jitter, capped at max_delay). After max_attempts failures, or on a
+    PermanentSendError, the row moves to 'dead'. Rows left in 'sending' by
+    a crash are put back to 'pending' by start(), so delivery is
+    at-least-once.
+    """
+
+    def __init__(self, path='runs/alerts/outbox.sqlite', sender=None, max_attempts=6,
+                 base_delay=2.0, max_delay=300.0, workers=4, batch_size=32,
+                 poll_interval=1.0, on_sent=None, timeout=30.0):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            sender: Callable(message dict) returning the provider message SID;
+                    raises on failure (PermanentSendError to skip retries)
+            max_attempts: Send attempts before a message is dead-lettered
+            base_delay: Seconds before the first retry
+            max_delay: Upper bound for the retry delay
+            workers: Messages sent in parallel
+            batch_size: Messages claimed per sender pass
+            poll_interval: Seconds between checks for due retries
+            on_sent: Optional callback(message dict with 'message_sid') after delivery
+            timeout: Seconds to wait for another process holding the write lock
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sender = sender
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.on_sent = on_sent
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'idempotency_key TEXT NOT NULL UNIQUE, '
+            'contact TEXT, phone TEXT NOT NULL, body TEXT NOT NULL, details TEXT, '
+            'state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'next_attempt REAL NOT NULL, created REAL NOT NULL, updated REAL NOT NULL, '
+            'message_sid TEXT, last_error TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(state, next_attempt)')
+
+    def _transaction(self, statements):
+        """Run (sql, params) pairs in one write transaction; returns the last cursor"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = None
+                for sql, params in statements:
+                    cursor = self._conn.execute(sql, params)
+                self._conn.execute('COMMIT')
+                return cursor
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def enqueue(self, contacts, body, alert_key=None, details=None):
+        """
+        Store one alert for delivery to every contact
+
+        Args:
+            contacts: List of (name, phone) tuples
+            body: Message text
+            alert_key: Idempotency key for the alert (e.g. "cam1:event-7");
+                       random if None. Each contact's key is "<alert_key>:<phone>"
+            details: Optional JSON-serializable dict kept with the message
+
+        Returns:
+            Number of messages added (0 if the alert was already queued)
+        """
+        alert_key = alert_key or uuid.uuid4().hex
+        details = json.dumps(details) if details is not None else None
+        now = time.time()
+        added = 0
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for name, phone in contacts:
+                    cursor = self._conn.execute(
+                        'INSERT OR IGNORE INTO outbox (idempotency_key, contact, phone, body, details, '
+                        'state, next_attempt, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (f"{alert_key}:{phone}", name, phone, body, details, PENDING, now, now, now)
+                    )
+                    added += cursor.rowcount
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        if added:
+            self._wake.set()
+        return added
+
+    def _claim(self):
+        """Mark up to batch_size due messages as 'sending' and return them"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT * FROM outbox WHERE state = ? AND next_attempt <= ? '
+                    'ORDER BY next_attempt LIMIT ?', (PENDING, now, self.batch_size)
+                ).fetchall()
+                self._conn.executemany('UPDATE outbox SET state = ?, updated = ? WHERE id = ?',
+                                       [(SENDING, now, row['id']) for row in rows])
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [dict(row) for row in rows]
+
+    def retry_delay(self, attempts):
+        """Backoff before retry number attempts (1-based), with +-20% jitter"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _deliver(self, message):
+        """Send one claimed message and record the outcome"""
+        attempts = message['attempts'] + 1
+        try:
+            sid = self.sender(message)
+        except Exception as e:
+            now = time.time()
+            permanent = isinstance(e, PermanentSendError)
+            if permanent or attempts >= self.max_attempts:
+                self._transaction([(
+                    'UPDATE outbox SET state = ?, attempts = ?, updated = ?, last_error = ? WHERE id = ?',
+                    (DEAD, attempts, now, str(e), message['id'])
+                )])
+                print(f"[Outbox] Dead-lettered message {message['id']} to {message['phone']} "
+                      f"after {attempts} attempt(s): {e}")
+            else:
+                delay = self.retry_delay(attempts)
+                self._transaction([(
+                    'UPDATE outbox SET state = ?, attempts = ?, next_attempt = ?, updated = ?, '
+                    'last_error = ? WHERE id = ?',
+                    (PENDING, attempts, now + delay, now, str(e), message['id'])
+                )])
+                print(f"[Outbox] Send to {message['phone']} failed ({e}), retry {attempts} in {delay:.1f}s")
+            return False
+
+        self._transaction([(
+            'UPDATE outbox SET state = ?, attempts = ?, updated = ?, message_sid = ?, '
+            'last_error = NULL WHERE id = ?',
+            (SENT, attempts, time.time(), sid, message['id'])
+        )])
+        if self.on_sent is not None:
+            self.on_sent({**message, 'attempts': attempts, 'message_sid': sid})
+        return True
+
+    def drain_once(self):
+        """
+        One sender pass: send every message that is due now
+
+        Returns:
+            Number of messages delivered
+        """
+        delivered = 0
+        while True:
+            batch = self._claim()
+            if not batch:
+                return delivered
+            if self._executor is not None and len(batch) > 1:
+                delivered += sum(self._executor.map(self._deliver, batch))
+            else:
+                delivered += sum(self._deliver(message) for message in batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.drain_once()
+            except Exception as e:
+                print(f"[Outbox] Sender error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def recover(self):
+        """Put messages left in 'sending' by a crash back in the queue; returns how many"""
+        cursor = self._transaction([(
+            'UPDATE outbox SET state = ?, next_attempt = ?, updated = ? WHERE state = ?',
+            (PENDING, time.time(), time.time(), SENDING)
+        )])
+        return cursor.rowcount
+
+    def start(self):
+        """Replay interrupted messages and start the background sender"""
+        if self.sender is None:
+            raise ValueError("AlertOutbox needs a sender to start")
+        if self._thread is not None:
+            return
+        replayed = self.recover()
+        pending = self.counts()[PENDING]
+        if pending:
+            print(f"[Outbox] {pending} pending message(s) to send"
+                  f"{f' ({replayed} interrupted by a restart)' if replayed else ''}")
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers),
+                                            thread_name_prefix='outbox-send')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Stop the sender after the current pass; unsent messages stay in the database"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+        self._executor.shutdown(wait=True)
+        self._thread = None
+        self._executor = None
+
+    def flush(self, timeout=30.0):
+        """Wait until nothing is pending or sending (retries scheduled later count as pending)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            counts = self.counts()
+            if not counts[PENDING] and not counts[SENDING]:
+                return True
+            self._wake.set()
+            time.sleep(0.05)
+        return False
+
+    def counts(self):
+        """Number of messages in each state"""
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM outbox GROUP BY state').fetchall()
+        counts = {state: 0 for state in STATES}
+        counts.update({state: n for state, n in rows})
+        return counts
+
+    def messages(self, state=None, limit=100):
+        """Most recent messages (optionally in one state) as dicts"""
+        with self._lock:
+            if state is None:
+                rows = self._conn.execute('SELECT * FROM outbox ORDER BY id DESC LIMIT ?',
+                                          (limit,)).fetchall()
+            else:
+                rows = self._conn.execute('SELECT * FROM outbox WHERE state = ? ORDER BY id DESC LIMIT ?',
+                                          (state, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_dead(self):
+        """Give dead-lettered messages a fresh set of attempts; returns how many"""
+        now = time.time()
+        cursor = self._transaction([(
+            'UPDATE outbox SET state = ?, attempts = 0, next_attempt = ?, updated = ? WHERE state = ?',
+            (PENDING, now, now, DEAD)
+        )])
+        self._wake.set()
+        return cursor.rowcount
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+
+def http_sender(url, timeout=10.0):
+    """
+    Sender that POSTs each message as JSON to an SMS gateway / local test endpoint
+
+    The endpoint receives {"to", "body", "idempotency_key"} (the key is also
+    sent as an Idempotency-Key header) and answers with JSON containing "sid".
+    4xx responses are permanent failures; 5xx, timeouts and connection
+    errors are retried.
+
+    Args:
+        url: Endpoint URL
+        timeout: Seconds per request
+    """
+    def send(message):
+        payload = json.dumps({'to': message['phone'], 'body': message['body'],
+                              'idempotency_key': message['idempotency_key']}).encode()
+        request = urllib.request.Request(url, data=payload, method='POST', headers={
+            'Content-Type': 'application/json',
+            'Idempotency-Key': message['idempotency_key']
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read()).get('sid')
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500:
+                raise PermanentSendError(f"HTTP {e.code}: {e.read().decode(errors='replace')[:200]}")
+            raise
+    return send
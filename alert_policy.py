@@ -0,0 +1,229 @@
+"""
+Alert Deduplication and Escalation Policy
+Decides which accident events become SMS alerts: duplicates per source and
+event (or of a recent alert on the same source) are suppressed within a time
+window, rising severity escalates at once, and alerts arriving in a burst are
+batched into one message
+"""
+
+import time
+from collections import OrderedDict
+
+# Classes that alert on their own; moderate only matters as the start of an escalation
+ALERT_CLASSES = ('severe', 'fire')
+
+
+class AlertPolicy:
+    """
+    Alert gate keyed by (source, event)
+
+    Each key keeps a constant amount of state: the alertable classes it was
+    last alerted for, whether it was seen as moderate, and the last alert
+    and sighting times. Keys live in an OrderedDict ordered by last
+    sighting, so keys idle for longer than idle_timeout are dropped from
+    the front in amortized O(1) per observation.
+
+    A tracker gives an accident a new event id when it loses the track and
+    picks it up again. So each source also remembers when it last alerted
+    each class, and a new event seen as a class its source alerted for
+    within the window takes over that alert state instead of alerting as
+    'new'.
+
+    observe() returns:
+      - 'new':        first severe / fire sighting of the key
+      - 'escalation': a class the key was not alerted for yet (moderate ->
+                      severe, or fire appears); sent immediately
+      - 'reminder':   the key is still active after window seconds
+      - nothing:      duplicate within the window (counted as suppressed)
+
+    Alerts are sent right away unless another message went out less than
+    batch_window seconds ago; then they wait and leave together (at most
+    max_batch events per message) when poll() finds the batch window over.
+    """
+
+    def __init__(self, window=300.0, batch_window=10.0, max_batch=10, alert_classes=ALERT_CLASSES,
+                 idle_timeout=None, clock=time.monotonic):
+        """
+        Args:
+            window: Seconds during which the same source/event (or the same class
+                    on a source, for a new event id) is not alerted again
+            batch_window: Minimum seconds between two messages (later alerts are batched)
+            max_batch: Most events combined into one message (a full batch is sent at once)
+            alert_classes: Classes that trigger alerts
+            idle_timeout: Seconds without a sighting before a key's state is dropped
+                          (defaults to window)
+            clock: Time source (seconds)
+        """
+        self.window = window
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.alert_classes = set(alert_classes)
+        self.idle_timeout = window if idle_timeout is None else idle_timeout
+        self.clock = clock
+
+        self._keys = OrderedDict()
+        self._source_alerts = {}  # source -> {class: last alert time}
+        self._pending = []
+        self._last_message = None
+        self.suppressed = 0
+        self.escalations = 0
+        self.messages = 0
+        self.events_alerted = 0
+
+    def _expire(self, now):
+        """Drop keys that have not been seen for idle_timeout seconds (oldest first)"""
+        while self._keys:
+            key, state = next(iter(self._keys.items()))
+            if now - state['last_seen'] < self.idle_timeout:
+                break
+            del self._keys[key]
+
+    def observe(self, source, event_id=None, classes=(), now=None, details=None):
+        """
+        Report a sighting of an accident event
+
+        Args:
+            source: Camera / video name
+            event_id: Tracker event id (None treats the whole source as one event)
+            classes: Class names the event has been seen as (e.g. track.class_counts)
+            now: Current time (defaults to clock())
+            details: Optional dict passed through to the alert (counts, frame, ...)
+
+        Returns:
+            Alert dict to send now (see _flush), or None
+        """
+        now = self.clock() if now is None else now
+        key = (str(source), event_id)
+        classes = set(classes)
+        state = self._keys.get(key)
+        if state is None:
+            state = {'alerted': frozenset(), 'moderate': False, 'last_alert': None, 'last_seen': now}
+            self._keys[key] = state
+        else:
+            self._keys.move_to_end(key)
+            state['last_seen'] = now
+        self._expire(now)
+
+        state['moderate'] = state['moderate'] or 'moderate' in classes
+        alertable = frozenset(classes & self.alert_classes)
+        if not alertable:
+            return self.poll(now)
+
+        if state['last_alert'] is None:
+            recent = {cls: t for cls, t in self._source_alerts.get(key[0], {}).items()
+                      if now - t < self.window}
+            if alertable & recent.keys():
+                # Likely the same accident re-acquired under a new event id
+                state['alerted'] = frozenset(recent)
+                state['last_alert'] = min(recent[cls] for cls in alertable & recent.keys())
+
+        if not alertable <= state['alerted']:
+            # Escalation when the event was already alerted or seen as moderate
+            reason = 'escalation' if state['alerted'] or state['moderate'] else 'new'
+        elif now - state['last_alert'] >= self.window:
+            reason = 'reminder'
+        else:
+            self.suppressed += 1
+            return self.poll(now)
+
+        previous = state['alerted']
+        state['alerted'] = previous | alertable
+        state['last_alert'] = now
+        self._source_alerts.setdefault(key[0], {}).update(dict.fromkeys(alertable, now))
+        if reason == 'escalation':
+            self.escalations += 1
+        self._pending.append({
+            'source': key[0],
+            'event_id': event_id,
+            'classes': sorted(state['alerted']),
+            'new_classes': sorted(alertable - previous),
+            'reason': reason,
+            'time': now,
+            'details': details
+        })
+        urgent = reason == 'escalation' or len(self._pending) >= self.max_batch
+        if urgent or self._last_message is None or now - self._last_message >= self.batch_window:
+            return self._flush(now)
+        return None
+
+    def poll(self, now=None):
+        """Send the waiting batch once batch_window has passed; returns an alert dict or None"""
+        now = self.clock() if now is None else now
+        if self._pending and (self._last_message is None or now - self._last_message >= self.batch_window):
+            return self._flush(now)
+        return None
+
+    def flush(self, now=None):
+        """Send the waiting batch now, ignoring batch_window (e.g. when a video run ends)"""
+        now = self.clock() if now is None else now
+        if self._pending:
+            return self._flush(now)
+        return None
+
+    def _flush(self, now):
+        """
+        Combine waiting events into one alert
+
+        Returns:
+            Dict with 'id' (message number), 'events' (list of event entries),
+            'sources', 'classes' (all alertable classes involved), 'escalation'
+            and 'time'
+        """
+        events, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        self._last_message = now
+        self.messages += 1
+        self.events_alerted += len(events)
+        return {
+            'id': self.messages,
+            'time': now,
+            'events': events,
+            'sources': list(dict.fromkeys(e['source'] for e in events)),
+            'classes': sorted({c for e in events for c in e['classes']}),
+            'escalation': any(e['reason'] == 'escalation' for e in events)
+        }
+
+    def pending(self):
+        """Number of events waiting for the next batch"""
+        return len(self._pending)
+
+    def active_keys(self):
+        """Number of (source, event) keys currently tracked"""
+        return len(self._keys)
+
+    def stats(self):
+        return {
+            'messages': self.messages,
+            'events_alerted': self.events_alerted,
+            'escalations': self.escalations,
+            'suppressed': self.suppressed,
+            'pending': len(self._pending),
+            'active_keys': len(self._keys)
+        }
+
+
+def format_alert(alert, max_sources=3):
+    """
+    Short SMS text for an alert from AlertPolicy
+
+    Args:
+        alert: Alert dict returned by observe() / poll()
+        max_sources: Sources listed by name before "+N more"
+
+    Returns:
+        Message string
+    """
+    events = alert['events']
+    prefix = "🚨 ESCALATION: " if alert['escalation'] else "🚨 "
+    if len(events) == 1:
+        event = events[0]
+        what = ' + '.join(c.upper() for c in event['classes'])
+        return (f"{prefix}{what} ACCIDENT DETECTED at {event['source']}! "
+                f"Immediate attention required.")
+    parts = []
+    for source in alert['sources'][:max_sources]:
+        classes = sorted({c for e in events if e['source'] == source for c in e['classes']})
+        parts.append(f"{source} ({'+'.join(classes)})")
+    more = len(alert['sources']) - max_sources
+    if more > 0:
+        parts.append(f"+{more} more")
+    return f"{prefix}{len(events)} ACCIDENTS DETECTED: {', '.join(parts)}. Immediate attention required."
@@ -0,0 +1,118 @@
+"""
+Asynchronous Annotated Video Writer
+Draws detections and encodes the output video in a background thread fed by
+a bounded queue, so the inference loop doesn't wait on plot() or VideoWriter
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+
+from stage_timer import StageTimer
+
+_STOP = object()
+
+
+class AsyncVideoWriter:
+    """
+    Background annotate + encode stage for video output
+
+    write(frame, result) queues the raw frame and its detection result; the
+    worker thread calls result.plot() and VideoWriter.write(). The queue is
+    bounded so memory stays flat: when the encoder falls behind, write()
+    either waits for a free slot (default, every frame is kept) or drops the
+    frame (drop_when_full=True, the output video skips frames).
+    """
+
+    def __init__(self, path, fps, max_queue=64, drop_when_full=False, fourcc='mp4v', timer=None):
+        """
+        Args:
+            path: Output video path
+            fps: Output frame rate
+            max_queue: Frames allowed to wait for the encoder
+            drop_when_full: Drop frames instead of waiting when the queue is full
+            fourcc: Codec for cv2.VideoWriter
+            timer: Optional StageTimer; plot/encode are recorded from the worker
+                   and time spent waiting for the queue as 'encode_wait'
+        """
+        self.path = str(path)
+        self.fps = fps
+        self.drop_when_full = drop_when_full
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.timer = timer if timer is not None else StageTimer(enabled=False)
+
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.frames_written = 0
+        self.dropped = 0
+        self.error = None
+        self._writer = None
+        self._closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, frame, result=None):
+        """
+        Queue one frame for annotation and encoding
+
+        Args:
+            frame: BGR frame (must not be modified by the caller afterwards)
+            result: Detection result to draw with result.plot(img=frame), or None to write as-is
+
+        Returns:
+            True if queued, False if dropped because the queue was full
+        """
+        if self.error is not None:
+            raise self.error
+        if self.drop_when_full:
+            try:
+                self.frames.put_nowait((frame, result))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            return True
+        start = time.perf_counter()
+        self.frames.put((frame, result))
+        self.timer.record('encode_wait', (time.perf_counter() - start) * 1000)
+        return True
+
+    def _run(self):
+        while True:
+            item = self.frames.get()
+            if item is _STOP:
+                break
+            if self.error is not None:
+                continue  # Keep draining so write() never blocks after a failure
+            frame, result = item
+            try:
+                if result is not None:
+                    with self.timer.stage('plot'):
+                        frame = result.plot(img=frame)
+                with self.timer.stage('encode'):
+                    if self._writer is None:
+                        h, w = frame.shape[:2]
+                        self._writer = cv2.VideoWriter(self.path, self.fourcc, self.fps, (w, h))
+                    self._writer.write(frame)
+                self.frames_written += 1
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        """Flush the queue, finish the file and re-raise any worker error"""
+        if self._closed:
+            return
+        self._closed = True
+        self.frames.put(_STOP)
+        self.thread.join()
+        if self._writer is not None:
+            self._writer.release()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,215 @@
+"""
+YOLOv11 Accident Severity Detection - CPU Auto-tuner
+Measures latency for several input sizes and thread counts on this machine,
+mAP@50 for each size on the validation split, and saves the most accurate
+configuration that reaches a target FPS as a tuning profile
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+
+from bench import bench_single, set_threads, synthetic_frames
+from inference import AccidentSeverityDetector
+from quantize_model import evaluate, list_images, resolve_split
+
+
+def export_onnx_sizes(model_path, imgszs, output_dir):
+    """
+    One ONNX export per input size
+
+    The exported graphs have a static input shape, so OnnxYOLO runs every
+    export at the size it was exported with. Exports are written to
+    output_dir as <stem>_<imgsz>.onnx and reused on later runs; the .pt is
+    copied there first so best.onnx next to the weights is left alone.
+
+    Returns:
+        Dict imgsz -> Path of the ONNX model
+    """
+    from ultralytics import YOLO
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(model_path).stem
+    models = {}
+    for imgsz in imgszs:
+        onnx_path = output_dir / f"{stem}_{imgsz}.onnx"
+        if not onnx_path.exists():
+            print(f"[Autotune] Exporting {model_path} to ONNX at imgsz {imgsz}...")
+            weights_copy = output_dir / f"{stem}_{imgsz}.pt"
+            shutil.copy(model_path, weights_copy)
+            try:
+                exported = Path(YOLO(str(weights_copy)).export(format='onnx', imgsz=imgsz))
+                if exported.resolve() != onnx_path.resolve():
+                    shutil.move(str(exported), str(onnx_path))
+            finally:
+                weights_copy.unlink()
+        models[imgsz] = onnx_path
+    return models
+
+
+def measure_configs(model_path, backend, imgszs, threads_list, images, warmup=3, iterations=30,
+                    onnx_models=None):
+    """
+    Single-image latency for every imgsz x threads combination
+
+    Args:
+        onnx_models: For the onnx backend, dict imgsz -> ONNX model exported at that size
+                     (see export_onnx_sizes)
+
+    Returns:
+        List of dicts with imgsz, threads, latency_ms_p50/p95 and fps
+    """
+    candidates = []
+    for imgsz in imgszs:
+        for threads in threads_list:
+            set_threads(backend, threads)
+            if onnx_models is not None:
+                model_path = onnx_models[imgsz]
+            detector = AccidentSeverityDetector(model_path, backend, imgsz,
+                                                intra_op_threads=threads if backend == 'onnx' else None)
+            latency = bench_single(detector, images, 0.25, warmup, iterations)
+            fps = 1000.0 / latency['latency_ms_p50'] if latency['latency_ms_p50'] else 0.0
+            candidates.append({'imgsz': imgsz, 'threads': threads, 'fps': fps, **latency})
+            print(f"[Autotune] imgsz {imgsz:4d}, {threads:2d} threads: "
+                  f"p50 {latency['latency_ms_p50']:.1f} ms, p95 {latency['latency_ms_p95']:.1f} ms "
+                  f"-> {fps:.1f} FPS")
+    return candidates
+
+
+def recommend(candidates, target_fps):
+    """
+    Most accurate candidate that meets target_fps (ties go to the faster one)
+
+    Without mAP numbers the largest input size counts as most accurate.
+    Falls back to the fastest candidate if none reaches the target.
+
+    Returns:
+        (candidate, met_target)
+    """
+    fast_enough = [c for c in candidates if c['fps'] >= target_fps]
+    if fast_enough:
+        def accuracy(c):
+            if c.get('map50') is None:
+                return (c['imgsz'], c['fps'])
+            return (c['map50'], c['fps'])
+        best = max(fast_enough, key=accuracy)
+        return best, True
+    return max(candidates, key=lambda c: c['fps']), False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pick imgsz / threads for a target FPS on this CPU')
+    parser.add_argument('--model', type=str,
+                       default='runs/train/accident_severity_yolov11/weights/best.pt',
+                       help='Trained .pt model (exported to ONNX once per size for --backend onnx)')
+    parser.add_argument('--data', type=str, default='data.yaml',
+                       help='Dataset config (validation split is used for mAP and latency)')
+    parser.add_argument('--backend', type=str, default='torch', choices=['torch', 'onnx'],
+                       help='Inference backend to tune')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[320, 416, 480, 544, 640],
+                       help='Input sizes to try')
+    parser.add_argument('--threads', type=int, nargs='+', default=None,
+                       help='Thread counts to try (default: 1, 2, 4, ... up to the CPU count)')
+    parser.add_argument('--target-fps', type=float, default=30.0,
+                       help='Required single-stream FPS')
+    parser.add_argument('--latency-images', type=int, default=30,
+                       help='Validation images used for latency measurements')
+    parser.add_argument('--skip-map', action='store_true',
+                       help='Only measure speed (recommends the largest size that is fast enough)')
+    parser.add_argument('--output', type=str, default='runs/autotune/tuning_profile.json',
+                       help='Where to save the tuning profile')
+
+    args = parser.parse_args()
+
+    threads_list = args.threads
+    if not threads_list:
+        cpu_count = os.cpu_count() or 1
+        threads_list = sorted({min(2 ** i, cpu_count) for i in range(cpu_count.bit_length() + 1)})
+
+    # Time real validation frames when the dataset is available
+    try:
+        val_dir = resolve_split(args.data, 'val')
+        images = [cv2.imread(str(p)) for p in list_images(val_dir, args.latency_images)]
+        images = [img for img in images if img is not None]
+    except Exception as e:
+        print(f"[Autotune] Could not read validation images ({e})")
+        images = []
+    if not images:
+        print("[Autotune] Using synthetic frames for latency")
+        images = synthetic_frames(args.latency_images)
+
+    # ONNX graphs are exported with a fixed input size, so each size needs its own export;
+    # latency and mAP are then measured on the model that will actually run
+    onnx_models = None
+    if args.backend == 'onnx':
+        if Path(args.model).suffix != '.pt':
+            parser.error('--backend onnx needs the .pt weights to export one ONNX model per --imgsz')
+        onnx_models = export_onnx_sizes(args.model, args.imgsz, Path(args.output).parent / 'onnx')
+
+    print(f"\n[Autotune] Measuring latency ({args.backend}, sizes {args.imgsz}, threads {threads_list})")
+    candidates = measure_configs(args.model, args.backend, args.imgsz, threads_list, images,
+                                 iterations=args.latency_images, onnx_models=onnx_models)
+
+    # Accuracy depends on the input size only; evaluate each size once
+    for c in candidates:
+        c['map50'] = None
+    if not args.skip_map:
+        print(f"\n[Autotune] Evaluating mAP@50 on the validation split")
+        accuracy = {}
+        for imgsz in args.imgsz:
+            eval_model = onnx_models[imgsz] if onnx_models is not None else args.model
+            accuracy[imgsz] = evaluate(eval_model, args.data, imgsz)
+            print(f"[Autotune] imgsz {imgsz:4d}: mAP@50 {accuracy[imgsz]['map50']:.4f}")
+        for c in candidates:
+            c['map50'] = accuracy[c['imgsz']]['map50']
+            c['ap50'] = accuracy[c['imgsz']]['ap50']
+
+    best, met_target = recommend(candidates, args.target_fps)
+
+    profile = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'model': args.model,
+        'backend': args.backend,
+        'imgsz': best['imgsz'],
+        'threads': best['threads'],
+        'target_fps': args.target_fps,
+        'met_target': met_target,
+        'expected_fps': best['fps'],
+        'map50': best['map50'],
+        'onnx_model': str(onnx_models[best['imgsz']]) if onnx_models is not None else None,
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count()
+        },
+        'candidates': candidates
+    }
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+    print("\n" + "=" * 60)
+    if met_target:
+        print(f"Recommended: imgsz {best['imgsz']}, {best['threads']} threads "
+              f"({best['fps']:.1f} FPS >= {args.target_fps:.0f} FPS target)")
+    else:
+        print(f"No configuration reaches {args.target_fps:.0f} FPS; fastest is "
+              f"imgsz {best['imgsz']}, {best['threads']} threads ({best['fps']:.1f} FPS)")
+    if best['map50'] is not None:
+        print(f"mAP@50 at this size: {best['map50']:.4f}")
+    print(f"Profile saved to: {output}")
+    print(f"Use it with: python inference.py --source 0 --realtime --tuning-profile {output}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
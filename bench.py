@@ -0,0 +1,302 @@
+"""
+Detection Benchmark Suite
+Measures single-image latency, batched throughput, video FPS and real-time
+end-to-end latency for AccidentSeverityDetector across a sweep of backends,
+image sizes, batch sizes and thread counts, and compares against a baseline
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from inference import AccidentSeverityDetector
+from multi_stream import MultiStreamEngine
+
+# Metrics where a lower value is better; everything else is higher-is-better
+LOWER_IS_BETTER = ('latency_ms_p50', 'latency_ms_p95', 'realtime_latency_ms_p50', 'realtime_latency_ms_p95')
+
+
+def synthetic_frames(count, width=1280, height=720, seed=0):
+    """Deterministic road-like test frames (gradient + noise) so runs are comparable"""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(40, 200, height, dtype=np.float32)[:, None, None]
+    frames = []
+    for _ in range(count):
+        noise = rng.normal(0, 25, (height, width, 3)).astype(np.float32)
+        frames.append(np.clip(gradient + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def write_synthetic_video(path, frames, fps=30):
+    """Write frames to an mp4 used by the video and real-time benchmarks"""
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def load_images(image_dir, count):
+    """Up to count images from image_dir (bundled test images)"""
+    names = sorted(f for f in os.listdir(image_dir)
+                   if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')))[:count]
+    images = [cv2.imread(os.path.join(image_dir, name)) for name in names]
+    return [img for img in images if img is not None]
+
+
+def set_threads(backend, threads):
+    """Pin torch's intra-op thread count (ONNX threads are set on the session)"""
+    if backend == 'torch' and threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def bench_single(detector, images, conf, warmup, iterations):
+    """Per-image latency of one-image predict calls"""
+    for i in range(warmup):
+        detector.model.predict(images[i % len(images)], conf=conf, imgsz=detector.imgsz, verbose=False)
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        detector.model.predict(images[i % len(images)], conf=conf, imgsz=detector.imgsz, verbose=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        'latency_ms_p50': statistics.median(latencies),
+        'latency_ms_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    }
+
+
+def bench_batched(detector, images, conf, batch_size, warmup, iterations):
+    """Images per second for batch_size-image predict calls"""
+    batches = [[images[(i * batch_size + j) % len(images)] for j in range(batch_size)]
+               for i in range(warmup + iterations)]
+    for batch in batches[:warmup]:
+        detector.model.predict(batch, conf=conf, imgsz=detector.imgsz, verbose=False)
+    start = time.perf_counter()
+    for batch in batches[warmup:]:
+        detector.model.predict(batch, conf=conf, imgsz=detector.imgsz, verbose=False)
+    elapsed = time.perf_counter() - start
+    return {'batch_images_per_sec': iterations * batch_size / elapsed if elapsed else 0.0}
+
+
+def bench_video(detector, video_path, conf):
+    """End-to-end FPS of predict_video (decode + inference, no output file)"""
+    start = time.perf_counter()
+    detections = detector.predict_video(video_path, conf, save=False)
+    elapsed = time.perf_counter() - start
+    return {'video_fps': detections.frame_count / elapsed if elapsed else 0.0}
+
+
+def bench_realtime(detector, video_path, conf, duration):
+    """Capture-to-result latency with the video played back at camera rate"""
+    engine = MultiStreamEngine(detector, {'bench': video_path}, conf, batch_wait=0)
+    stats = engine.run(duration=duration, stats_interval=0)['streams']['bench']
+    return {
+        'realtime_fps': stats['inference_fps'],
+        'realtime_latency_ms_p50': stats['latency_ms_p50'],
+        'realtime_latency_ms_p95': stats['latency_ms_p95']
+    }
+
+
+def config_key(config):
+    """Stable string id used to match results against the baseline"""
+    return (f"{config['backend']}-imgsz{config['imgsz']}-"
+            f"batch{config['batch_size']}-threads{config['threads']}")
+
+
+def run_suite(model_path, backends, imgszs, batch_sizes, threads_list, images, video_path,
+              conf=0.25, warmup=3, iterations=20, realtime_seconds=5.0, onnx_models=None):
+    """
+    Run every benchmark for each backend x imgsz x batch size x threads combination
+
+    Single-image, video and real-time numbers don't depend on batch size, so
+    they are measured once per (backend, imgsz, threads) and shared.
+
+    Args:
+        onnx_models: For the onnx backend, dict imgsz -> ONNX model exported at
+                     that size; without one the model next to model_path is used
+                     and sizes its static graph doesn't match are skipped
+
+    Returns:
+        List of {'key', 'config', 'metrics'} dicts
+    """
+    results = []
+    for backend, imgsz, threads in itertools.product(backends, imgszs, threads_list):
+        print(f"\n[Bench] backend={backend} imgsz={imgsz} threads={threads}")
+        set_threads(backend, threads)
+        path = model_path
+        if backend == 'onnx' and onnx_models:
+            path = onnx_models[imgsz]
+        try:
+            detector = AccidentSeverityDetector(path, backend, imgsz,
+                                                intra_op_threads=threads if backend == 'onnx' else None)
+        except Exception as e:
+            print(f"[Bench] Skipping: could not load {backend} model ({e})")
+            continue
+        if backend == 'onnx' and detector.model.imgsz != (imgsz, imgsz):
+            # Static ONNX graphs ignore imgsz; don't report another size's numbers under this one
+            height, width = detector.model.imgsz
+            print(f"[Bench] Skipping: {detector.weights_file} was exported at {width}x{height}, "
+                  f"not {imgsz}")
+            continue
+
+        shared = bench_single(detector, images, conf, warmup, iterations)
+        if video_path:
+            shared.update(bench_video(detector, video_path, conf))
+            if realtime_seconds:
+                shared.update(bench_realtime(detector, video_path, conf, realtime_seconds))
+
+        for batch_size in batch_sizes:
+            config = {'backend': backend, 'imgsz': imgsz, 'batch_size': batch_size, 'threads': threads}
+            metrics = dict(shared)
+            metrics.update(bench_batched(detector, images, conf, batch_size, warmup, iterations))
+            results.append({'key': config_key(config), 'config': config, 'metrics': metrics})
+            print(f"  batch {batch_size:2d}: " +
+                  ", ".join(f"{name} {value:.1f}" for name, value in metrics.items()))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline run
+
+    Args:
+        results: Output of run_suite
+        baseline: Previously saved report dict
+        tolerance: Allowed relative slowdown (0.1 = 10%)
+
+    Returns:
+        List of regression dicts (empty if none)
+    """
+    baseline_by_key = {entry['key']: entry['metrics'] for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in results:
+        old = baseline_by_key.get(entry['key'])
+        if old is None:
+            continue
+        for name, value in entry['metrics'].items():
+            reference = old.get(name)
+            if not reference:
+                continue
+            if name in LOWER_IS_BETTER:
+                change = (value - reference) / reference
+            else:
+                change = (reference - value) / reference
+            if change > tolerance:
+                regressions.append({'key': entry['key'], 'metric': name,
+                                    'baseline': reference, 'current': value,
+                                    'slowdown': change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark accident severity detection')
+    parser.add_argument('--model', type=str,
+                       default='runs/train/accident_severity_yolov11/weights/best.pt',
+                       help='Path to trained model (with .pt weights, onnx is exported once per --imgsz)')
+    parser.add_argument('--backends', type=str, nargs='+', default=['torch'],
+                       choices=['torch', 'onnx'], help='Backends to sweep')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640],
+                       help='Image sizes to sweep')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8],
+                       help='Batch sizes to sweep')
+    parser.add_argument('--threads', type=int, nargs='+', default=[4],
+                       help='Thread counts to sweep')
+    parser.add_argument('--images', type=str, default=None,
+                       help='Folder of images to use instead of synthetic frames (e.g. test/images)')
+    parser.add_argument('--num-images', type=int, default=16,
+                       help='Number of input images')
+    parser.add_argument('--video-frames', type=int, default=150,
+                       help='Frames in the synthetic benchmark video (0 skips video/real-time)')
+    parser.add_argument('--realtime-seconds', type=float, default=5.0,
+                       help='Duration of the real-time latency run (0 skips it)')
+    parser.add_argument('--warmup', type=int, default=3,
+                       help='Warm-up iterations per measurement')
+    parser.add_argument('--iterations', type=int, default=20,
+                       help='Timed iterations per measurement')
+    parser.add_argument('--output', type=str, default='runs/bench/bench_results.json',
+                       help='Where to write the JSON results')
+    parser.add_argument('--baseline', type=str, default=None,
+                       help='Baseline JSON to compare against (exit code 1 on regression)')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                       help='Allowed relative slowdown before a metric counts as a regression')
+    parser.add_argument('--save-baseline', type=str, default=None,
+                       help='Also write the results to this baseline path')
+
+    args = parser.parse_args()
+
+    if args.images:
+        images = load_images(args.images, args.num_images)
+        if not images:
+            print(f"No images found in {args.images}")
+            sys.exit(2)
+    else:
+        images = synthetic_frames(args.num_images)
+
+    onnx_models = None
+    if 'onnx' in args.backends and os.path.splitext(args.model)[1] == '.pt':
+        from autotune import export_onnx_sizes
+        onnx_models = export_onnx_sizes(args.model, args.imgsz,
+                                        os.path.join(os.path.dirname(args.output) or '.', 'onnx'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = None
+        if args.video_frames:
+            video_path = write_synthetic_video(os.path.join(tmp, 'bench.mp4'),
+                                               synthetic_frames(args.video_frames, seed=1))
+        results = run_suite(args.model, args.backends, args.imgsz, args.batch_sizes, args.threads,
+                            images, video_path, warmup=args.warmup, iterations=args.iterations,
+                            realtime_seconds=args.realtime_seconds, onnx_models=onnx_models)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'model': args.model,
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version()
+        },
+        'inputs': 'images:' + args.images if args.images else 'synthetic',
+        'results': results
+    }
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[Bench] Results saved to {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or '.', exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[Bench] Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[Bench] REGRESSION: {len(regressions)} metric(s) slower than baseline "
+                  f"by more than {args.tolerance:.0%}")
+            for r in regressions:
+                print(f"  {r['key']:40s} {r['metric']:26s} {r['baseline']:10.2f} -> "
+                      f"{r['current']:10.2f} ({r['slowdown']:+.0%})")
+            sys.exit(1)
+        print(f"\n[Bench] No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,18 @@
 Check all recent SMS messages and their delivery status
 """
 
-from twilio.rest import Client
+from twilio_sms import create_client
+from delivery_tracker import DeliveryTracker, print_report
 import json
-from datetime import datetime, timedelta
 
 # Load config
 with open('twilio_config.json', 'r') as f:
     config = json.load(f)
 
 # Initialize client
-client = Client(config['account_sid'], config['auth_token'])
+client = create_client(config)
+tracker = DeliveryTracker(config.get('delivery_db', 'runs/alerts/deliveries.sqlite'), client,
+                          verified_ttl=config.get('verified_numbers_ttl', 3600))
 
 print("=" * 70)
 print("Checking ALL Recent SMS Messages")
@@ -19,7 +21,19 @@ print("=" * 70)
 print()
 
 try:
-    # Get messages from last 24 hours
+    # Refresh tracked alert messages in one batched walk, then report from the local store
+    result = tracker.poll()
+    print(f"Tracked alerts: {result['open']} open, {result['finalized']} reached a final status "
+          f"({result['api_calls']} API call(s))")
+    print_report(tracker)
+    print()
+    
+    # Verified numbers are fetched once (and cached), not per message
+    try:
+        verified_phones = tracker.verified_numbers()
+    except Exception:
+        verified_phones = None
+    
     messages = client.messages.list(limit=10)
     
     if not messages:
@@ -56,15 +70,11 @@ try:
                 print(f"  Error Message: {msg.error_message}")
             
             # Check if number is verified
-            try:
-                verified_numbers = client.outgoing_caller_ids.list()
-                verified_phones = [v.phone_number for v in verified_numbers]
+            if verified_phones is not None:
                 if msg.to in verified_phones:
                     print(f"  ✅ Number IS verified")
                 else:
                     print(f"  ❌ Number NOT verified")
-            except:
-                pass
             
             print()
             print("-" * 70)
@@ -90,4 +100,6 @@ except Exception as e:
     print(f"❌ Error: {e}")
     import traceback
     traceback.print_exc()
+finally:
+    tracker.close()
 
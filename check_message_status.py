@@ -1,19 +1,28 @@
 """
 Check the status of a specific SMS message
+
+Usage: python check_message_status.py [MESSAGE_SID]
+(defaults to the latest alert message recorded by the delivery tracker)
 """
 
-from twilio.rest import Client
+from twilio_sms import create_client
+from delivery_tracker import DeliveryTracker
 import json
+import sys
 
 # Load config
 with open('twilio_config.json', 'r') as f:
     config = json.load(f)
 
 # Initialize client
-client = Client(config['account_sid'], config['auth_token'])
+client = create_client(config)
+tracker = DeliveryTracker(config.get('delivery_db', 'runs/alerts/deliveries.sqlite'), client)
 
-# Message SID from your log (update with latest SID)
-message_sid = "SMf9816278ddb1af1b2638eac37371e50b"
+message_sid = sys.argv[1] if len(sys.argv) > 1 else tracker.latest_sid()
+if not message_sid:
+    print("No message SID given and no alert messages tracked yet")
+    print("Usage: python check_message_status.py MESSAGE_SID")
+    sys.exit(1)
 
 print("=" * 70)
 print(f"Checking Message Status: {message_sid}")
@@ -22,6 +31,7 @@ print()
 
 try:
     message = client.messages(message_sid).fetch()
+    tracker.update([message])
     
     print(f"To: {message.to}")
     print(f"From: {message.from_}")
@@ -74,4 +84,5 @@ try:
     
 except Exception as e:
     print(f"❌ Error checking message: {e}")
-
+finally:
+    tracker.close()
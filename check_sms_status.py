@@ -2,7 +2,7 @@
 Check SMS delivery status from Twilio
 """
 
-from twilio.rest import Client
+from twilio_sms import create_client
 import json
 
 # Load config
@@ -10,7 +10,7 @@ with open('twilio_config.json', 'r') as f:
     config = json.load(f)
 
 # Initialize client
-client = Client(config['account_sid'], config['auth_token'])
+client = create_client(config)
 
 print("=" * 60)
 print("Checking Recent SMS Messages")
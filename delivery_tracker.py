@@ -0,0 +1,326 @@
+"""
+SMS Delivery Tracker
+Records the SID of every alert SMS, polls Twilio for delivery status in
+batches and keeps the results in an indexed SQLite store, so questions like
+"undelivered severe alerts in the last hour" are answered locally
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Statuses that will not change any more
+FINAL_STATUSES = ('delivered', 'undelivered', 'failed', 'canceled', 'read')
+
+
+class DeliveryTracker:
+    """
+    Local store of sent alert messages and their delivery status
+
+    record() is called for every message SID (TwilioSMSAlert does this on
+    each successful send). poll() refreshes all messages that are not in a
+    final status with as few API calls as possible: it walks the account's
+    message list newest first, one page of page_size at a time, and stops
+    as soon as every open SID was seen, the page is older than the oldest
+    open message or max_pages were read; only SIDs the walk missed are
+    fetched one by one (at most max_fetch). SIDs Twilio answers 404 for are
+    closed as 'not_found' so they are not polled again. The verified caller
+    ID list (also when empty) is cached in the same database for
+    verified_ttl seconds.
+    """
+
+    def __init__(self, path='runs/alerts/deliveries.sqlite', client=None, page_size=100,
+                 max_pages=10, max_fetch=20, verified_ttl=3600.0, timeout=30.0):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            client: Twilio Client used by poll() / verified_numbers()
+            page_size: Messages per list page when polling
+            max_pages: Most list pages read per poll
+            max_fetch: Most single-message fetches per poll for SIDs not found by the list walk
+            verified_ttl: Seconds the verified number list is reused before re-fetching
+            timeout: Seconds to wait for another process holding the write lock
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.client = client
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.max_fetch = max_fetch
+        self.verified_ttl = verified_ttl
+        self.api_calls = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS deliveries ('
+            'sid TEXT PRIMARY KEY, contact TEXT, phone TEXT, source TEXT, severity TEXT, '
+            'status TEXT, error_code INTEGER, error_message TEXT, final INTEGER NOT NULL DEFAULT 0, '
+            'sent_at REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_deliveries_open ON deliveries(final, sent_at)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_deliveries_severity '
+                           'ON deliveries(severity, sent_at, status)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS verified_numbers ('
+                           'phone TEXT PRIMARY KEY, fetched_at REAL NOT NULL)')
+        # Fetch times of cached API lists, kept apart from the rows so an empty list is cached too
+        self._conn.execute('CREATE TABLE IF NOT EXISTS fetches ('
+                           'name TEXT PRIMARY KEY, fetched_at REAL NOT NULL)')
+
+    def _write(self, sql, rows):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(sql, rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def record(self, sid, phone, contact=None, status='queued', severity=None, source=None):
+        """
+        Remember a sent message
+
+        Args:
+            sid: Twilio message SID
+            phone: Recipient number
+            contact: Contact name
+            status: Status returned when the message was created
+            severity: Alert severity ('severe', 'fire', ...)
+            source: Camera / video the alert was about
+        """
+        now = time.time()
+        self._write(
+            'INSERT OR IGNORE INTO deliveries (sid, contact, phone, source, severity, status, final, '
+            'sent_at, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(sid, contact, phone, source, severity, status, int(status in FINAL_STATUSES), now, now)]
+        )
+
+    def record_results(self, results, severity=None, source=None):
+        """Record every successful entry of a send_accident_alert result list"""
+        for r in results or []:
+            if r.get('message_sid'):
+                self.record(r['message_sid'], r['phone'], r.get('contact'),
+                            r.get('delivery_status', 'queued'), severity, source)
+
+    def open_messages(self):
+        """(sid, sent_at) of messages not in a final status, oldest first"""
+        with self._lock:
+            rows = self._conn.execute('SELECT sid, sent_at FROM deliveries WHERE final = 0 '
+                                      'ORDER BY sent_at').fetchall()
+        return [(row['sid'], row['sent_at']) for row in rows]
+
+    def update(self, messages):
+        """Store the status of fetched Twilio message objects (untracked SIDs are ignored)"""
+        now = time.time()
+        self._write(
+            'UPDATE deliveries SET status = ?, error_code = ?, error_message = ?, final = ?, '
+            'updated = ? WHERE sid = ?',
+            [(m.status, m.error_code, m.error_message, int(m.status in FINAL_STATUSES), now, m.sid)
+             for m in messages]
+        )
+
+    def poll(self, slack_seconds=300.0):
+        """
+        Refresh the status of all open messages
+
+        Args:
+            slack_seconds: Clock difference allowed when deciding a list page is
+                           older than the oldest open message
+
+        Returns:
+            Dict with 'open' (before polling), 'updated', 'finalized' and 'api_calls'
+        """
+        open_messages = self.open_messages()
+        calls_before = self.api_calls
+        if not open_messages:
+            return {'open': 0, 'updated': 0, 'finalized': 0, 'api_calls': 0}
+
+        wanted = {sid for sid, _ in open_messages}
+        oldest = open_messages[0][1] - slack_seconds
+        found = []
+
+        # Newest-first list walk; stop once everything is found or pages get too old
+        page = self.client.messages.page(page_size=self.page_size)
+        self.api_calls += 1
+        pages = 1
+        while page is not None and wanted:
+            too_old = False
+            for message in page:
+                if message.sid in wanted:
+                    wanted.discard(message.sid)
+                    found.append(message)
+                created = message.date_created
+                if created is not None and created.timestamp() < oldest:
+                    too_old = True
+            if too_old or not wanted or pages >= self.max_pages:
+                break
+            page = page.next_page()
+            self.api_calls += page is not None
+            pages += 1
+
+        # SIDs the walk did not reach (e.g. sent from another account / subaccount)
+        missing = []
+        for sid in list(wanted)[:self.max_fetch]:
+            try:
+                found.append(self.client.messages(sid).fetch())
+            except Exception as e:
+                if getattr(e, 'status', None) == 404:
+                    missing.append(sid)
+                else:
+                    print(f"[Delivery] Could not fetch {sid}: {e}")
+            self.api_calls += 1
+
+        if found:
+            self.update(found)
+        if missing:
+            print(f"[Delivery] {len(missing)} SID(s) not found in the account, no longer polled")
+            self._write("UPDATE deliveries SET status = 'not_found', final = 1, updated = ? WHERE sid = ?",
+                        [(time.time(), sid) for sid in missing])
+        return {
+            'open': len(open_messages),
+            'updated': len(found) + len(missing),
+            'finalized': sum(1 for m in found if m.status in FINAL_STATUSES) + len(missing),
+            'api_calls': self.api_calls - calls_before
+        }
+
+    def verified_numbers(self, refresh=False):
+        """Verified caller IDs, from the local cache unless older than verified_ttl"""
+        now = time.time()
+        with self._lock:
+            fetched = self._conn.execute("SELECT fetched_at FROM fetches WHERE name = 'verified_numbers'"
+                                         ).fetchone()
+            rows = self._conn.execute('SELECT phone FROM verified_numbers').fetchall()
+        if fetched and not refresh and now - fetched['fetched_at'] < self.verified_ttl:
+            return {row['phone'] for row in rows}
+
+        numbers = {v.phone_number for v in self.client.outgoing_caller_ids.list()}
+        self.api_calls += 1
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute('DELETE FROM verified_numbers')
+                self._conn.executemany('INSERT INTO verified_numbers (phone, fetched_at) VALUES (?, ?)',
+                                       [(phone, now) for phone in numbers])
+                self._conn.execute("INSERT OR REPLACE INTO fetches (name, fetched_at) "
+                                   "VALUES ('verified_numbers', ?)", (now,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return numbers
+
+    def query(self, severity=None, since_seconds=None, delivered=None, limit=100):
+        """
+        Messages from the local store, newest first
+
+        Args:
+            severity: Only alerts of this severity
+            since_seconds: Only messages sent in the last since_seconds
+            delivered: True = delivered only, False = anything not delivered
+                       (still pending or failed), None = all
+            limit: Maximum rows
+
+        Returns:
+            List of dicts
+        """
+        conditions, params = [], []
+        if severity is not None:
+            conditions.append('severity = ?')
+            params.append(severity)
+        if since_seconds is not None:
+            conditions.append('sent_at >= ?')
+            params.append(time.time() - since_seconds)
+        if delivered is True:
+            conditions.append("status = 'delivered'")
+        elif delivered is False:
+            conditions.append("status != 'delivered'")
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+        with self._lock:
+            rows = self._conn.execute(f'SELECT * FROM deliveries {where}ORDER BY sent_at DESC LIMIT ?',
+                                      params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def undelivered(self, severity='severe', since_seconds=3600.0):
+        """Alerts of a severity sent in the last since_seconds that have not been delivered"""
+        return self.query(severity, since_seconds, delivered=False, limit=1000)
+
+    def latest_sid(self):
+        """SID of the most recently recorded message (None if nothing recorded)"""
+        rows = self.query(limit=1)
+        return rows[0]['sid'] if rows else None
+
+    def status_counts(self, since_seconds=None):
+        """Number of messages per status"""
+        params = []
+        where = ''
+        if since_seconds is not None:
+            where = 'WHERE sent_at >= ? '
+            params.append(time.time() - since_seconds)
+        with self._lock:
+            rows = self._conn.execute(f'SELECT status, COUNT(*) FROM deliveries {where}GROUP BY status',
+                                      params).fetchall()
+        return {status: n for status, n in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def print_report(tracker, severity='severe', since_seconds=3600.0):
+    """Status counts and undelivered alerts of the last since_seconds from the local store"""
+    counts = tracker.status_counts(since_seconds)
+    print(f"[Delivery] Last {since_seconds / 60:.0f} min: "
+          f"{', '.join(f'{n} {status}' for status, n in sorted(counts.items())) or 'no messages'}")
+    undelivered = tracker.undelivered(severity, since_seconds)
+    if not undelivered:
+        print(f"[Delivery] ✅ All {severity} alerts delivered")
+        return
+    print(f"[Delivery] ⚠️  {len(undelivered)} {severity} alert message(s) not delivered:")
+    for row in undelivered:
+        sent = datetime.fromtimestamp(row['sent_at']).strftime('%H:%M:%S')
+        error = f" (error {row['error_code']}: {row['error_message']})" if row['error_code'] else ''
+        print(f"  {sent}  {row['contact']} {row['phone']}  {row['status']}{error}  "
+              f"[{row['source']}] {row['sid']}")
+
+
+def main():
+    import argparse
+    import json
+    from twilio_sms import create_client
+
+    parser = argparse.ArgumentParser(description='Poll and report SMS alert delivery status')
+    parser.add_argument('--config', type=str, default='twilio_config.json',
+                        help='Twilio configuration file')
+    parser.add_argument('--db', type=str, default=None,
+                        help='Delivery database (default: config delivery_db or '
+                             'runs/alerts/deliveries.sqlite)')
+    parser.add_argument('--severity', type=str, default='severe',
+                        help='Severity to report undelivered alerts for')
+    parser.add_argument('--since', type=float, default=60,
+                        help='Report window in minutes')
+    parser.add_argument('--no-poll', action='store_true',
+                        help='Only query the local store, no Twilio API calls')
+
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+    tracker = DeliveryTracker(args.db or config.get('delivery_db', 'runs/alerts/deliveries.sqlite'),
+                              create_client(config))
+    if not args.no_poll:
+        result = tracker.poll()
+        print(f"[Delivery] Polled {result['open']} open message(s): {result['updated']} updated, "
+              f"{result['finalized']} final, {result['api_calls']} API call(s)")
+    print_report(tracker, args.severity, args.since * 60)
+    tracker.close()
+
+
+if __name__ == "__main__":
+    main()
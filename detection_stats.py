@@ -0,0 +1,121 @@
+"""
+Streaming Detection Statistics
+O(1) per-class counters, a rolling time window and a bounded buffer of
+recent detections, so long sessions don't keep every detection in memory
+"""
+
+import time
+from collections import deque
+
+CLASS_NAMES = ['fire', 'moderate', 'severe']
+
+
+class DetectionAggregator:
+    """
+    Running per-class statistics over a stream of detections
+
+    Totals and confidence sums are updated in O(1) per detection. Counts for
+    the last window_seconds are kept with a deque of timestamps that is
+    trimmed as time moves on, and only the newest max_recent detection dicts
+    are retained.
+    """
+
+    def __init__(self, classes=None, window_seconds=60.0, max_recent=1000):
+        """
+        Args:
+            classes: Class names (defaults to fire/moderate/severe)
+            window_seconds: Length of the rolling time window
+            max_recent: Number of recent detection dicts kept in the ring buffer
+        """
+        self.classes = list(classes or CLASS_NAMES)
+        self.window_seconds = window_seconds
+        self.counts = {cls: 0 for cls in self.classes}
+        self.confidence_sums = {cls: 0.0 for cls in self.classes}
+        self.recent = deque(maxlen=max_recent)
+        self.total = 0
+
+        self._window = deque()  # (timestamp, class) in arrival order
+        self._window_counts = {cls: 0 for cls in self.classes}
+
+        # Filled in by video loops that track how many frames they looked at
+        self.frame_count = 0
+        self.frames_inferred = 0
+        # Accident events from an AccidentTracker, when tracking is enabled
+        self.events = []
+
+    def add(self, detection, timestamp=None):
+        """
+        Record one detection dict (needs 'class' and 'confidence')
+
+        Args:
+            detection: Detection dict
+            timestamp: Event time in seconds (defaults to time.monotonic())
+        """
+        cls = detection['class']
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.counts[cls] += 1
+        self.confidence_sums[cls] += detection['confidence']
+        self.total += 1
+        self.recent.append(detection)
+        self._window.append((timestamp, cls))
+        self._window_counts[cls] += 1
+        self._expire(timestamp)
+
+    def add_many(self, detections, timestamp=None):
+        """Record all detections from one frame with a shared timestamp"""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        for detection in detections:
+            self.add(detection, timestamp)
+
+    def _expire(self, now):
+        """Drop window entries older than window_seconds"""
+        cutoff = now - self.window_seconds
+        while self._window and self._window[0][0] < cutoff:
+            _, cls = self._window.popleft()
+            self._window_counts[cls] -= 1
+
+    def window_counts(self, now=None):
+        """Per-class counts within the rolling window ending at now"""
+        self._expire(time.monotonic() if now is None else now)
+        return dict(self._window_counts)
+
+    def count(self, cls):
+        """Total detections of one class"""
+        return self.counts[cls]
+
+    def event_counts(self):
+        """Number of tracked events per severity"""
+        counts = {cls: 0 for cls in self.classes}
+        for event in self.events:
+            counts[event['severity']] += 1
+        return counts
+
+    def summary(self):
+        """Dict mapping class name to {'count', 'avg_confidence'}"""
+        return {
+            cls: {
+                'count': self.counts[cls],
+                'avg_confidence': self.confidence_sums[cls] / self.counts[cls] if self.counts[cls] else 0.0
+            }
+            for cls in self.classes
+        }
+
+    def merge(self, other):
+        """Add another aggregator's totals into this one (recent buffers are concatenated)"""
+        for cls in self.classes:
+            self.counts[cls] += other.counts.get(cls, 0)
+            self.confidence_sums[cls] += other.confidence_sums.get(cls, 0.0)
+        self.total += other.total
+        self.recent.extend(other.recent)
+        self.frame_count += other.frame_count
+        self.frames_inferred += other.frames_inferred
+        self.events.extend(other.events)
+        return self
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        return iter(self.recent)
@@ -0,0 +1,196 @@
+"""
+Columnar Detection Store
+Compact array-backed table of per-frame detections (frame, timestamp,
+class id, confidence, xyxy box) with npz / parquet export
+"""
+
+import numpy as np
+
+from detection_stats import CLASS_NAMES
+
+# Parquet export is optional
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except Exception:
+    pa = None
+    pq = None
+    PARQUET_AVAILABLE = False
+
+
+def _to_numpy(values):
+    """Tensor (torch) or array-like to a numpy array"""
+    if hasattr(values, 'cpu'):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+
+class DetectionTable:
+    """
+    Growable columnar table of detections
+
+    Columns live in preallocated numpy arrays that grow in chunk_size steps
+    (doubling once large), so appending is amortized O(1) and there is no
+    Python object per detection. Rows are appended in frame order, which
+    lets slice_frames() return zero-copy views found by binary search.
+    """
+
+    def __init__(self, classes=None, chunk_size=4096):
+        """
+        Args:
+            classes: Class names indexed by class id
+            chunk_size: Minimum number of rows added per growth step
+        """
+        self.classes = list(classes or CLASS_NAMES)
+        self.chunk_size = chunk_size
+        self._size = 0
+        self._capacity = 0
+        self._frame = np.empty(0, np.int64)
+        self._timestamp = np.empty(0, np.float64)
+        self._class_id = np.empty(0, np.int16)
+        self._confidence = np.empty(0, np.float32)
+        self._box = np.empty((0, 4), np.float32)
+
+    def _reserve(self, needed):
+        """Grow the column arrays so at least needed rows fit"""
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, self.chunk_size)
+        capacity = -(-capacity // self.chunk_size) * self.chunk_size  # Round up to a whole chunk
+        for name in ('_frame', '_timestamp', '_class_id', '_confidence', '_box'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+        self._capacity = capacity
+
+    def append(self, frame, timestamp, class_ids, confidences, boxes):
+        """
+        Append all detections of one frame
+
+        Args:
+            frame: Frame index in the source video
+            timestamp: Frame time in seconds
+            class_ids: (N,) class ids
+            confidences: (N,) confidences
+            boxes: (N, 4) xyxy boxes in original image pixels
+        """
+        class_ids = _to_numpy(class_ids).reshape(-1)
+        n = len(class_ids)
+        if n == 0:
+            return
+        if self._size and frame < self._frame[self._size - 1]:
+            raise ValueError(f"Frames must be appended in order (got {frame} after "
+                             f"{self._frame[self._size - 1]})")
+        self._reserve(self._size + n)
+        end = self._size + n
+        self._frame[self._size:end] = frame
+        self._timestamp[self._size:end] = timestamp
+        self._class_id[self._size:end] = class_ids
+        self._confidence[self._size:end] = _to_numpy(confidences).reshape(-1)
+        self._box[self._size:end] = _to_numpy(boxes).reshape(-1, 4)
+        self._size = end
+
+    def append_result(self, frame, timestamp, result):
+        """Append the boxes of one ultralytics (or ONNX backend) result"""
+        boxes = result.boxes
+        if len(boxes):
+            self.append(frame, timestamp, boxes.cls, boxes.conf, boxes.xyxy)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def frame(self):
+        return self._frame[:self._size]
+
+    @property
+    def timestamp(self):
+        return self._timestamp[:self._size]
+
+    @property
+    def class_id(self):
+        return self._class_id[:self._size]
+
+    @property
+    def confidence(self):
+        return self._confidence[:self._size]
+
+    @property
+    def box(self):
+        return self._box[:self._size]
+
+    def columns(self, start=0, stop=None):
+        """Dict of column views for rows start:stop (no copies)"""
+        stop = self._size if stop is None else min(stop, self._size)
+        return {
+            'frame': self._frame[start:stop],
+            'timestamp': self._timestamp[start:stop],
+            'class_id': self._class_id[start:stop],
+            'confidence': self._confidence[start:stop],
+            'box': self._box[start:stop]
+        }
+
+    def slice_frames(self, first_frame, last_frame):
+        """
+        Zero-copy views of all detections with first_frame <= frame <= last_frame
+
+        Returns:
+            Dict of column views (see columns())
+        """
+        frames = self.frame
+        start = int(np.searchsorted(frames, first_frame, side='left'))
+        stop = int(np.searchsorted(frames, last_frame, side='right'))
+        return self.columns(start, stop)
+
+    def class_counts(self):
+        """Detections per class name"""
+        counts = np.bincount(self.class_id, minlength=len(self.classes))
+        return {cls: int(counts[i]) for i, cls in enumerate(self.classes)}
+
+    def to_npz(self, path, compressed=True):
+        """Save all columns (plus class names) to an .npz file"""
+        save = np.savez_compressed if compressed else np.savez
+        save(path, classes=np.array(self.classes), **self.columns())
+        return path
+
+    @classmethod
+    def from_npz(cls, path):
+        """Load a table written by to_npz"""
+        data = np.load(path)
+        table = cls(classes=[str(c) for c in data['classes']])
+        table._reserve(len(data['frame']))
+        table._size = len(data['frame'])
+        table._frame[:table._size] = data['frame']
+        table._timestamp[:table._size] = data['timestamp']
+        table._class_id[:table._size] = data['class_id']
+        table._confidence[:table._size] = data['confidence']
+        table._box[:table._size] = data['box']
+        return table
+
+    def to_parquet(self, path):
+        """Save to parquet (requires pyarrow); class ids are stored as a dictionary column"""
+        if not PARQUET_AVAILABLE:
+            raise ImportError("pyarrow is not installed. Install with: pip install pyarrow")
+        box = self.box
+        class_column = pa.DictionaryArray.from_arrays(
+            pa.array(self.class_id.astype(np.int32)), pa.array(self.classes))
+        table = pa.table({
+            'frame': self.frame,
+            'timestamp': self.timestamp,
+            'class': class_column,
+            'confidence': self.confidence,
+            'x1': box[:, 0],
+            'y1': box[:, 1],
+            'x2': box[:, 2],
+            'y2': box[:, 3]
+        })
+        pq.write_table(table, path)
+        return path
+
+    def export(self, path):
+        """Save to .npz or .parquet depending on the file extension"""
+        if str(path).endswith('.parquet'):
+            return self.to_parquet(path)
+        return self.to_npz(path)
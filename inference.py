@@ -5,27 +5,125 @@ Handles both image and video input for real-time detection
 
 from ultralytics import YOLO
 import cv2
+import numpy as np
 import os
 import argparse
+import multiprocessing
+import queue
+import threading
+import json
+import time
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from onnx_backend import OnnxBoxes, OnnxResults, OnnxYOLO
+from motion_gate import MotionGate
+from realtime_pipeline import RealtimePipeline
+from detection_stats import CLASS_NAMES, DetectionAggregator
+from detection_store import DetectionTable
+from stage_timer import StageTimer
+from async_writer import AsyncVideoWriter
+from roi import RoiConfig
+from tracker import AccidentTracker
+from result_cache import ResultCache, file_hash
+
+# Detector owned by each video worker process (see predict_videos_parallel)
+_worker_detector = None
+
+def _init_video_worker(model_path, torch_threads, detector_options, cache_options=None):
+    """Load one detector per worker process and cap its torch threads"""
+    global _worker_detector
+    # SQLite connections can't be pickled; each worker opens the shared cache file itself
+    cache = ResultCache(**cache_options) if cache_options else None
+    _worker_detector = AccidentSeverityDetector(model_path, cache=cache, **detector_options)
+    # After the detector, so an explicit thread count wins over the tuning profile's
+    if torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+
+def _run_video_worker(video_path, conf_threshold, save, output_dir, video_options):
+    """Process a single video inside a worker process"""
+    return video_path, _worker_detector.predict_video(video_path, conf_threshold, save, output_dir,
+                                                      **video_options)
+
+def load_tuning_profile(path):
+    """Read a tuning profile written by autotune.py (imgsz, threads, backend, ...)"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
 
 class AccidentSeverityDetector:
     """Accident Severity Detector using YOLOv11"""
     
-    def __init__(self, model_path='runs/train/accident_severity_yolov11/weights/best.pt'):
+    def __init__(self, model_path='runs/train/accident_severity_yolov11/weights/best.pt',
+                 backend='torch', imgsz=640, intra_op_threads=None, inter_op_threads=None,
+                 tuning_profile=None, cache=None):
         """
         Initialize the detector
         
         Args:
             model_path: Path to trained model weights
+            backend: 'torch' (Ultralytics) or 'onnx' (ONNX Runtime on CPU)
+            imgsz: Inference image size
+            intra_op_threads: ONNX Runtime threads per operator
+            inter_op_threads: ONNX Runtime threads across operators
+            tuning_profile: Optional autotune.py profile; its imgsz and thread
+                            count replace imgsz / intra_op_threads (torch threads
+                            are set process-wide); for onnx its ONNX model exported
+                            at that imgsz replaces model_path
+            cache: Optional ResultCache; images already seen with the same weights,
+                   conf and imgsz return their stored detections without inference
         """
-        self.model = YOLO(model_path)
-        self.classes = ['fire', 'moderate', 'severe']
+        if tuning_profile is not None:
+            profile = load_tuning_profile(tuning_profile)
+            if profile.get('backend', backend) != backend:
+                print(f"[Tuning] Profile was tuned for {profile['backend']}, running {backend}")
+            imgsz = profile['imgsz']
+            if backend == 'onnx' and profile.get('onnx_model'):
+                # The ONNX graph has a fixed input size; use the export tuned for imgsz
+                model_path = profile['onnx_model']
+            threads = profile.get('threads')
+            if threads:
+                if backend == 'onnx':
+                    intra_op_threads = threads
+                else:
+                    import torch
+                    torch.set_num_threads(threads)
+            print(f"[Tuning] Using profile {tuning_profile}: imgsz {imgsz}, {threads} threads "
+                  f"(expected {profile.get('expected_fps', 0):.1f} FPS)")
+        
+        self.model_path = model_path
+        self.backend = backend
+        self.imgsz = imgsz
+        self.cache = cache
+        self.weights_file = model_path
+        self.classes = list(CLASS_NAMES)
         self.colors = {
             'fire': (0, 0, 255),      # Red
             'moderate': (0, 165, 255), # Orange
             'severe': (0, 255, 255)    # Yellow
         }
+        self.tuning_profile = tuning_profile
+        # Passed to worker processes so they build an identical detector
+        self.detector_options = {
+            'backend': backend,
+            'imgsz': imgsz,
+            'intra_op_threads': intra_op_threads,
+            'inter_op_threads': inter_op_threads,
+            'tuning_profile': tuning_profile
+        }
+        
+        if backend == 'onnx':
+            # best.onnx is exported next to best.pt by train_yolov11.py
+            onnx_path = Path(model_path)
+            if onnx_path.suffix == '.pt':
+                onnx_path = onnx_path.with_suffix('.onnx')
+            self.weights_file = onnx_path
+            self.model = OnnxYOLO(onnx_path, self.classes, self.colors, imgsz,
+                                  intra_op_threads, inter_op_threads)
+        elif backend == 'torch':
+            self.model = YOLO(model_path)
+        else:
+            raise ValueError(f"Unknown backend: {backend} (expected 'torch' or 'onnx')")
         
     def predict_image(self, image_path, conf_threshold=0.5, save=True, output_dir='runs/detect'):
         """
@@ -39,10 +137,21 @@ class AccidentSeverityDetector:
         """
         print(f"\nProcessing image: {image_path}")
         
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(image_path, conf_threshold)
+            detections = self.cache.get(cache_key)
+            if detections is not None:
+                results = [self._cached_result(image_path, detections, save, output_dir)]
+                for d in detections:
+                    print(f"  Detected: {d['class']} (confidence: {d['confidence']:.2%}) [cached]")
+                return results
+        
         # Run inference
         results = self.model.predict(
             source=image_path,
             conf=conf_threshold,
+            imgsz=self.imgsz,
             save=save,
             project=output_dir,
             name='image_results',
@@ -58,102 +167,494 @@ class AccidentSeverityDetector:
                 class_name = self.classes[cls]
                 print(f"  Detected: {class_name} (confidence: {conf:.2%})")
         
+        if cache_key is not None:
+            self.cache.put(cache_key, self._extract_detections(results[0]))
         return results
     
-    def predict_video(self, video_path, conf_threshold=0.5, save=True, output_dir='runs/detect'):
+    def _cache_key(self, image_path, conf_threshold):
+        """ResultCache key for an image file under this model, conf and imgsz"""
+        return ResultCache.make_key(file_hash(image_path), self.cache.weights_hash(self.weights_file),
+                                    conf_threshold, self.imgsz)
+    
+    def _cached_result(self, image_path, detections, save=False, output_dir='runs/detect', image=None):
+        """
+        Result object for cached detections (same API as a model result)
+        
+        Args:
+            image_path: Source image path
+            detections: Detection dicts from the cache
+            save: Whether to write the annotated image to output_dir/image_results
+            output_dir: Directory to save results
+            image: Already decoded image, if available
+        """
+        if detections:
+            boxes = np.array([d['box'] for d in detections], dtype=np.float32)
+            conf = np.array([d['confidence'] for d in detections], dtype=np.float32)
+            cls = np.array([self.classes.index(d['class']) for d in detections], dtype=np.float32)
+        else:
+            boxes, conf, cls = np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.float32)
+        if image is None:
+            image = cv2.imread(str(image_path))
+        speed = {'preprocess': 0.0, 'inference': 0.0, 'postprocess': 0.0}
+        result = OnnxResults(image, OnnxBoxes(boxes, conf, cls), self.classes, self.colors, speed,
+                             path=str(image_path))
+        if save:
+            save_dir = Path(output_dir) / 'image_results'
+            save_dir.mkdir(parents=True, exist_ok=True)
+            cv2.imwrite(str(save_dir / Path(image_path).name), result.plot())
+        return result
+    
+    def _predict_frame(self, frame, conf_threshold, tiler=None):
+        """One frame through the model, or through its ROI crops / tiles when a RegionTiler is given"""
+        if tiler is not None:
+            return tiler.predict(self, frame, conf_threshold)
+        return self.model.predict(frame, conf=conf_threshold, imgsz=self.imgsz, verbose=False)[0]
+    
+    def _extract_detections(self, result):
+        """Convert one ultralytics result into a list of detection dicts"""
+        detections = []
+        for box in result.boxes:
+            cls = int(box.cls[0])
+            detections.append({
+                'class': self.classes[cls],
+                'confidence': float(box.conf[0]),
+                'box': [float(v) for v in box.xyxy[0]]
+            })
+        return detections
+    
+    def _decode_images(self, image_paths, frame_queue, num_workers):
+        """
+        Decode images in background threads and feed them to a bounded queue
+        
+        Args:
+            image_paths: List of image paths to decode
+            frame_queue: Bounded queue receiving (path, image) tuples
+            num_workers: Number of decode threads
+        
+        Returns:
+            List of started decode threads
+        """
+        path_iter = iter(image_paths)
+        lock = threading.Lock()
+        
+        def worker():
+            while True:
+                with lock:
+                    path = next(path_iter, None)
+                if path is None:
+                    break
+                image = cv2.imread(str(path))
+                if image is None:
+                    print(f"  Skipping unreadable image: {path}")
+                    continue
+                frame_queue.put((str(path), image))
+            frame_queue.put(None)  # One sentinel per worker
+        
+        threads = []
+        for _ in range(num_workers):
+            thread = threading.Thread(target=worker, daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+    
+    def predict_image_batches(self, image_paths, conf_threshold=0.5, save=True,
+                              output_dir='runs/detect', batch_size=8, num_workers=2):
+        """
+        Detect accidents in many images using batched inference
+        
+        Images are decoded by background threads into a bounded queue while the
+        model runs one forward pass per batch.
+        
+        Args:
+            image_paths: List of image paths
+            conf_threshold: Confidence threshold for detections
+            save: Whether to save annotated images
+            output_dir: Directory to save results
+            batch_size: Number of images per forward pass
+            num_workers: Number of background decode threads
+        
+        Returns:
+            List of batch result dicts with 'images', 'detections',
+            'inference_time' and 'images_per_sec' (cache hits come first as
+            one entry with 'cached': True)
+        """
+        batch_size = max(1, batch_size)
+        num_workers = max(1, num_workers)
+        save_dir = Path(output_dir) / 'image_results'
+        if save:
+            save_dir.mkdir(parents=True, exist_ok=True)
+        
+        batch_results = []
+        total_images = 0
+        finished_workers = 0
+        start_time = time.perf_counter()
+        
+        # Cache hits are neither inferred nor decoded (unless they have to be saved)
+        cache_keys = {}
+        if self.cache is not None:
+            cache_keys = {str(path): self._cache_key(path, conf_threshold) for path in image_paths}
+            cached = self.cache.get_many(cache_keys.values())
+            hit_paths = [str(path) for path in image_paths if cache_keys[str(path)] in cached]
+            if hit_paths:
+                hit_detections = [cached[cache_keys[path]] for path in hit_paths]
+                if save:
+                    for path, detections in zip(hit_paths, hit_detections):
+                        self._cached_result(path, detections, save, output_dir)
+                total_images += len(hit_paths)
+                batch_results.append({
+                    'images': hit_paths,
+                    'detections': hit_detections,
+                    'inference_time': 0.0,
+                    'images_per_sec': 0.0,
+                    'cached': True
+                })
+                print(f"  Cached: {len(hit_paths)} images, "
+                      f"{sum(len(d) for d in hit_detections)} detections")
+            image_paths = [path for path in image_paths if cache_keys[str(path)] not in cached]
+        
+        frame_queue = queue.Queue(maxsize=batch_size * 2)
+        self._decode_images(image_paths, frame_queue, num_workers)
+        
+        while finished_workers < num_workers:
+            paths, images = [], []
+            while len(images) < batch_size and finished_workers < num_workers:
+                item = frame_queue.get()
+                if item is None:
+                    finished_workers += 1
+                    continue
+                paths.append(item[0])
+                images.append(item[1])
+            if not images:
+                break
+            
+            batch_start = time.perf_counter()
+            results = self.model.predict(
+                source=images,
+                conf=conf_threshold,
+                imgsz=self.imgsz,
+                verbose=False
+            )
+            inference_time = time.perf_counter() - batch_start
+            
+            detections = []
+            for path, r in zip(paths, results):
+                detections.append(self._extract_detections(r))
+                if save:
+                    cv2.imwrite(str(save_dir / Path(path).name), r.plot())
+            if cache_keys:
+                self.cache.put_many([(cache_keys[path], d) for path, d in zip(paths, detections)])
+            
+            total_images += len(images)
+            batch_results.append({
+                'images': paths,
+                'detections': detections,
+                'inference_time': inference_time,
+                'images_per_sec': len(images) / inference_time if inference_time > 0 else 0.0
+            })
+            num_detections = sum(len(d) for d in detections)
+            print(f"  Batch {len(batch_results)}: {len(images)} images, "
+                  f"{num_detections} detections ({len(images) / max(inference_time, 1e-9):.1f} images/sec)")
+        
+        elapsed = time.perf_counter() - start_time
+        if total_images:
+            print(f"\nProcessed {total_images} images in {elapsed:.2f}s "
+                  f"({total_images / elapsed:.1f} images/sec)")
+        
+        return batch_results
+    
+    def predict_video(self, video_path, conf_threshold=0.5, save=True, output_dir='runs/detect',
+                      frame_stride=1, quiet_frames=30, table=None, timer=None, roi=None,
+                      track=False):
         """
         Detect accidents in a video
         
+        With frame_stride > 1 the video is sampled adaptively: the model runs on
+        every Nth frame, switches to every frame as soon as anything is detected,
+        and drops back to every Nth frame after quiet_frames frames without
+        detections. Frame numbers always refer to the original video.
+        
+        With save=False nothing is drawn or encoded (detections only). With
+        save=True drawing and encoding run in an AsyncVideoWriter thread.
+        
         Args:
             video_path: Path to input video
             conf_threshold: Confidence threshold for detections
-            save: Whether to save annotated video
+            save: Whether to save annotated video (False = headless, detections only)
             output_dir: Directory to save results
+            frame_stride: Infer every Nth frame while the scene is quiet (1 = every frame)
+            quiet_frames: Frames without detections before returning to frame_stride
+            table: Optional DetectionTable that receives every box with its geometry
+            timer: Optional StageTimer; records decode/preprocess/inference/
+                   postprocess/plot/encode per frame and prints a summary
+            roi: Optional RoiConfig; only the ROI crops / tiles configured for
+                 this video are run, boxes are in full-frame coordinates
+            track: Link detections into accident events with an AccidentTracker;
+                   the events are returned in the aggregator's .events
+        
+        Returns:
+            DetectionAggregator with per-class counts and the most recent detections
         """
         print(f"\nProcessing video: {video_path}")
         
-        # Run inference on video
-        results = self.model.predict(
-            source=video_path,
-            conf=conf_threshold,
-            save=save,
-            project=output_dir,
-            name='video_results',
-            exist_ok=True,
-            stream=True  # Stream for efficient processing
-        )
+        cap = cv2.VideoCapture(video_path)
+        detections = DetectionAggregator(self.classes)
+        if not cap.isOpened():
+            print(f"Could not open video: {video_path}")
+            return detections
         
-        # Process results
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        writer = None
+        if timer is None:
+            timer = StageTimer(enabled=False)
+        tiler = roi.for_source(video_path) if roi is not None else None
+        tracker = AccidentTracker(self.classes, fps=fps) if track else None
+        if save:
+            save_dir = Path(output_dir) / 'video_results'
+            save_dir.mkdir(parents=True, exist_ok=True)
+            save_path = save_dir / f"{Path(video_path).stem}.mp4"
+            writer = AsyncVideoWriter(save_path, fps, timer=timer)
+        
+        # Process frames
+        frame_stride = max(1, frame_stride)
         frame_count = 0
-        detections = []
+        frames_inferred = 0
+        next_infer_frame = 1
+        quiet_count = 0
+        dense = False
         
-        for r in results:
-            frame_count += 1
-            boxes = r.boxes
-            
-            if len(boxes) > 0:
-                for box in boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    class_name = self.classes[cls]
-                    detections.append({
-                        'frame': frame_count,
-                        'class': class_name,
-                        'confidence': conf
-                    })
-                    
-            if frame_count % 30 == 0:  # Print every 30 frames
-                print(f"  Processed {frame_count} frames...")
+        try:
+            while True:
+                infer = frame_count + 1 >= next_infer_frame
+                with timer.stage('decode'):
+                    if infer or save:
+                        ret, frame = cap.read()
+                    else:
+                        ret = cap.grab()  # Skip decoding frames we won't look at
+                if not ret:
+                    break
+                frame_count += 1
+                
+                if not infer:
+                    if writer is not None:
+                        writer.write(frame)
+                    timer.end_frame()
+                    continue
+                
+                r = self._predict_frame(frame, conf_threshold, tiler)
+                timer.record_speed(r.speed)
+                frames_inferred += 1
+                if table is not None:
+                    table.append_result(frame_count, frame_count / fps, r)
+                frame_detections = self._extract_detections(r)
+                # Timestamps are video time so the rolling window follows the footage
+                detections.add_many([{'frame': frame_count, **d} for d in frame_detections],
+                                    frame_count / fps)
+                if tracker is not None:
+                    tracker.update(frame_count, frame_detections)
+                
+                # Adaptive sampling: dense while anything is visible
+                if frame_detections:
+                    dense = True
+                    quiet_count = 0
+                elif dense:
+                    quiet_count += 1
+                    if quiet_count >= quiet_frames:
+                        dense = False
+                next_infer_frame = frame_count + (1 if dense else frame_stride)
+                
+                if writer is not None:
+                    writer.write(frame, r)  # Drawn and encoded on the writer thread
+                timer.end_frame()
+                
+                if frame_count % 30 == 0:  # Print every 30 frames
+                    print(f"  Processed {frame_count} frames...")
+        finally:
+            cap.release()
+            if writer is not None:
+                writer.close()
+                print(f"Saved annotated video: {save_path} ({writer.frames_written} frames)")
+        
+        detections.frame_count = frame_count
+        detections.frames_inferred = frames_inferred
+        if tracker is not None:
+            detections.events = tracker.finish()
         
         print(f"\nTotal frames processed: {frame_count}")
+        if frame_stride > 1:
+            print(f"Frames inferred: {frames_inferred} | Frames skipped: {frame_count - frames_inferred}")
         print(f"Total detections: {len(detections)}")
         
         # Summary of detections
         if detections:
-            print("\nDetection Summary:")
-            for cls in self.classes:
-                count = sum(1 for d in detections if d['class'] == cls)
-                if count > 0:
-                    avg_conf = sum(d['confidence'] for d in detections if d['class'] == cls) / count
-                    print(f"  {cls}: {count} detections (avg confidence: {avg_conf:.2%})")
+            self._print_summary(detections.summary())
+        if tracker is not None:
+            print(f"\n{tracker.summary()}")
+        timer.print_summary()
         
         return detections
     
-    def predict_realtime(self, source=0, conf_threshold=0.5):
+    def _print_summary(self, summary):
+        """Print a per-class detection summary"""
+        print("\nDetection Summary:")
+        for cls in self.classes:
+            entry = summary[cls]
+            if entry['count'] > 0:
+                print(f"  {cls}: {entry['count']} detections "
+                      f"(avg confidence: {entry['avg_confidence']:.2%})")
+    
+    def _merge_video_results(self, video_results):
+        """
+        Merge per-video detection statistics into one report
+        
+        Args:
+            video_results: Dict mapping video path to its DetectionAggregator
+        
+        Returns:
+            Dict with 'videos', 'total_detections', the merged 'summary' and
+            'event_counts' (per severity, when tracking was enabled)
+        """
+        merged = DetectionAggregator(self.classes)
+        for detections in video_results.values():
+            merged.merge(detections)
+        return {
+            'videos': video_results,
+            'total_detections': len(merged),
+            'summary': merged.summary(),
+            'event_counts': merged.event_counts()
+        }
+    
+    def predict_videos_parallel(self, video_paths, conf_threshold=0.5, save=True,
+                                output_dir='runs/detect', num_workers=None, torch_threads=None,
+                                video_options=None):
+        """
+        Process several videos in parallel worker processes
+        
+        Each worker loads its own detector, with this detector's backend,
+        tuning profile and result cache (reopened from the same file), and
+        pulls videos from the pool's shared work queue until none are left.
+        
+        Args:
+            video_paths: List of video paths
+            conf_threshold: Confidence threshold for detections
+            save: Whether to save annotated videos
+            output_dir: Directory to save results
+            num_workers: Number of worker processes (defaults to CPU count)
+            torch_threads: Torch intra-op threads per worker (None = the tuning
+                           profile's thread count, or 1 without a profile)
+            video_options: Extra keyword arguments for predict_video
+        
+        Returns:
+            Merged report (see _merge_video_results)
+        """
+        video_options = video_options or {}
+        video_paths = [str(v) for v in video_paths]
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = max(1, min(num_workers, len(video_paths)))
+        if torch_threads is None and self.tuning_profile is None:
+            torch_threads = 1
+        threads_text = f"{torch_threads} torch threads" if torch_threads else "tuning profile threads"
+        print(f"\nProcessing {len(video_paths)} videos with {num_workers} worker processes "
+              f"({threads_text} each)...")
+        cache_options = None
+        if self.cache is not None:
+            cache_options = {'path': str(self.cache.path), 'max_entries': self.cache.max_entries}
+        
+        video_results = {}
+        start_time = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_video_worker,
+            initargs=(self.model_path, torch_threads, self.detector_options, cache_options)
+        ) as executor:
+            futures = [
+                executor.submit(_run_video_worker, path, conf_threshold, save, output_dir, video_options)
+                for path in video_paths
+            ]
+            for future in as_completed(futures):
+                path, detections = future.result()
+                video_results[path] = detections
+                print(f"  Finished {Path(path).name}: {len(detections)} detections")
+        
+        # Keep the report in input order regardless of completion order
+        video_results = {path: video_results[path] for path in video_paths}
+        report = self._merge_video_results(video_results)
+        print(f"\nProcessed {len(video_paths)} videos in {time.perf_counter() - start_time:.1f}s")
+        print(f"Total detections: {report['total_detections']}")
+        if report['total_detections']:
+            self._print_summary(report['summary'])
+        if any(detections.events for detections in video_results.values()):
+            counts = report['event_counts']
+            print("Accident events: " + ", ".join(f"{cls}: {counts[cls]}" for cls in self.classes))
+        return report
+    
+    def predict_realtime(self, source=0, conf_threshold=0.5, motion_gate=None, pipelined=False,
+                         timer=None, roi=None):
         """
         Real-time detection from webcam or video stream
         
         Args:
             source: Video source (0 for webcam, or video path)
             conf_threshold: Confidence threshold for detections
+            motion_gate: Optional MotionGate; static frames reuse the last result
+            pipelined: Run capture, inference and display as separate stages that
+                       drop stale frames (see RealtimePipeline)
+            timer: Optional StageTimer for per-stage timings
+            roi: Optional RoiConfig with ROI polygons / tiling for this source
         """
         print(f"\nStarting real-time detection...")
         print("Press 'q' to quit")
         
+        if timer is None:
+            timer = StageTimer(enabled=False)
+        tiler = roi.for_source(source) if roi is not None else None
+        
+        if pipelined:
+            RealtimePipeline(self, source, conf_threshold, motion_gate, timer=timer, tiler=tiler).run()
+            if motion_gate is not None:
+                print(motion_gate.summary())
+            timer.print_summary()
+            print("Real-time detection stopped.")
+            return
+        
         cap = cv2.VideoCapture(source)
+        result = None
         
         while cap.isOpened():
-            ret, frame = cap.read()
+            with timer.stage('decode'):
+                ret, frame = cap.read()
             if not ret:
                 break
             
-            # Run inference
-            results = self.model.predict(frame, conf=conf_threshold, verbose=False)
+            # Run inference (unless the scene hasn't changed since the last one)
+            if motion_gate is None or motion_gate.should_infer(frame) or result is None:
+                result = self._predict_frame(frame, conf_threshold, tiler)
+                timer.record_speed(result.speed)
             
-            # Visualize results
-            annotated_frame = results[0].plot()
+            # Visualize results on the current frame
+            with timer.stage('plot'):
+                annotated_frame = result.plot(img=frame)
             
             # Display
-            cv2.imshow('Accident Severity Detection', annotated_frame)
+            with timer.stage('display'):
+                cv2.imshow('Accident Severity Detection', annotated_frame)
+                key = cv2.waitKey(1) & 0xFF
+            timer.end_frame()
             
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            if key == ord('q'):
                 break
         
         cap.release()
         cv2.destroyAllWindows()
+        if motion_gate is not None:
+            print(motion_gate.summary())
+        timer.print_summary()
         print("Real-time detection stopped.")
     
-    def batch_predict(self, input_dir, conf_threshold=0.5, save=True, output_dir='runs/detect'):
+    def batch_predict(self, input_dir, conf_threshold=0.5, save=True, output_dir='runs/detect',
+                      batch_size=1, num_workers=2, video_workers=1, torch_threads=None,
+                      video_options=None):
         """
         Batch prediction on multiple images/videos
         
@@ -162,8 +663,17 @@ class AccidentSeverityDetector:
             conf_threshold: Confidence threshold
             save: Whether to save results
             output_dir: Output directory
+            batch_size: Images per forward pass (1 processes images one by one)
+            num_workers: Background decode threads for batched image mode
+            video_workers: Worker processes for videos (1 processes them in this process)
+            torch_threads: Torch intra-op threads per video worker
+            video_options: Extra keyword arguments for predict_video
+        
+        Returns:
+            Merged video report (see _merge_video_results), or None if no videos
         """
         input_path = Path(input_dir)
+        video_options = video_options or {}
         image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
         video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm']
         
@@ -171,15 +681,28 @@ class AccidentSeverityDetector:
         images = [f for f in input_path.glob('*') if f.suffix.lower() in image_extensions]
         if images:
             print(f"\nProcessing {len(images)} images...")
-            for img in images:
-                self.predict_image(str(img), conf_threshold, save, output_dir)
+            if batch_size > 1:
+                self.predict_image_batches(images, conf_threshold, save, output_dir,
+                                           batch_size, num_workers)
+            else:
+                for img in images:
+                    self.predict_image(str(img), conf_threshold, save, output_dir)
+            if self.cache is not None:
+                print(self.cache.summary())
         
         # Process videos
         videos = [f for f in input_path.glob('*') if f.suffix.lower() in video_extensions]
         if videos:
+            if video_workers > 1 and len(videos) > 1:
+                return self.predict_videos_parallel(videos, conf_threshold, save, output_dir,
+                                                    video_workers, torch_threads, video_options)
             print(f"\nProcessing {len(videos)} videos...")
+            video_results = {}
             for vid in videos:
-                self.predict_video(str(vid), conf_threshold, save, output_dir)
+                video_results[str(vid)] = self.predict_video(str(vid), conf_threshold, save, output_dir,
+                                                             **video_options)
+            return self._merge_video_results(video_results)
+        return None
 
 def main():
     parser = argparse.ArgumentParser(description='YOLOv11 Accident Severity Detection')
@@ -196,28 +719,93 @@ def main():
                        help='Output directory')
     parser.add_argument('--realtime', action='store_true',
                        help='Real-time detection mode')
+    parser.add_argument('--backend', type=str, default='torch', choices=['torch', 'onnx'],
+                       help='Inference backend (onnx uses the exported .onnx next to --model)')
+    parser.add_argument('--imgsz', type=int, default=640,
+                       help='Inference image size')
+    parser.add_argument('--tuning-profile', type=str, default=None,
+                       help='autotune.py profile; overrides --imgsz and thread counts')
+    parser.add_argument('--intra-threads', type=int, default=None,
+                       help='ONNX Runtime intra-op threads')
+    parser.add_argument('--inter-threads', type=int, default=None,
+                       help='ONNX Runtime inter-op threads')
+    parser.add_argument('--batch-size', type=int, default=1,
+                       help='Images per forward pass when processing a directory')
+    parser.add_argument('--workers', type=int, default=2,
+                       help='Background image decode threads for batched mode')
+    parser.add_argument('--video-workers', type=int, default=1,
+                       help='Worker processes for a directory of videos')
+    parser.add_argument('--torch-threads', type=int, default=None,
+                       help='Torch intra-op threads per video worker')
+    parser.add_argument('--frame-stride', type=int, default=1,
+                       help='Infer every Nth video frame until something is detected')
+    parser.add_argument('--quiet-frames', type=int, default=30,
+                       help='Frames without detections before returning to --frame-stride')
+    parser.add_argument('--export', type=str, default=None,
+                       help='Video mode: save all detections with boxes to .npz or .parquet')
+    parser.add_argument('--motion-gate', action='store_true',
+                       help='Real-time mode: skip inference on frames without motion')
+    parser.add_argument('--motion-sensitivity', type=float, default=0.02,
+                       help='Fraction of changed pixels that counts as motion')
+    parser.add_argument('--refresh-interval', type=int, default=30,
+                       help='Force an inference after this many skipped frames')
+    parser.add_argument('--pipelined', action='store_true',
+                       help='Real-time mode: separate capture/inference/display threads')
+    parser.add_argument('--cache', action='store_true',
+                       help='Image / folder mode: reuse stored detections for unchanged images')
+    parser.add_argument('--cache-path', type=str, default='runs/cache/results.sqlite',
+                       help='Result cache database (shared safely by several processes)')
+    parser.add_argument('--cache-size', type=int, default=100000,
+                       help='Maximum cached images before least recently used ones are evicted')
+    parser.add_argument('--roi', type=str, default=None,
+                       help='Video / real-time mode: JSON with per-source ROI polygons and tiling (see roi.py)')
+    parser.add_argument('--track', action='store_true',
+                       help='Video mode: group detections into accident events (start/end, peak, severity timeline)')
+    parser.add_argument('--profile', action='store_true',
+                       help='Video / real-time mode: print per-stage timings (decode, inference, plot, ...)')
     
     args = parser.parse_args()
     
     # Initialize detector
-    detector = AccidentSeverityDetector(args.model)
+    cache = ResultCache(args.cache_path, args.cache_size) if args.cache else None
+    detector = AccidentSeverityDetector(args.model, args.backend, args.imgsz,
+                                        args.intra_threads, args.inter_threads,
+                                        args.tuning_profile, cache)
+    
+    roi = RoiConfig.load(args.roi) if args.roi else None
+    video_options = {'frame_stride': args.frame_stride, 'quiet_frames': args.quiet_frames,
+                     'roi': roi, 'track': args.track}
     
     # Determine input type and process
     if args.realtime:
         source = 0 if args.source == '0' else args.source
-        detector.predict_realtime(source, args.conf)
+        motion_gate = None
+        if args.motion_gate:
+            motion_gate = MotionGate(args.motion_sensitivity, refresh_interval=args.refresh_interval)
+        timer = StageTimer() if args.profile else None
+        detector.predict_realtime(source, args.conf, motion_gate, args.pipelined, timer, roi)
     elif os.path.isfile(args.source):
         # Single file
         ext = os.path.splitext(args.source)[1].lower()
         if ext in ['.jpg', '.jpeg', '.png', '.bmp', '.webp']:
             detector.predict_image(args.source, args.conf, args.save, args.output)
+            if cache is not None:
+                print(cache.summary())
         elif ext in ['.mp4', '.avi', '.mov', '.mkv', '.webm']:
-            detector.predict_video(args.source, args.conf, args.save, args.output)
+            table = DetectionTable(detector.classes) if args.export else None
+            timer = StageTimer() if args.profile else None
+            detector.predict_video(args.source, args.conf, args.save, args.output,
+                                   table=table, timer=timer, **video_options)
+            if table is not None:
+                table.export(args.export)
+                print(f"Exported {len(table)} detections to {args.export}")
         else:
             print(f"Unsupported file format: {ext}")
     elif os.path.isdir(args.source):
         # Directory
-        detector.batch_predict(args.source, args.conf, args.save, args.output)
+        detector.batch_predict(args.source, args.conf, args.save, args.output,
+                               args.batch_size, args.workers,
+                               args.video_workers, args.torch_threads, video_options)
     else:
         print(f"Invalid source: {args.source}")
 
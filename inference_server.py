@@ -0,0 +1,484 @@
+"""
+Accident Severity Detection HTTP Service
+Local HTTP API around AccidentSeverityDetector; concurrent requests are
+coalesced into micro-batches so the model runs one forward pass per batch
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from detection_stats import DetectionAggregator
+
+
+def percentile(sorted_values, q):
+    """q-th percentile (0-100) of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+class MicroBatcher:
+    """
+    Collects single-image requests into batches for the detector
+
+    The worker thread blocks for the first request, then keeps collecting
+    until max_batch_size requests are waiting or max_wait_ms has passed
+    since the first one arrived, and runs them as one model.predict call.
+    Requests may use different confidence thresholds: the batch runs at the
+    lowest one and each result is filtered to its own threshold.
+    """
+
+    def __init__(self, detector, max_batch_size=8, max_wait_ms=10.0, max_queue=256):
+        """
+        Args:
+            detector: AccidentSeverityDetector that owns the model
+            max_batch_size: Maximum images per forward pass
+            max_wait_ms: Longest time the first request waits for others to join
+            max_queue: Pending requests allowed before submit() rejects new ones
+        """
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue(maxsize=max_queue)
+
+        self.latencies = deque(maxlen=10000)  # Most recent submit-to-result latencies (ms)
+        self.batch_sizes = deque(maxlen=10000)
+        self.completed = 0
+        self.errors = 0
+        self._stats_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, image, conf_threshold=0.5, timeout=None):
+        """
+        Queue one BGR image for detection
+
+        Args:
+            image: BGR image
+            conf_threshold: Confidence threshold for this request
+            timeout: Seconds to wait for room in a full queue (None = reject at once)
+
+        Returns:
+            Future resolving to a list of detection dicts
+
+        Raises:
+            queue.Full: If max_queue requests are already waiting (after timeout)
+        """
+        future = Future()
+        item = (image, conf_threshold, future, time.perf_counter())
+        if timeout is None:
+            self.requests.put_nowait(item)
+        else:
+            self.requests.put(item, timeout=timeout)
+        return future
+
+    def _next_batch(self):
+        """Block for one request, then gather more until the batch is full or max_wait passes"""
+        try:
+            first = self.requests.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Whatever failed, no caller is left waiting and the worker keeps running
+                failed = [future for _, _, future, _ in batch if not future.done()]
+                for future in failed:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self.errors += len(failed)
+
+    def _process(self, batch):
+        """Run one batch through the model and resolve every request's future"""
+        images = [item[0] for item in batch]
+        min_conf = min(item[1] for item in batch)
+        results = list(self.detector.model.predict(images, conf=min_conf,
+                                                   imgsz=self.detector.imgsz, verbose=False))
+        if len(results) != len(batch):
+            raise RuntimeError(f"Model returned {len(results)} results for {len(batch)} images")
+
+        done_at = time.perf_counter()
+        with self._stats_lock:
+            self.batch_sizes.append(len(batch))
+        for (_, conf, future, submitted_at), r in zip(batch, results):
+            try:
+                detections = [d for d in self.detector._extract_detections(r) if d['confidence'] >= conf]
+            except Exception as e:
+                future.set_exception(e)
+                with self._stats_lock:
+                    self.errors += 1
+                continue
+            with self._stats_lock:
+                self.latencies.append((done_at - submitted_at) * 1000)
+                self.completed += 1
+            future.set_result(detections)
+
+    def metrics(self):
+        """Queue depth, request counts, batch sizes and latency percentiles"""
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+            batch_sizes = list(self.batch_sizes)
+            completed = self.completed
+            errors = self.errors
+        return {
+            'queue_depth': self.requests.qsize(),
+            'completed': completed,
+            'errors': errors,
+            'batches': len(batch_sizes),
+            'avg_batch_size': sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0.0,
+            'latency_ms_p50': percentile(latencies, 50),
+            'latency_ms_p99': percentile(latencies, 99),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000
+        }
+
+    def close(self):
+        self._stop.set()
+        self.thread.join(timeout=2)
+
+
+def detect_video(batcher, video_path, conf_threshold=0.5, frame_stride=1, submit_timeout=30.0):
+    """
+    Run a video through the batcher so its frames share batches with image requests
+
+    Args:
+        batcher: MicroBatcher
+        video_path: Path to a video file readable by the server
+        conf_threshold: Confidence threshold
+        frame_stride: Run detection on every Nth frame
+        submit_timeout: Seconds a frame waits for room in the batcher queue when
+                        image requests have filled it, before the video fails
+
+    Returns:
+        Dict with per-frame detections and a per-class summary
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    aggregator = DetectionAggregator()
+    frames = []
+    pending = []
+
+    def drain():
+        for frame_index, future in pending:
+            detections = future.result()
+            aggregator.add_many(detections, frame_index / fps)
+            if detections:
+                frames.append({'frame': frame_index, 'time': frame_index / fps, 'detections': detections})
+        pending.clear()
+
+    frame_index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_index % frame_stride == 0:
+                pending.append((frame_index, batcher.submit(frame, conf_threshold, timeout=submit_timeout)))
+                # Keep about one batch in flight so a long video can't fill the queue
+                if len(pending) >= batcher.max_batch_size:
+                    drain()
+            frame_index += 1
+        drain()
+    finally:
+        cap.release()
+
+    return {
+        'video': video_path,
+        'frames': frame_index,
+        'frames_inferred': (frame_index + frame_stride - 1) // frame_stride,
+        'summary': aggregator.summary(),
+        'detections': frames
+    }
+
+
+class DetectionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        POST /detect         raw JPEG/PNG bytes, optional ?conf=0.5
+        POST /detect/video   JSON {"path": ..., "conf": 0.5, "frame_stride": 1}
+                             (path is relative to --media-root; disabled without one)
+        GET  /metrics        queue depth, batch sizes, p50/p99 latency
+        GET  /health
+    """
+
+    server_version = 'AccidentDetection/1.0'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            self._send_json(200, self.server.batcher.metrics())
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok', 'model': self.server.detector.model_path,
+                                  'backend': self.server.detector.backend})
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint: {path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == '/detect':
+                self._detect_image(url)
+            elif url.path == '/detect/video':
+                self._detect_video()
+            else:
+                self._send_json(404, {'error': f"Unknown endpoint: {url.path}"})
+        except queue.Full:
+            self._send_json(503, {'error': 'Server busy, try again later'})
+        except PermissionError as e:
+            self._send_json(403, {'error': str(e)})
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+
+    def _detect_image(self, url):
+        params = parse_qs(url.query)
+        conf = float(params.get('conf', [self.server.conf_threshold])[0])
+        data = self._read_body()
+        if not data:
+            raise ValueError("Request body must contain JPEG or PNG image bytes")
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode image (expected JPEG or PNG)")
+
+        start = time.perf_counter()
+        detections = self.server.batcher.submit(image, conf).result()
+        self._send_json(200, {
+            'detections': detections,
+            'image_size': [image.shape[1], image.shape[0]],
+            'latency_ms': (time.perf_counter() - start) * 1000
+        })
+
+    def _detect_video(self):
+        try:
+            request = json.loads(self._read_body() or b'{}')
+        except json.JSONDecodeError:
+            raise ValueError("Request body must be JSON")
+        if 'path' not in request:
+            raise ValueError("Missing 'path'")
+        video_path = self._resolve_media_path(request['path'])
+        result = detect_video(self.server.batcher, str(video_path),
+                              float(request.get('conf', self.server.conf_threshold)),
+                              max(1, int(request.get('frame_stride', 1))))
+        self._send_json(200, result)
+
+    def _resolve_media_path(self, requested):
+        """
+        Map a client-supplied path onto a file under the server's media root
+
+        Args:
+            requested: Path from the request body, relative to the media root
+
+        Returns:
+            Resolved Path inside the media root
+        """
+        media_root = self.server.media_root
+        if media_root is None:
+            raise PermissionError("Video endpoint disabled (start the server with --media-root)")
+        # resolve() follows symlinks and '..', so the containment check sees the real target
+        path = (media_root / str(requested)).resolve()
+        if not path.is_relative_to(media_root):
+            raise PermissionError(f"Path is outside the media root: {requested}")
+        if not path.is_file():
+            raise ValueError(f"Video not found: {requested}")
+        return path
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(detector, host='127.0.0.1', port=8000, conf_threshold=0.5,
+                  max_batch_size=8, max_wait_ms=10.0, verbose=False, media_root=None):
+    """
+    Build (but don't start) the HTTP server and its micro-batcher
+
+    Args:
+        media_root: Directory /detect/video may read from; None disables the endpoint
+
+    Returns:
+        ThreadingHTTPServer with .batcher and .detector attached
+    """
+    server = ThreadingHTTPServer((host, port), DetectionRequestHandler)
+    server.daemon_threads = True
+    server.detector = detector
+    server.batcher = MicroBatcher(detector, max_batch_size, max_wait_ms)
+    server.conf_threshold = conf_threshold
+    server.verbose = verbose
+    server.media_root = Path(media_root).resolve() if media_root else None
+    return server
+
+
+def load_test(url, image_path=None, concurrency=8, total_requests=200, conf_threshold=0.5):
+    """
+    Fire total_requests POST /detect calls from concurrency threads
+
+    Args:
+        url: Server base URL, e.g. http://127.0.0.1:8000
+        image_path: Image to send (a synthetic 640x480 JPEG if None)
+        concurrency: Number of client threads
+        total_requests: Requests to send in total
+        conf_threshold: conf query parameter
+
+    Returns:
+        Dict with throughput, client-side latency percentiles and server metrics
+    """
+    if image_path:
+        with open(image_path, 'rb') as f:
+            payload = f.read()
+    else:
+        image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        payload = cv2.imencode('.jpg', image)[1].tobytes()
+
+    endpoint = f"{url.rstrip('/')}/detect?conf={conf_threshold}"
+
+    def send(_):
+        request = urllib.request.Request(endpoint, data=payload, method='POST',
+                                         headers={'Content-Type': 'image/jpeg'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                ok = response.status == 200
+        except Exception:
+            ok = False
+        return (time.perf_counter() - start) * 1000, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(send, range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, ok in outcomes if ok)
+    with urllib.request.urlopen(f"{url.rstrip('/')}/metrics", timeout=10) as response:
+        server_metrics = json.loads(response.read())
+
+    report = {
+        'requests': total_requests,
+        'failed': sum(1 for _, ok in outcomes if not ok),
+        'concurrency': concurrency,
+        'elapsed_s': elapsed,
+        'requests_per_sec': total_requests / elapsed if elapsed else 0.0,
+        'latency_ms_p50': percentile(latencies, 50),
+        'latency_ms_p99': percentile(latencies, 99),
+        'server': server_metrics
+    }
+
+    print("\nLoad Test Results:")
+    print(f"  {report['requests']} requests, {report['failed']} failed, concurrency {concurrency}")
+    print(f"  Throughput: {report['requests_per_sec']:.1f} req/s")
+    print(f"  Client latency: p50 {report['latency_ms_p50']:.1f} ms, p99 {report['latency_ms_p99']:.1f} ms")
+    print(f"  Server: avg batch size {server_metrics['avg_batch_size']:.2f}, "
+          f"p50 {server_metrics['latency_ms_p50']:.1f} ms, p99 {server_metrics['latency_ms_p99']:.1f} ms")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accident severity detection HTTP service')
+    parser.add_argument('--model', type=str,
+                       default='runs/train/accident_severity_yolov11/weights/best.pt',
+                       help='Path to trained model')
+    parser.add_argument('--backend', type=str, default='torch', choices=['torch', 'onnx'],
+                       help='Inference backend')
+    parser.add_argument('--imgsz', type=int, default=640,
+                       help='Inference image size')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                       help='Address to bind')
+    parser.add_argument('--port', type=int, default=8000,
+                       help='Port to listen on')
+    parser.add_argument('--conf', type=float, default=0.5,
+                       help='Default confidence threshold')
+    parser.add_argument('--max-batch-size', type=int, default=8,
+                       help='Maximum images per forward pass')
+    parser.add_argument('--max-wait-ms', type=float, default=10.0,
+                       help='Longest time a request waits for a batch to fill')
+    parser.add_argument('--media-root', type=str, default=None,
+                       help='Directory POST /detect/video may read videos from (endpoint disabled if unset)')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Log every request')
+    parser.add_argument('--load-test', action='store_true',
+                       help='Run the load-test client against --url instead of serving')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8000',
+                       help='Server URL for --load-test')
+    parser.add_argument('--image', type=str, default=None,
+                       help='Image for --load-test (synthetic JPEG if omitted)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                       help='Client threads for --load-test')
+    parser.add_argument('--requests', type=int, default=200,
+                       help='Total requests for --load-test')
+
+    args = parser.parse_args()
+
+    if args.load_test:
+        load_test(args.url, args.image, args.concurrency, args.requests, args.conf)
+        return
+
+    from inference import AccidentSeverityDetector
+
+    detector = AccidentSeverityDetector(args.model, args.backend, args.imgsz)
+    server = create_server(detector, args.host, args.port, args.conf,
+                           args.max_batch_size, args.max_wait_ms, args.verbose,
+                           args.media_root)
+    print(f"[Server] Listening on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms:.0f} ms)")
+    print("[Server] POST /detect, POST /detect/video, GET /metrics, GET /health")
+    if server.media_root:
+        print(f"[Server] /detect/video serves files under {server.media_root}")
+    else:
+        print("[Server] /detect/video disabled (no --media-root)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[Server] Shutting down...")
+    finally:
+        server.server_close()
+        server.batcher.close()
+
+
+if __name__ == "__main__":
+    main()
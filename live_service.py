@@ -0,0 +1,306 @@
+"""
+Headless Live Detection Service
+Camera ingest, severe accident detection, SMS alerting and periodic stats
+without any display - for servers and edge boxes with no GUI
+"""
+
+import argparse
+import signal
+import threading
+import time
+from concurrent.futures import wait
+
+from inference import AccidentSeverityDetector
+from motion_gate import MotionGate
+from multi_stream import StreamReader
+from detection_stats import DetectionAggregator
+from stage_timer import StageTimer
+from alert_outbox import AlertOutbox
+from alert_policy import AlertPolicy, format_alert
+from tracker import AccidentTracker
+
+# Import Twilio SMS (optional - the service runs without it)
+try:
+    from twilio_sms import TwilioSMSAlert
+    TWILIO_AVAILABLE = True
+except Exception as e:
+    print(f"[Warning] Twilio SMS not available: {e}")
+    TWILIO_AVAILABLE = False
+    TwilioSMSAlert = None
+
+
+class LiveDetectionService:
+    """
+    Same detection logic as the UI's live mode, minus the window
+
+    Frames come from a StreamReader (newest frame wins, cameras and RTSP
+    streams reconnect), static frames reuse the last result through the
+    motion gate, and detections are tracked into accident events. An
+    AlertPolicy decides which events alert (deduplicated per event,
+    escalations right away, bursts batched); alerts are only queued
+    (TwilioSMSAlert.dispatch_accident_alert or an AlertOutbox) so the
+    detection loop never waits on Twilio.
+    """
+
+    def __init__(self, detector, source=0, conf_threshold=0.5, sms_alert=None,
+                 motion_gate=None, stats_interval=30.0, policy=None,
+                 source_name="Live Camera Feed", timer=None, outbox=None):
+        """
+        Args:
+            detector: AccidentSeverityDetector
+            source: Camera index, video file or stream URL
+            conf_threshold: Confidence threshold for detections
+            sms_alert: Optional TwilioSMSAlert
+            motion_gate: Optional MotionGate; static frames reuse the last result
+            stats_interval: Seconds between stats lines (0 disables)
+            policy: AlertPolicy deciding which events alert (default: AlertPolicy())
+            source_name: Name used in SMS alerts
+            timer: Optional StageTimer for per-stage timings
+            outbox: Optional AlertOutbox; alerts are written to it and sent (with
+                    retries, also after a restart) by its background sender
+        """
+        self.detector = detector
+        self.conf_threshold = conf_threshold
+        self.sms_alert = sms_alert
+        self.motion_gate = motion_gate
+        self.stats_interval = stats_interval
+        self.policy = policy if policy is not None else AlertPolicy()
+        self.source_name = source_name
+        self.timer = timer if timer is not None else StageTimer(enabled=False)
+        self.outbox = outbox
+
+        self.stop_event = threading.Event()
+        self.reader = StreamReader('live', source, threading.Event(), loop_files=False)
+        self.detections = DetectionAggregator(detector.classes, window_seconds=60.0)
+        # Unbounded sessions: keep recent finished events, event_counts() still sees them all
+        self.tracker = AccidentTracker(detector.classes, max_events=1000)
+        self.frame_count = 0
+        self.alerts_sent = 0
+        self._alerts = []
+        self._start = None
+        self._session = int(time.time())
+
+    def stop(self):
+        """Request a clean shutdown (safe to call from a signal handler)"""
+        self.stop_event.set()
+
+    def _send_alert(self, alert):
+        """Queue the SMS for an AlertPolicy alert; contacts are sent concurrently by TwilioSMSAlert's pool"""
+        message = format_alert(alert)
+        print(f"[Live Service] ALERT at frame {self.frame_count}: {message}")
+        # Accident events, not per-box totals across frames
+        event_counts = self.tracker.event_counts()
+        if self.outbox is not None:
+            # One idempotency key per alert of this run, so a replay can't duplicate it
+            self.sms_alert.queue_accident_alert(
+                self.outbox,
+                video_name=self.source_name,
+                frame_count=self.frame_count,
+                fire_count=event_counts['fire'],
+                moderate_count=event_counts['moderate'],
+                severe_count=event_counts['severe'],
+                alert_key=f"{self.source_name}:{self._session}:{alert['id']}",
+                message=message
+            )
+            self.alerts_sent += 1
+            return
+        future = self.sms_alert.dispatch_accident_alert(
+            video_name=self.source_name,
+            frame_count=self.frame_count,
+            fire_count=event_counts['fire'],
+            moderate_count=event_counts['moderate'],
+            severe_count=event_counts['severe'],
+            message=message
+        )
+        if future is None:
+            return
+
+        def report(f):
+            try:
+                results = f.result()
+                sent = sum(1 for r in results if r['status'] == 'success')
+                print(f"[Live Service] SMS sent to {sent}/{len(results)} contact(s)")
+            except Exception as e:
+                print(f"[SMS] Error sending SMS: {e}")
+
+        future.add_done_callback(report)
+        self._alerts = [a for a in self._alerts if not a.done()] + [future]
+        self.alerts_sent += 1
+
+    def stats(self):
+        """Frames, FPS, inferences, per-class totals and severe count in the last 60s"""
+        elapsed = time.perf_counter() - self._start if self._start else 0.0
+        stats = {
+            'frames': self.frame_count,
+            'fps': self.frame_count / elapsed if elapsed else 0.0,
+            'dropped_frames': self.reader.queue.dropped,
+            'counts': dict(self.detections.counts),
+            'recent_severe': self.detections.window_counts()['severe'],
+            'events': sum(self.tracker.event_counts().values()),
+            'alerts_sent': self.alerts_sent,
+            'suppressed_alerts': self.policy.suppressed
+        }
+        if self.motion_gate is not None:
+            stats['inferences'] = self.motion_gate.inferences
+            stats['skipped_inferences'] = self.motion_gate.skipped
+        return stats
+
+    def _print_stats(self):
+        s = self.stats()
+        line = (f"[Live Service] {s['frames']} frames ({s['fps']:.1f} FPS) | "
+                f"Fire: {s['counts']['fire']} | Moderate: {s['counts']['moderate']} | "
+                f"Severe: {s['counts']['severe']} (last 60s: {s['recent_severe']}) | "
+                f"Events: {s['events']} | Alerts: {s['alerts_sent']} "
+                f"(suppressed {s['suppressed_alerts']})")
+        if 'skipped_inferences' in s:
+            line += f" | Inferences saved: {s['skipped_inferences']}"
+        print(line)
+
+    def run(self):
+        """Process frames until stop() is called or the source ends; returns stats()"""
+        alerts_enabled = self.sms_alert is not None and self.sms_alert.enabled
+        print(f"[Live Service] Starting on source {self.reader.source} "
+              f"(SMS alerts {'on' if alerts_enabled else 'off'})")
+        self.reader.start()
+        self._start = time.perf_counter()
+        last_stats = self._start
+        results = None
+        frame_detections = []
+
+        try:
+            while not self.stop_event.is_set():
+                with self.timer.stage('capture_wait'):
+                    item = self.reader.queue.get(timeout=0.5)
+                if item is None:
+                    if self.reader.finished:
+                        break
+                    continue
+                frame, _ = item
+                self.frame_count += 1
+
+                # Run inference (static frames reuse the last result)
+                if self.motion_gate is None or self.motion_gate.should_infer(frame) or results is None:
+                    results = self.detector.model.predict(frame, conf=self.conf_threshold,
+                                                          imgsz=self.detector.imgsz, verbose=False)
+                    self.timer.record_speed(results[0].speed)
+                    frame_detections = self.detector._extract_detections(results[0])
+                    self.detections.add_many([{'frame': self.frame_count, **d} for d in frame_detections])
+
+                # The tracker sees every frame (static frames repeat the last result), as in
+                # the UI, so min_hits / max_age count frames and a motion-gated gap between
+                # inferences can't end an event. One alert per accident event, not per frame.
+                for track in self.tracker.update(self.frame_count, frame_detections):
+                    alert = self.policy.observe(self.source_name, track.id, track.class_counts)
+                    if alert and alerts_enabled:
+                        self._send_alert(alert)
+                # Batched alerts leave once the batch window is over
+                alert = self.policy.poll()
+                if alert and alerts_enabled:
+                    self._send_alert(alert)
+                self.timer.end_frame()
+
+                if self.stats_interval and time.perf_counter() - last_stats >= self.stats_interval:
+                    self._print_stats()
+                    last_stats = time.perf_counter()
+        finally:
+            self.reader.stop()
+            self.reader.thread.join(timeout=2)
+            # Alerts still waiting for their batch window go out now rather than never
+            while self.policy.pending():
+                alert = self.policy.flush()
+                if alerts_enabled:
+                    self._send_alert(alert)
+            # Let alerts that are already on their way finish before exiting
+            if self._alerts:
+                wait(self._alerts, timeout=30)
+
+        print("[Live Service] Stopped")
+        self._print_stats()
+        if self.motion_gate is not None:
+            print(f"[Live Service] {self.motion_gate.summary()}")
+        self.timer.print_summary("[Live Service] Stage Timing")
+        return self.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless live accident detection service')
+    parser.add_argument('--source', type=str, default='0',
+                       help='Camera index, video file or RTSP URL')
+    parser.add_argument('--model', type=str,
+                       default='runs/train/accident_severity_yolov11/weights/best.pt',
+                       help='Path to trained model')
+    parser.add_argument('--backend', type=str, default='torch', choices=['torch', 'onnx'],
+                       help='Inference backend')
+    parser.add_argument('--imgsz', type=int, default=640,
+                       help='Inference image size')
+    parser.add_argument('--tuning-profile', type=str, default=None,
+                       help='autotune.py profile; overrides --imgsz and thread count')
+    parser.add_argument('--conf', type=float, default=0.5,
+                       help='Confidence threshold')
+    parser.add_argument('--no-motion-gate', action='store_true',
+                       help='Run inference on every frame')
+    parser.add_argument('--motion-sensitivity', type=float, default=0.02,
+                       help='Fraction of changed pixels that counts as motion')
+    parser.add_argument('--refresh-interval', type=int, default=30,
+                       help='Force an inference after this many skipped frames')
+    parser.add_argument('--twilio-config', type=str, default='twilio_config.json',
+                       help='Twilio configuration file')
+    parser.add_argument('--no-sms', action='store_true',
+                       help='Disable SMS alerts')
+    parser.add_argument('--outbox', type=str, default=None,
+                       help='SQLite alert outbox (e.g. runs/alerts/outbox.sqlite): alerts are '
+                            'retried with backoff and replayed after a restart')
+    parser.add_argument('--alert-window', '--alert-cooldown', dest='alert_window', type=float,
+                       default=300.0,
+                       help='Seconds before the same accident event is alerted again')
+    parser.add_argument('--alert-batch-window', type=float, default=10.0,
+                       help='Minimum seconds between SMS messages; alerts in between are batched')
+    parser.add_argument('--stats-interval', type=float, default=30.0,
+                       help='Seconds between stats lines')
+    parser.add_argument('--profile', action='store_true',
+                       help='Print per-stage timings at shutdown')
+
+    args = parser.parse_args()
+
+    detector = AccidentSeverityDetector(args.model, args.backend, args.imgsz,
+                                        tuning_profile=args.tuning_profile)
+
+    sms_alert = None
+    if not args.no_sms and TWILIO_AVAILABLE:
+        try:
+            sms_alert = TwilioSMSAlert(args.twilio_config)
+        except Exception as e:
+            print(f"[SMS] Failed to initialize SMS alerts: {e}")
+
+    outbox = None
+    if sms_alert is not None and sms_alert.enabled and args.outbox:
+        outbox = AlertOutbox(args.outbox, sender=sms_alert.outbox_sender())
+        outbox.start()
+
+    motion_gate = None
+    if not args.no_motion_gate:
+        motion_gate = MotionGate(args.motion_sensitivity, refresh_interval=args.refresh_interval)
+
+    service = LiveDetectionService(detector, args.source, args.conf, sms_alert, motion_gate,
+                                   args.stats_interval,
+                                   AlertPolicy(args.alert_window, args.alert_batch_window),
+                                   timer=StageTimer() if args.profile else None, outbox=outbox)
+
+    # Ctrl+C / systemd stop: finish the current frame and shut down cleanly
+    def handle_signal(signum, frame):
+        print(f"\n[Live Service] Received signal {signum}, shutting down...")
+        service.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    service.run()
+    if outbox is not None:
+        # Give queued alerts a moment to go out; the rest are sent on the next start
+        outbox.flush(timeout=10)
+        print(f"[Live Service] Outbox: {outbox.counts()}")
+        outbox.close()
+
+
+if __name__ == "__main__":
+    main()
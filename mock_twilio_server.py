@@ -0,0 +1,574 @@
+"""
+Local Twilio Stand-in Server
+Implements the part of the Twilio REST API the alert scripts use (Messages,
+Accounts, OutgoingCallerIds) with configurable latency, errors, rate limits
+and queued -> delivered transitions, so the alert path can be load-tested
+offline. Point TwilioSMSAlert at it with "api_base_url" in twilio_config.json
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import wait
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+API_VERSION = '2010-04-01'
+E164 = re.compile(r'^\+[1-9]\d{6,14}$')
+
+# Status after each delay (seconds since the message was created)
+DEFAULT_TRANSITIONS = (('queued', 0.0), ('sending', 0.5), ('sent', 1.0), ('delivered', 2.0))
+
+
+def percentile(sorted_values, q):
+    """q-th percentile (0-100) of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+def rfc2822(timestamp):
+    """Twilio's date format, e.g. 'Sat, 17 Oct 2026 10:30:15 +0000'"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%a, %d %b %Y %H:%M:%S +0000')
+
+
+class TwilioError(Exception):
+    """Error answered in Twilio's JSON error format"""
+
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class TokenBucket:
+    """rate requests per second with bursts of up to burst requests"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class MockTwilioState:
+    """
+    Accounts, messages and counters behind the mock server
+
+    Message status is derived from the message's age when it is read, so
+    no background thread is needed: queued -> sending -> sent -> delivered
+    (or undelivered for numbers in undelivered_numbers).
+    """
+
+    def __init__(self, account_sid='ACmock00000000000000000000000000', auth_token='mock_token',
+                 trial=True, verified_numbers=None, invalid_numbers=None, undelivered_numbers=None,
+                 latency_ms=50.0, jitter_ms=20.0, rate_limit=None, rate_burst=None,
+                 server_error_rate=0.0, transitions=DEFAULT_TRANSITIONS, seed=None):
+        """
+        Args:
+            account_sid: Accepted account SID
+            auth_token: Accepted auth token (anything else answers 20003)
+            trial: Trial account: sending to a number outside verified_numbers answers 21608
+            verified_numbers: Verified caller IDs (None = every valid number counts as verified)
+            invalid_numbers: Numbers rejected with 21211 (besides non-E.164 numbers)
+            undelivered_numbers: Numbers whose messages end 'undelivered' (30003)
+            latency_ms: Mean added latency per request
+            jitter_ms: Uniform +- jitter on the latency
+            rate_limit: Message creates per second (None = unlimited); excess answers 20429
+            rate_burst: Token bucket size for rate_limit
+            server_error_rate: Fraction of creates failing with HTTP 503
+            transitions: (status, seconds after creation) pairs in order
+            seed: Random seed for jitter / injected errors
+        """
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.trial = trial
+        self.verified_numbers = None if verified_numbers is None else list(verified_numbers)
+        self.invalid_numbers = set(invalid_numbers or [])
+        self.undelivered_numbers = set(undelivered_numbers or [])
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bucket = TokenBucket(rate_limit, rate_burst) if rate_limit else None
+        self.server_error_rate = server_error_rate
+        self.transitions = transitions
+        self.random = random.Random(seed)
+
+        self.messages = OrderedDict()  # sid -> record, oldest first
+        self.lock = threading.Lock()
+        self.requests = {}             # "GET Messages" -> count
+        self.errors = {}               # Twilio error code -> count
+        self._next_sid = 0
+
+    def delay(self):
+        """Sleep for the configured latency"""
+        latency = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def count(self, name):
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def count_error(self, code):
+        with self.lock:
+            self.errors[code] = self.errors.get(code, 0) + 1
+
+    def check_auth(self, header, account_sid):
+        """Validate Basic auth and the account in the URL (20003 on mismatch)"""
+        expected = base64.b64encode(f"{self.account_sid}:{self.auth_token}".encode()).decode()
+        if header != f"Basic {expected}" or account_sid != self.account_sid:
+            raise TwilioError(401, 20003, "Authenticate")
+
+    def _status(self, record, now):
+        status = self.transitions[0][0]
+        for name, after in self.transitions:
+            if now - record['created'] >= after:
+                status = name
+        if status == 'delivered' and record['to'] in self.undelivered_numbers:
+            return 'undelivered'
+        return status
+
+    def message_json(self, record, now=None):
+        """Message resource as Twilio returns it"""
+        now = time.time() if now is None else now
+        status = self._status(record, now)
+        sent = status in ('sent', 'delivered', 'undelivered')
+        return {
+            'sid': record['sid'],
+            'account_sid': self.account_sid,
+            'api_version': API_VERSION,
+            'to': record['to'],
+            'from': record['from'],
+            'body': record['body'],
+            'status': status,
+            'direction': 'outbound-api',
+            'num_segments': '1',
+            'error_code': 30003 if status == 'undelivered' else None,
+            'error_message': 'Unreachable destination handset' if status == 'undelivered' else None,
+            'date_created': rfc2822(record['created']),
+            'date_updated': rfc2822(now),
+            'date_sent': rfc2822(record['created']) if sent else None,
+            'price': None,
+            'price_unit': 'USD',
+            'uri': f"/{API_VERSION}/Accounts/{self.account_sid}/Messages/{record['sid']}.json"
+        }
+
+    def create_message(self, form):
+        to = form.get('To', '')
+        if not to or not E164.match(to) or to in self.invalid_numbers:
+            raise TwilioError(400, 21211, f"The 'To' number {to} is not a valid phone number.")
+        if self.trial and self.verified_numbers is not None and to not in self.verified_numbers:
+            raise TwilioError(400, 21608, f"The number {to} is unverified. Trial accounts cannot "
+                                          f"send messages to unverified numbers.")
+        if self.bucket is not None and not self.bucket.take():
+            raise TwilioError(429, 20429, "Too Many Requests")
+        if self.server_error_rate and self.random.random() < self.server_error_rate:
+            raise TwilioError(503, 20503, "Service Unavailable")
+        with self.lock:
+            self._next_sid += 1
+            sid = f"SM{self._next_sid:032x}"
+            record = {'sid': sid, 'to': to, 'from': form.get('From', ''),
+                      'body': form.get('Body', ''), 'created': time.time()}
+            self.messages[sid] = record
+        return self.message_json(record)
+
+    def get_message(self, sid):
+        with self.lock:
+            record = self.messages.get(sid)
+        if record is None:
+            raise TwilioError(404, 20404, f"The requested resource /{API_VERSION}/Accounts/"
+                                          f"{self.account_sid}/Messages/{sid}.json was not found")
+        return self.message_json(record)
+
+    def list_messages(self, path, params):
+        """Newest first, filtered by To / From / DateSent>= / DateSent<=, paginated"""
+        with self.lock:
+            records = list(reversed(self.messages.values()))
+        now = time.time()
+        if params.get('To'):
+            records = [r for r in records if r['to'] == params['To']]
+        if params.get('From'):
+            records = [r for r in records if r['from'] == params['From']]
+        for key, keep in (('DateSent>', lambda t, d: t >= d), ('DateSent<', lambda t, d: t <= d)):
+            if params.get(key):
+                # Twilio matches on the date (YYYY-MM-DD) in UTC
+                day = datetime.strptime(params[key][:10], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+                limit = day.timestamp() + (86400 - 1e-6 if key == 'DateSent<' else 0)
+                records = [r for r in records if keep(r['created'], limit)]
+        return self._page(path, params, [self.message_json(r, now) for r in records], 'messages')
+
+    def caller_ids(self, path, params):
+        numbers = self.verified_numbers or []
+        items = [{
+            'sid': f"PN{i:032x}",
+            'account_sid': self.account_sid,
+            'phone_number': number,
+            'friendly_name': number,
+            'date_created': rfc2822(0),
+            'date_updated': rfc2822(0),
+            'uri': f"/{API_VERSION}/Accounts/{self.account_sid}/OutgoingCallerIds/PN{i:032x}.json"
+        } for i, number in enumerate(numbers)]
+        return self._page(path, params, items, 'outgoing_caller_ids')
+
+    def account(self):
+        return {
+            'sid': self.account_sid,
+            'friendly_name': 'Mock Twilio Account',
+            'status': 'active',
+            'type': 'Trial' if self.trial else 'Full',
+            'date_created': rfc2822(0),
+            'date_updated': rfc2822(0),
+            'uri': f"/{API_VERSION}/Accounts/{self.account_sid}.json"
+        }
+
+    def _page(self, path, params, items, key):
+        """One page in Twilio's list format (PageSize / Page / PageToken, next_page_uri)"""
+        page_size = max(1, min(1000, int(params.get('PageSize', 50))))
+        page = int(params.get('Page', 0))
+        start = page * page_size
+        chunk = items[start:start + page_size]
+
+        def uri(page_number):
+            query = {k: v for k, v in params.items() if k not in ('Page', 'PageToken')}
+            query.update({'PageSize': page_size, 'Page': page_number})
+            if page_number:
+                query['PageToken'] = f"PA{page_number * page_size}"
+            return f"{path}?{urlencode(query)}"
+
+        return {
+            key: chunk,
+            'page': page,
+            'page_size': page_size,
+            'start': start,
+            'end': start + len(chunk) - 1 if chunk else start,
+            'uri': uri(page),
+            'first_page_uri': uri(0),
+            'previous_page_uri': uri(page - 1) if page > 0 else None,
+            'next_page_uri': uri(page + 1) if start + page_size < len(items) else None
+        }
+
+    def metrics(self):
+        with self.lock:
+            by_status = {}
+            now = time.time()
+            for record in self.messages.values():
+                status = self._status(record, now)
+                by_status[status] = by_status.get(status, 0) + 1
+            return {'messages': len(self.messages), 'by_status': by_status,
+                    'requests': dict(self.requests), 'errors': dict(self.errors)}
+
+
+class MockTwilioHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints (all under /2010-04-01/Accounts/{AccountSid}):
+        POST .json/Messages.json             create (form: To, From, Body)
+        GET  /Messages.json                  list (PageSize, Page, To, From, DateSent>=, DateSent<=)
+        GET  /Messages/{Sid}.json            fetch
+        GET  /OutgoingCallerIds.json         verified numbers
+        GET  .json                           account
+    Plus GET /mock/metrics (request and error counters, messages by status).
+    """
+
+    server_version = 'MockTwilio/1.0'
+    route = re.compile(rf'^/{API_VERSION}/Accounts/(?P<account>[^/.]+)'
+                       r'(?P<rest>(/Messages(/(?P<sid>[^/.]+))?|/OutgoingCallerIds)?)\.json$')
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        state = self.server.state
+        url = urlparse(self.path)
+        if method == 'GET' and url.path == '/mock/metrics':
+            self._send_json(200, state.metrics())
+            return
+
+        match = self.route.match(url.path)
+        rest = match.group('rest') if match else ''
+        endpoint = ('Message' if match and match.group('sid') else
+                    (rest.strip('/') or 'Account') if match else url.path)
+        state.count(f"{method} {endpoint}")
+        state.delay()
+        try:
+            if match is None:
+                raise TwilioError(404, 20404, f"The requested resource {url.path} was not found")
+            state.check_auth(self.headers.get('Authorization', ''), match.group('account'))
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            if method == 'POST' and rest == '/Messages':
+                length = int(self.headers.get('Content-Length', 0))
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                self._send_json(201, state.create_message(form))
+            elif method != 'GET':
+                raise TwilioError(405, 20004, "Method not allowed")
+            elif rest == '/Messages':
+                self._send_json(200, state.list_messages(url.path, params))
+            elif match.group('sid'):
+                self._send_json(200, state.get_message(match.group('sid')))
+            elif rest == '/OutgoingCallerIds':
+                self._send_json(200, state.caller_ids(url.path, params))
+            else:
+                self._send_json(200, state.account())
+        except TwilioError as e:
+            state.count_error(e.code)
+            self._send_json(e.status, {'code': e.code, 'message': e.message, 'status': e.status,
+                                       'more_info': f"https://www.twilio.com/docs/errors/{e.code}"})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(state, host='127.0.0.1', port=8010, verbose=False):
+    """
+    Build (but don't start) the mock server
+
+    Returns:
+        ThreadingHTTPServer with .state attached
+    """
+    server = ThreadingHTTPServer((host, port), MockTwilioHandler)
+    server.daemon_threads = True
+    server.state = state
+    server.verbose = verbose
+    return server
+
+
+def mock_config(url, state, contacts, workdir):
+    """
+    twilio_config.json contents that point TwilioSMSAlert at the mock server
+
+    Args:
+        workdir: Directory for the delivery database, so mock SIDs stay out of
+                 runs/alerts/deliveries.sqlite
+    """
+    return {
+        'account_sid': state.account_sid,
+        'auth_token': state.auth_token,
+        'from_number': '+15005550006',
+        'api_base_url': url,
+        'request_timeout': 10,
+        'max_workers': 16,
+        'delivery_db': str(Path(workdir) / 'deliveries.sqlite'),
+        'contacts': [{'name': f"Contact {i + 1}", 'phone': phone} for i, phone in enumerate(contacts)]
+    }
+
+
+def burst_test(url, state, bursts=5, alerts_per_burst=10, contacts=3, burst_interval=1.0,
+               mode='dispatch'):
+    """
+    Simulate accident bursts against the mock server and measure the alert path
+
+    Each burst fires alerts_per_burst alerts at once (many cameras seeing
+    accidents together); every alert goes to all contacts.
+
+    Args:
+        url: Mock server base URL
+        state: MockTwilioState of that server (for credentials)
+        bursts: Number of bursts
+        alerts_per_burst: Alerts fired at the same moment
+        contacts: Contacts per alert
+        burst_interval: Seconds between bursts
+        mode: 'dispatch' (TwilioSMSAlert.dispatch_accident_alert) or
+              'outbox' (queue_accident_alert + AlertOutbox sender)
+
+    Returns:
+        Dict with throughput, enqueue and alert/message latency percentiles, failures
+    """
+    from twilio_sms import TwilioSMSAlert
+    from alert_outbox import AlertOutbox
+
+    workdir = Path(tempfile.mkdtemp(prefix='alert_burst_'))
+    numbers = [f"+9190000{i:05d}" for i in range(contacts)]
+    config_file = workdir / 'twilio_config.json'
+    with open(config_file, 'w') as f:
+        json.dump(mock_config(url, state, numbers, workdir), f)
+    sms = TwilioSMSAlert(str(config_file))
+
+    enqueue_ms, alert_ms, message_ms = [], [], []
+    failed = 0
+    lock = threading.Lock()
+    outbox = None
+    if mode == 'outbox':
+        def on_sent(message):
+            with lock:
+                message_ms.append((time.time() - message['created']) * 1000)
+        outbox = AlertOutbox(workdir / 'outbox.sqlite', sender=sms.outbox_sender(), workers=16,
+                             base_delay=0.2, on_sent=on_sent)
+        outbox.start()
+
+    futures = []
+    start = time.perf_counter()
+    for burst in range(bursts):
+        for i in range(alerts_per_burst):
+            t0 = time.perf_counter()
+            if outbox is not None:
+                sms.queue_accident_alert(outbox, f"cam{i}", severe_count=1,
+                                         alert_key=f"burst{burst}:cam{i}")
+            else:
+                future = sms.dispatch_accident_alert(f"cam{i}", severe_count=1)
+
+                def done(f, t0=t0):
+                    with lock:
+                        alert_ms.append((time.perf_counter() - t0) * 1000)
+                future.add_done_callback(done)
+                futures.append(future)
+            enqueue_ms.append((time.perf_counter() - t0) * 1000)
+        if burst < bursts - 1:
+            time.sleep(burst_interval)
+
+    if outbox is not None:
+        outbox.flush(timeout=300)
+        counts = outbox.counts()
+        failed = counts['dead'] + counts['pending']
+        outbox.close()
+    else:
+        wait(futures)
+        for future in futures:
+            for r in future.result():
+                message_ms.append(r['latency_ms'])
+                failed += r['status'] != 'success'
+    elapsed = time.perf_counter() - start
+    sms.close()
+
+    enqueue_ms.sort()
+    alert_ms.sort()
+    message_ms.sort()
+    total = bursts * alerts_per_burst * contacts
+    return {
+        'mode': mode,
+        'messages': total,
+        'failed': failed,
+        'elapsed_s': elapsed,
+        'messages_per_sec': total / elapsed if elapsed else 0.0,
+        'enqueue_ms_p50': percentile(enqueue_ms, 50),
+        'enqueue_ms_p99': percentile(enqueue_ms, 99),
+        'alert_ms_p50': percentile(alert_ms, 50),
+        'alert_ms_p99': percentile(alert_ms, 99),
+        'message_ms_p50': percentile(message_ms, 50),
+        'message_ms_p99': percentile(message_ms, 99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Twilio stand-in for offline alert testing')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                       help='Address to bind')
+    parser.add_argument('--port', type=int, default=8010,
+                       help='Port to listen on')
+    parser.add_argument('--account-sid', type=str, default='ACmock00000000000000000000000000',
+                       help='Account SID clients must use')
+    parser.add_argument('--auth-token', type=str, default='mock_token',
+                       help='Auth token clients must use (others get 20003)')
+    parser.add_argument('--full-account', action='store_true',
+                       help='Behave like an upgraded account (no verified-number check)')
+    parser.add_argument('--verified', type=str, nargs='*', default=None,
+                       help='Verified numbers; on a trial account others get 21608')
+    parser.add_argument('--invalid', type=str, nargs='*', default=None,
+                       help='Numbers rejected with 21211')
+    parser.add_argument('--undelivered', type=str, nargs='*', default=None,
+                       help='Numbers whose messages end up undelivered')
+    parser.add_argument('--latency-ms', type=float, default=50.0,
+                       help='Mean latency added to every request')
+    parser.add_argument('--jitter-ms', type=float, default=20.0,
+                       help='Uniform latency jitter')
+    parser.add_argument('--rate-limit', type=float, default=None,
+                       help='Message creates per second before 429 / 20429')
+    parser.add_argument('--server-error-rate', type=float, default=0.0,
+                       help='Fraction of creates failing with 503')
+    parser.add_argument('--delivery-seconds', type=float, default=2.0,
+                       help='Seconds from queued to delivered')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Log every request')
+    parser.add_argument('--burst-test', action='store_true',
+                       help='Start the server in-process and benchmark the alert path against it')
+    parser.add_argument('--mode', type=str, default='dispatch', choices=['dispatch', 'outbox', 'both'],
+                       help='Alert path for --burst-test')
+    parser.add_argument('--bursts', type=int, default=5,
+                       help='Accident bursts for --burst-test')
+    parser.add_argument('--alerts-per-burst', type=int, default=10,
+                       help='Simultaneous alerts per burst')
+    parser.add_argument('--contacts', type=int, default=3,
+                       help='Contacts per alert')
+
+    args = parser.parse_args()
+
+    d = args.delivery_seconds
+    state = MockTwilioState(args.account_sid, args.auth_token, trial=not args.full_account,
+                            verified_numbers=args.verified, invalid_numbers=args.invalid,
+                            undelivered_numbers=args.undelivered, latency_ms=args.latency_ms,
+                            jitter_ms=args.jitter_ms, rate_limit=args.rate_limit,
+                            server_error_rate=args.server_error_rate,
+                            transitions=(('queued', 0.0), ('sending', d / 4), ('sent', d / 2),
+                                         ('delivered', d)))
+    server = create_server(state, args.host, 0 if args.burst_test else args.port, args.verbose)
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+    if not args.burst_test:
+        print(f"[Mock Twilio] Serving on {url} (account {state.account_sid})")
+        print(f"[Mock Twilio] Add to twilio_config.json: \"api_base_url\": \"{url}\", "
+              f"\"account_sid\": \"{state.account_sid}\", \"auth_token\": \"{state.auth_token}\"")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n[Mock Twilio] Shutting down...")
+        finally:
+            server.server_close()
+        return
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    modes = ['dispatch', 'outbox'] if args.mode == 'both' else [args.mode]
+    try:
+        for mode in modes:
+            print(f"\n[Burst Test] {mode}: {args.bursts} bursts x {args.alerts_per_burst} alerts "
+                  f"x {args.contacts} contacts")
+            r = burst_test(url, state, args.bursts, args.alerts_per_burst, args.contacts, mode=mode)
+            print("=" * 60)
+            print(f"{r['messages']} messages in {r['elapsed_s']:.2f}s "
+                  f"({r['messages_per_sec']:.1f} msg/s), failed: {r['failed']}")
+            print(f"Enqueue latency (detection loop): p50 {r['enqueue_ms_p50']:.3f} ms, "
+                  f"p99 {r['enqueue_ms_p99']:.3f} ms")
+            if mode == 'dispatch':
+                print(f"Alert completion: p50 {r['alert_ms_p50']:.1f} ms, p99 {r['alert_ms_p99']:.1f} ms")
+                print(f"Per-message API latency: p50 {r['message_ms_p50']:.1f} ms, "
+                      f"p99 {r['message_ms_p99']:.1f} ms")
+            else:
+                print(f"Queued-to-sent: p50 {r['message_ms_p50']:.1f} ms, p99 {r['message_ms_p99']:.1f} ms")
+            print("=" * 60)
+        print(f"[Mock Twilio] {state.metrics()}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Shared Model Registry
+Loads each weights file once per process, in the background, warms it up
+and hands the same instance to every detection job
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+from ultralytics import YOLO
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of warmed-up YOLO models keyed by weights path
+
+    preload() starts loading in a background thread and returns immediately;
+    get() waits for that load to finish. If the trained weights need a newer
+    Ultralytics version (the C3k2 error), the fallback model is used instead
+    and that decision is cached along with the model. A failed load is not
+    cached: the next get() loads again.
+
+    YOLO models are not thread-safe, so callers must not run predict() on a
+    shared model from two threads at once; video_test_ui.py blocks live
+    detection while a video is processing and vice versa.
+    """
+
+    def __init__(self, fallback_model='yolo11n.pt', warmup_imgsz=640):
+        """
+        Args:
+            fallback_model: Weights used when the requested model can't be loaded
+            warmup_imgsz: Size of the dummy frame used for warm-up inference
+        """
+        self.fallback_model = fallback_model
+        self.warmup_imgsz = warmup_imgsz
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def preload(self, model_path):
+        """Start loading model_path in the background (no-op if already started)"""
+        with self._lock:
+            entry = self._entries.get(model_path)
+            if entry is None:
+                entry = {
+                    'ready': threading.Event(),
+                    'model': None,
+                    'error': None,
+                    'loaded_path': None,
+                    'used_fallback': False,
+                    'load_time': 0.0,
+                    'warmup_time': 0.0
+                }
+                self._entries[model_path] = entry
+                thread = threading.Thread(target=self._load, args=(model_path, entry), daemon=True)
+                thread.start()
+        return entry
+
+    def _load(self, model_path, entry):
+        """Load, apply the compatibility fallback and warm up one model"""
+        try:
+            start = time.perf_counter()
+            try:
+                model = YOLO(model_path)
+                entry['loaded_path'] = model_path
+            except Exception as model_error:
+                error_str = str(model_error)
+                # Trained with a newer Ultralytics version (C3k2 blocks)
+                if 'C3k2' in error_str or 'Can\'t get attribute' in error_str:
+                    if not os.path.exists(self.fallback_model):
+                        raise Exception("Could not load model and fallback not available")
+                    print(f"[Model Registry] {model_path} needs a newer Ultralytics version, "
+                          f"using {self.fallback_model}")
+                    model = YOLO(self.fallback_model)
+                    entry['loaded_path'] = self.fallback_model
+                    entry['used_fallback'] = True
+                else:
+                    raise
+            entry['load_time'] = time.perf_counter() - start
+
+            # One dummy inference builds the predictor and runs first-call setup
+            start = time.perf_counter()
+            dummy = np.zeros((self.warmup_imgsz, self.warmup_imgsz, 3), np.uint8)
+            model.predict(dummy, imgsz=self.warmup_imgsz, verbose=False)
+            entry['warmup_time'] = time.perf_counter() - start
+
+            entry['model'] = model
+            print(f"[Model Registry] {entry['loaded_path']} ready "
+                  f"(load {entry['load_time']:.2f}s, warm-up {entry['warmup_time']:.2f}s)")
+        except Exception as e:
+            entry['error'] = e
+            print(f"[Model Registry] Failed to load {model_path}: {e}")
+        finally:
+            entry['ready'].set()
+
+    def get(self, model_path, timeout=None):
+        """
+        Return the shared model for model_path, loading it if needed
+
+        Args:
+            model_path: Path to weights
+            timeout: Seconds to wait for a background load (None = wait forever)
+
+        Returns:
+            The loaded YOLO model
+        """
+        entry = self.preload(model_path)
+        if not entry['ready'].wait(timeout):
+            raise TimeoutError(f"Model {model_path} is still loading")
+        if entry['error'] is not None:
+            # Forget the failure so a later call retries (e.g. weights still being copied)
+            with self._lock:
+                if self._entries.get(model_path) is entry:
+                    del self._entries[model_path]
+            raise entry['error']
+        return entry['model']
+
+    def info(self, model_path):
+        """Load details: loaded_path, used_fallback, load_time, warmup_time (None if never requested)"""
+        entry = self._entries.get(model_path)
+        if entry is None:
+            return None
+        return {key: entry[key] for key in ('loaded_path', 'used_fallback', 'load_time', 'warmup_time')}
+
+    def is_ready(self, model_path):
+        entry = self._entries.get(model_path)
+        return entry is not None and entry['ready'].is_set()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """The process-wide ModelRegistry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
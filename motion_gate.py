@@ -0,0 +1,112 @@
+"""
+Motion Gate for Accident Detection
+Skips the detector on frames where nothing has changed since the last inference
+"""
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap frame-differencing gate in front of the detector
+
+    Each frame is downscaled to a small grayscale image (reusing preallocated
+    buffers) and compared with the frame the detector last ran on. If too few
+    pixels changed, the caller can reuse the previous result instead of running
+    inference. A forced refresh makes sure slow changes are never missed.
+    """
+
+    def __init__(self, sensitivity=0.02, pixel_threshold=25, refresh_interval=30, width=160):
+        """
+        Args:
+            sensitivity: Fraction of changed pixels that counts as motion (lower = more sensitive)
+            pixel_threshold: Minimum grayscale difference for a pixel to count as changed
+            refresh_interval: Force an inference after this many skipped frames
+            width: Width of the downscaled comparison image
+        """
+        self.sensitivity = sensitivity
+        self.pixel_threshold = pixel_threshold
+        self.refresh_interval = refresh_interval
+        self.width = width
+
+        self._frame_shape = None
+        self._size = None
+        self._small = None
+        self._gray = None
+        self._reference = None
+        self._diff = None
+        self._skipped_in_row = 0
+
+        self.frames = 0
+        self.inferences = 0
+        self.skipped = 0
+
+    def _allocate(self, frame):
+        """Size the reusable buffers for this frame shape"""
+        h, w = frame.shape[:2]
+        height = max(1, int(round(h * self.width / w)))
+        self._frame_shape = frame.shape
+        self._size = (self.width, height)
+        self._small = np.empty((height, self.width, 3), np.uint8)
+        self._gray = np.empty((height, self.width), np.uint8)
+        self._reference = np.empty((height, self.width), np.uint8)
+        self._diff = np.empty((height, self.width), np.uint8)
+
+    def should_infer(self, frame):
+        """
+        Decide whether the detector needs to run on this frame
+
+        Args:
+            frame: BGR frame
+
+        Returns:
+            True if the frame changed enough (or a refresh is due), False to reuse the last result
+        """
+        self.frames += 1
+        first = frame.shape != self._frame_shape
+        if first:
+            self._allocate(frame)
+
+        cv2.resize(frame, self._size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if first:
+            return self._accept()
+
+        cv2.absdiff(self._gray, self._reference, dst=self._diff)
+        cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        changed = cv2.countNonZero(self._diff) / self._diff.size
+
+        if changed >= self.sensitivity or self._skipped_in_row >= self.refresh_interval:
+            return self._accept()
+
+        self._skipped_in_row += 1
+        self.skipped += 1
+        return False
+
+    def _accept(self):
+        """Record an inference and make the current frame the new reference"""
+        np.copyto(self._reference, self._gray)
+        self._skipped_in_row = 0
+        self.inferences += 1
+        return True
+
+    def reset(self):
+        """Forget the reference frame so the next frame is always inferred"""
+        self._frame_shape = None
+
+    def stats(self):
+        """Counters for frames seen, inferences run and inferences saved"""
+        saved = self.skipped / self.frames if self.frames else 0.0
+        return {
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'skipped': self.skipped,
+            'saved_ratio': saved
+        }
+
+    def summary(self):
+        """One-line description of the counters"""
+        s = self.stats()
+        return (f"Motion gate: {s['inferences']} inferences for {s['frames']} frames "
+                f"({s['skipped']} skipped, {s['saved_ratio']:.1%} saved)")
@@ -0,0 +1,291 @@
+"""
+Multi-stream Accident Detection
+Watches many cameras with one model: the latest frame from every stream is
+collected and run as a single batched forward pass
+"""
+
+import argparse
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from realtime_pipeline import LatestQueue, StageMeter
+from detection_stats import DetectionAggregator
+
+
+def parse_source(source):
+    """'0' -> camera index 0, anything else stays a path / URL"""
+    return int(source) if str(source).isdigit() else source
+
+
+class StreamReader:
+    """
+    Background reader for one source that keeps only its newest frame
+
+    Video files loop forever at their native frame rate so they behave like
+    cameras; network streams are reopened after a failure.
+    """
+
+    def __init__(self, name, source, frame_ready, loop_files=True, reconnect_delay=2.0):
+        """
+        Args:
+            name: Stream name used in results and stats
+            source: Camera index, file path or RTSP/HTTP URL
+            frame_ready: Event set whenever a new frame is available
+            loop_files: Restart video files from the beginning at the end
+            reconnect_delay: Seconds to wait before reopening a failed stream
+        """
+        self.name = name
+        self.source = parse_source(source)
+        self.frame_ready = frame_ready
+        self.loop_files = loop_files
+        self.reconnect_delay = reconnect_delay
+        self.is_file = isinstance(self.source, str) and not self.source.startswith(('rtsp://', 'http://', 'https://'))
+
+        self.queue = LatestQueue()
+        self.capture_meter = StageMeter('capture')
+        self.inference_meter = StageMeter('inference')
+        self.latencies = deque(maxlen=1000)
+        self.detections = DetectionAggregator(window_seconds=60.0)
+        self.stop_event = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if cap.isOpened():
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _run(self):
+        cap = self._open()
+        if not cap.isOpened():
+            print(f"[{self.name}] Could not open source: {self.source}")
+        fps = cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+        frame_interval = 1.0 / fps if fps and fps > 0 else 0
+        next_frame_at = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = cap.read() if cap.isOpened() else (False, None)
+                if not ret:
+                    if self.is_file and self.loop_files and cap.isOpened():
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    if self.is_file:
+                        break
+                    # Camera / network stream dropped - try to reconnect
+                    print(f"[{self.name}] Stream lost, reconnecting in {self.reconnect_delay:.0f}s...")
+                    cap.release()
+                    if self.stop_event.wait(self.reconnect_delay):
+                        break
+                    cap = self._open()
+                    continue
+
+                self.capture_meter.tick()
+                self.queue.put((frame, time.perf_counter()))
+                self.frame_ready.set()
+
+                if frame_interval:
+                    next_frame_at += frame_interval
+                    delay = next_frame_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_frame_at = time.perf_counter()
+        finally:
+            cap.release()
+            self.finished = True
+            self.queue.close()
+            self.frame_ready.set()
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            'capture_fps': self.capture_meter.fps(),
+            'inference_fps': self.inference_meter.fps(),
+            'dropped_frames': self.queue.dropped,
+            'latency_ms_p50': latencies[len(latencies) // 2] if latencies else 0.0,
+            'latency_ms_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+            'detections': dict(self.detections.counts)
+        }
+
+
+class MultiStreamEngine:
+    """
+    Runs N streams through a single AccidentSeverityDetector
+
+    Each cycle takes the newest unread frame from every stream and runs them
+    together as one batched model.predict call; results are routed back to
+    the stream they came from.
+    """
+
+    def __init__(self, detector, sources, conf_threshold=0.5, max_batch=None,
+                 batch_wait=0.01, loop_files=True, on_result=None):
+        """
+        Args:
+            detector: AccidentSeverityDetector shared by all streams
+            sources: List of sources, or dict of {name: source}
+            conf_threshold: Confidence threshold for detections
+            max_batch: Maximum frames per forward pass (None = all streams)
+            batch_wait: Seconds to wait after the first new frame so other streams can join the batch
+            loop_files: Loop video files so they act as cameras
+            on_result: Optional callback(stream_name, frame, result) for every result
+        """
+        self.detector = detector
+        self.conf_threshold = conf_threshold
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.on_result = on_result
+        self.frame_ready = threading.Event()
+        self.stop_event = threading.Event()
+
+        if not isinstance(sources, dict):
+            sources = {f"stream{i}": source for i, source in enumerate(sources)}
+        self.streams = [StreamReader(name, source, self.frame_ready, loop_files)
+                        for name, source in sources.items()]
+        self.batches = 0
+        self.batched_frames = 0
+        self._next_stream = 0
+
+    def _collect(self):
+        """Newest frame from each stream that has one, rotating the start for fairness"""
+        batch = []
+        n = len(self.streams)
+        for offset in range(n):
+            stream = self.streams[(self._next_stream + offset) % n]
+            item = stream.queue.get(timeout=0)
+            if item is not None:
+                batch.append((stream, item))
+                if self.max_batch and len(batch) >= self.max_batch:
+                    break
+        self._next_stream = (self._next_stream + 1) % n
+        return batch
+
+    def _process(self, batch):
+        frames = [frame for _, (frame, _) in batch]
+        results = self.detector.model.predict(frames, conf=self.conf_threshold,
+                                              imgsz=self.detector.imgsz, verbose=False)
+        done_at = time.perf_counter()
+        self.batches += 1
+        self.batched_frames += len(frames)
+
+        for (stream, (frame, captured_at)), r in zip(batch, results):
+            stream.inference_meter.tick()
+            stream.latencies.append((done_at - captured_at) * 1000)
+            stream.detections.add_many(self.detector._extract_detections(r))
+            if self.on_result is not None:
+                self.on_result(stream.name, frame, r)
+
+    def stats(self):
+        """Per-stream stats plus overall batch statistics"""
+        return {
+            'streams': {stream.name: stream.stats() for stream in self.streams},
+            'batches': self.batches,
+            'avg_batch_size': self.batched_frames / self.batches if self.batches else 0.0
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"\n[Multi-stream] {stats['batches']} batches, avg batch size {stats['avg_batch_size']:.1f}")
+        for name, s in stats['streams'].items():
+            print(f"  {name:12s} capture {s['capture_fps']:5.1f} FPS | inference {s['inference_fps']:5.1f} FPS | "
+                  f"latency p50 {s['latency_ms_p50']:6.1f} ms p95 {s['latency_ms_p95']:6.1f} ms | "
+                  f"dropped {s['dropped_frames']} | severe {s['detections']['severe']}")
+
+    def stop(self):
+        self.stop_event.set()
+        self.frame_ready.set()
+
+    def run(self, duration=None, stats_interval=10.0):
+        """
+        Process streams until stop(), duration seconds, or every stream has ended
+
+        Args:
+            duration: Optional run time limit in seconds
+            stats_interval: Seconds between printed stats (0 disables)
+
+        Returns:
+            Final stats()
+        """
+        for stream in self.streams:
+            stream.start()
+        start = time.perf_counter()
+        last_stats = start
+
+        try:
+            while not self.stop_event.is_set():
+                if duration is not None and time.perf_counter() - start >= duration:
+                    break
+                if self.frame_ready.wait(timeout=0.1) and self.batch_wait:
+                    time.sleep(self.batch_wait)
+                self.frame_ready.clear()
+                batch = self._collect()
+                if batch:
+                    self._process(batch)
+                elif all(stream.finished for stream in self.streams):
+                    break
+                if stats_interval and time.perf_counter() - last_stats >= stats_interval:
+                    self.print_stats()
+                    last_stats = time.perf_counter()
+        finally:
+            for stream in self.streams:
+                stream.stop()
+            for stream in self.streams:
+                stream.thread.join(timeout=2)
+
+        self.print_stats()
+        return self.stats()
+
+
+def main():
+    from inference import AccidentSeverityDetector
+
+    parser = argparse.ArgumentParser(description='Multi-stream accident severity detection')
+    parser.add_argument('--sources', type=str, nargs='+', required=True,
+                       help='Video files, camera indices or RTSP URLs (files loop like cameras)')
+    parser.add_argument('--model', type=str,
+                       default='runs/train/accident_severity_yolov11/weights/best.pt',
+                       help='Path to trained model')
+    parser.add_argument('--backend', type=str, default='torch', choices=['torch', 'onnx'],
+                       help='Inference backend')
+    parser.add_argument('--imgsz', type=int, default=640,
+                       help='Inference image size')
+    parser.add_argument('--conf', type=float, default=0.5,
+                       help='Confidence threshold')
+    parser.add_argument('--max-batch', type=int, default=None,
+                       help='Maximum frames per forward pass')
+    parser.add_argument('--batch-wait', type=float, default=0.01,
+                       help='Seconds to wait for more streams before running a batch')
+    parser.add_argument('--duration', type=float, default=None,
+                       help='Stop after this many seconds')
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                       help='Seconds between stats printouts')
+
+    args = parser.parse_args()
+
+    detector = AccidentSeverityDetector(args.model, args.backend, args.imgsz)
+
+    def report_severe(stream_name, frame, result):
+        severe = sum(1 for box in result.boxes if detector.classes[int(box.cls[0])] == 'severe')
+        if severe:
+            print(f"[{stream_name}] SEVERE accident detected ({severe} box(es))")
+
+    engine = MultiStreamEngine(detector, args.sources, args.conf, args.max_batch,
+                               args.batch_wait, on_result=report_severe)
+    try:
+        engine.run(args.duration, args.stats_interval)
+    except KeyboardInterrupt:
+        engine.stop()
+
+
+if __name__ == "__main__":
+    main()
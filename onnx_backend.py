@@ -0,0 +1,349 @@
+"""
+ONNX Runtime Backend for Accident Detection
+Runs the exported YOLOv11 graph on CPU with our own letterbox and NMS
+"""
+
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# ONNX Runtime is optional - only needed for --backend onnx
+try:
+    import onnxruntime as ort
+    ONNX_AVAILABLE = True
+except Exception:
+    ort = None
+    ONNX_AVAILABLE = False
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
+
+
+def letterbox(image, new_shape=640, color=(114, 114, 114)):
+    """
+    Resize and pad an image to new_shape while keeping its aspect ratio
+
+    Mirrors the Ultralytics LetterBox used for fixed-size exported models.
+
+    Args:
+        image: BGR image (H, W, 3)
+        new_shape: Target size as int or (height, width)
+        color: Padding color
+
+    Returns:
+        Tuple of (padded image, scale ratio, (pad_w, pad_h))
+    """
+    if isinstance(new_shape, int):
+        new_shape = (new_shape, new_shape)
+    h, w = image.shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    new_unpad = (int(round(w * r)), int(round(h * r)))
+    dw = (new_shape[1] - new_unpad[0]) / 2
+    dh = (new_shape[0] - new_unpad[1]) / 2
+
+    if (w, h) != new_unpad:
+        image = cv2.resize(image, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, r, (dw, dh)
+
+
+def box_iou(box, boxes):
+    """IoU between one xyxy box and an (N, 4) array of xyxy boxes"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / (area + areas - inter + 1e-9)
+
+
+def nms(boxes, scores, iou_threshold=0.7):
+    """
+    Greedy non-maximum suppression with vectorized IoU
+
+    Args:
+        boxes: (N, 4) xyxy boxes
+        scores: (N,) scores
+        iou_threshold: Boxes overlapping a kept box above this IoU are dropped
+
+    Returns:
+        Indices of kept boxes, highest score first
+    """
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        ious = box_iou(boxes[i], boxes[order[1:]])
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(output, conf_threshold=0.25, iou_threshold=0.7, max_det=300, max_wh=7680):
+    """
+    Decode a raw YOLOv11 output (4 + nc, N) into class-aware NMS detections
+
+    Args:
+        output: Raw output for one image, rows are cx, cy, w, h, class scores
+        conf_threshold: Minimum class score
+        iou_threshold: NMS IoU threshold
+        max_det: Maximum detections kept
+        max_wh: Per-class box offset so NMS never suppresses across classes
+
+    Returns:
+        Tuple of (xyxy boxes, confidences, class ids) in letterboxed pixels
+    """
+    scores = output[4:]
+    cls = scores.argmax(axis=0)
+    conf = scores[cls, np.arange(scores.shape[1])]
+    mask = conf > conf_threshold
+    if not mask.any():
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.float32)
+
+    cx, cy, w, h = output[:4, mask]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    conf, cls = conf[mask], cls[mask]
+
+    keep = nms(boxes + cls[:, None] * max_wh, conf, iou_threshold)[:max_det]
+    return boxes[keep], conf[keep], cls[keep].astype(np.float32)
+
+
+def scale_boxes(boxes, ratio, pad, image_shape):
+    """Map letterboxed xyxy boxes back onto the original image and clip them"""
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] -= round(pad[0] - 0.1)
+    boxes[:, [1, 3]] -= round(pad[1] - 0.1)
+    boxes /= ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, image_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, image_shape[0])
+    return boxes
+
+
+class OnnxBoxes:
+    """Minimal stand-in for ultralytics Boxes (xyxy, conf, cls arrays)"""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            index = slice(index, index + 1)
+        return OnnxBoxes(self.xyxy[index], self.conf[index], self.cls[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class OnnxResults:
+    """Per-image result with the parts of the ultralytics Results API we use"""
+
+    def __init__(self, orig_img, boxes, names, colors, speed, path=None):
+        self.orig_img = orig_img
+        self.orig_shape = orig_img.shape[:2]
+        self.boxes = boxes
+        self.names = names
+        self.colors = colors
+        self.speed = speed
+        self.path = path
+
+    def plot(self, img=None):
+        """Draw boxes and labels on a copy of the original image (or of img)"""
+        annotated = (self.orig_img if img is None else img).copy()
+        for box in self.boxes:
+            cls = int(box.cls[0])
+            name = self.names[cls]
+            color = self.colors.get(name, (255, 255, 255))
+            x1, y1, x2, y2 = [int(v) for v in box.xyxy[0]]
+            label = f"{name} {float(box.conf[0]):.2f}"
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
+            (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+            cv2.rectangle(annotated, (x1, max(y1 - th - 6, 0)), (x1 + tw + 4, max(y1, th + 6)), color, -1)
+            cv2.putText(annotated, label, (x1 + 2, max(y1 - 4, th + 2)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+        return annotated
+
+
+class OnnxYOLO:
+    """
+    ONNX Runtime model exposing the subset of YOLO.predict used by the detector
+    """
+
+    def __init__(self, model_path, names, colors=None, imgsz=640,
+                 intra_op_threads=None, inter_op_threads=None):
+        """
+        Create an ONNX Runtime CPU session
+
+        Args:
+            model_path: Path to exported .onnx model
+            names: Class names in model order
+            colors: Optional {class name: BGR color} for plot()
+            imgsz: Input size used when the graph has dynamic spatial dims
+            intra_op_threads: Threads used inside a single operator (None = ORT default)
+            inter_op_threads: Threads used to run independent operators (None = ORT default)
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("onnxruntime is not installed. Install with: pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.model_path = str(model_path)
+        self.session = ort.InferenceSession(self.model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.names = list(names)
+        self.colors = colors or {}
+
+        # Static exports fix batch and size; dynamic ones report strings/None
+        shape = self.session.get_inputs()[0].shape
+        self.static_batch = shape[0] if isinstance(shape[0], int) else None
+        if isinstance(shape[2], int) and isinstance(shape[3], int):
+            self.imgsz = (shape[2], shape[3])
+        else:
+            self.imgsz = (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+
+    def _load_sources(self, source):
+        """Normalize a path, array or list of either to [(path, image)]"""
+        sources = source if isinstance(source, (list, tuple)) else [source]
+        loaded = []
+        for item in sources:
+            if isinstance(item, (str, Path)):
+                image = cv2.imread(str(item))
+                if image is None:
+                    raise FileNotFoundError(f"Could not read image: {item}")
+                loaded.append((str(item), image))
+            else:
+                loaded.append((None, item))
+        return loaded
+
+    def _forward(self, batch):
+        """Run the session, splitting into single images for static batch-1 graphs"""
+        if self.static_batch == 1 and len(batch) > 1:
+            return np.concatenate([self.session.run(None, {self.input_name: b[None]})[0] for b in batch])
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def predict(self, source, conf=0.25, iou=0.7, max_det=300, save=False,
+                project='runs/detect', name='predict', verbose=True, **kwargs):
+        """
+        Run detection on one or more images
+
+        Args:
+            source: Image path, BGR array, or a list of either
+            conf: Confidence threshold
+            iou: NMS IoU threshold
+            max_det: Maximum detections per image
+            save: Save annotated copies of path sources to project/name
+            project: Output project directory
+            name: Output run name
+            verbose: Print a one-line summary per image
+
+        Returns:
+            List of OnnxResults, one per input image
+        """
+        loaded = self._load_sources(source)
+
+        t0 = time.perf_counter()
+        letterboxed = [letterbox(image, self.imgsz) for _, image in loaded]
+        batch = np.stack([lb[0] for lb in letterboxed])
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+        t1 = time.perf_counter()
+        outputs = self._forward(batch)
+        t2 = time.perf_counter()
+
+        results = []
+        for (path, image), (_, ratio, pad), output in zip(loaded, letterboxed, outputs):
+            boxes, confs, classes = postprocess(output, conf, iou, max_det)
+            boxes = scale_boxes(boxes, ratio, pad, image.shape)
+            results.append(OnnxResults(image, OnnxBoxes(boxes, confs, classes), self.names,
+                                       self.colors, None, path))
+        t3 = time.perf_counter()
+
+        n = len(results)
+        speed = {
+            'preprocess': (t1 - t0) * 1000 / n,
+            'inference': (t2 - t1) * 1000 / n,
+            'postprocess': (t3 - t2) * 1000 / n
+        }
+        for r in results:
+            r.speed = speed
+
+        if save:
+            save_dir = Path(project) / name
+            save_dir.mkdir(parents=True, exist_ok=True)
+            for i, r in enumerate(results):
+                filename = Path(r.path).name if r.path else f"image{i}.jpg"
+                cv2.imwrite(str(save_dir / filename), r.plot())
+
+        if verbose:
+            for r in results:
+                print(f"[ONNX] {len(r.boxes)} detections, {r.speed['inference']:.1f}ms inference")
+
+        return results
+
+
+def compare_with_torch(pt_path, onnx_path, image_paths, names, conf=0.25, imgsz=640,
+                       iou_match=0.9, conf_tol=0.05):
+    """
+    Check that ONNX Runtime detections match the PyTorch model within a tolerance
+
+    Every PyTorch box must have an ONNX box of the same class with IoU >= iou_match
+    and confidence within conf_tol, and the detection counts must agree.
+
+    Args:
+        pt_path: Path to .pt weights
+        onnx_path: Path to exported .onnx model
+        image_paths: Images to compare on
+        names: Class names
+        conf: Confidence threshold
+        imgsz: Inference size
+        iou_match: Minimum IoU between matched boxes
+        conf_tol: Maximum confidence difference between matched boxes
+
+    Returns:
+        List of mismatch descriptions (empty when the backends agree)
+    """
+    from ultralytics import YOLO
+
+    torch_model = YOLO(pt_path)
+    onnx_model = OnnxYOLO(onnx_path, names, imgsz=imgsz)
+    mismatches = []
+
+    for path in image_paths:
+        ref = torch_model.predict(str(path), conf=conf, imgsz=imgsz, verbose=False)[0].boxes
+        out = onnx_model.predict(str(path), conf=conf, verbose=False)[0].boxes
+        ref_xyxy, ref_conf, ref_cls = (ref.xyxy.cpu().numpy(), ref.conf.cpu().numpy(),
+                                       ref.cls.cpu().numpy())
+
+        if len(ref_conf) != len(out.conf):
+            mismatches.append(f"{path}: torch {len(ref_conf)} boxes vs onnx {len(out.conf)}")
+            continue
+        for box, score, cls in zip(ref_xyxy, ref_conf, ref_cls):
+            same_class = out.cls == cls
+            if not same_class.any():
+                mismatches.append(f"{path}: no onnx box for class {names[int(cls)]}")
+                continue
+            ious = box_iou(box, out.xyxy[same_class])
+            best = ious.argmax()
+            if ious[best] < iou_match or abs(out.conf[same_class][best] - score) > conf_tol:
+                mismatches.append(f"{path}: {names[int(cls)]} box differs "
+                                  f"(IoU {ious[best]:.3f}, conf {score:.3f} vs "
+                                  f"{out.conf[same_class][best]:.3f})")
+
+    return mismatches
@@ -0,0 +1,269 @@
+"""
+YOLOv11 Accident Severity Detection - INT8 Quantization Script
+Calibrates on the validation split and compares INT8 against the FP32 model
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from onnx_backend import letterbox, IMAGE_EXTENSIONS
+
+CLASS_NAMES = ['fire', 'moderate', 'severe']
+
+
+def resolve_split(data_yaml, split='val'):
+    """
+    Resolve an image directory from data.yaml
+
+    Roboflow exports use paths like '../valid/images'; like Ultralytics we fall
+    back to the path without the leading '../' when the first one is missing.
+
+    Args:
+        data_yaml: Path to dataset config
+        split: Key to resolve ('train', 'val' or 'test')
+
+    Returns:
+        Path to the image directory
+    """
+    data_yaml = Path(data_yaml)
+    with open(data_yaml, 'r') as f:
+        data = yaml.safe_load(f)
+
+    root = Path(data.get('path', data_yaml.parent))
+    if not root.is_absolute():
+        root = (data_yaml.parent / root).resolve()
+    entry = data[split]
+    image_dir = (root / entry).resolve()
+    if not image_dir.exists() and entry.startswith('../'):
+        image_dir = (root / entry[3:]).resolve()
+    return image_dir
+
+
+def list_images(image_dir, limit=None, seed=42):
+    """List images in a directory, optionally a reproducible random sample"""
+    images = sorted(p for p in Path(image_dir).glob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if limit and len(images) > limit:
+        images = sorted(random.Random(seed).sample(images, limit))
+    return images
+
+
+def preprocess(image, imgsz):
+    """Letterbox a BGR image into a (1, 3, imgsz, imgsz) float32 tensor"""
+    padded, _, _ = letterbox(image, imgsz)
+    tensor = padded[..., ::-1].transpose(2, 0, 1)[None]
+    return np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
+
+
+class ValCalibrationReader:
+    """Feeds letterboxed validation images to the ONNX Runtime calibrator"""
+
+    def __init__(self, image_paths, input_name, imgsz=640):
+        self.image_paths = list(image_paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self.index = 0
+
+    def get_next(self):
+        while self.index < len(self.image_paths):
+            image = cv2.imread(str(self.image_paths[self.index]))
+            self.index += 1
+            if image is not None:
+                return {self.input_name: preprocess(image, self.imgsz)}
+        return None
+
+    def rewind(self):
+        self.index = 0
+
+
+def onnx_input_size(onnx_path):
+    """(height, width) of an ONNX model's static input, or None if the spatial dims are dynamic"""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(onnx_path), providers=['CPUExecutionProvider'])
+    shape = session.get_inputs()[0].shape
+    if isinstance(shape[2], int) and isinstance(shape[3], int):
+        return shape[2], shape[3]
+    return None
+
+
+def export_fp32(model_path, imgsz):
+    """
+    FP32 ONNX model with a static input of imgsz
+
+    best.onnx next to the weights is reused when it was exported at imgsz
+    (or with dynamic input); otherwise the model is exported at imgsz to
+    runs/autotune/onnx/ (shared with autotune.py) and best.onnx is left alone.
+    """
+    onnx_path = Path(model_path).with_suffix('.onnx')
+    if onnx_path.exists():
+        size = onnx_input_size(onnx_path)
+        if size is None or size == (imgsz, imgsz):
+            print(f"Using existing FP32 ONNX model: {onnx_path}")
+            return onnx_path
+        print(f"{onnx_path} was exported at {size[1]}x{size[0]}, not {imgsz}")
+
+    from autotune import export_onnx_sizes
+    return export_onnx_sizes(model_path, [imgsz], 'runs/autotune/onnx')[imgsz]
+
+
+def quantize(fp32_path, int8_path, calib_images, imgsz=640, per_channel=True):
+    """
+    Static INT8 post-training quantization (QDQ format)
+
+    Args:
+        fp32_path: FP32 ONNX model
+        int8_path: Output path for the INT8 model
+        calib_images: Calibration image paths
+        imgsz: Model input size
+        per_channel: Quantize weights per output channel
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    # Shape inference + graph cleanup gives the quantizer a simpler graph
+    prepared_path = Path(int8_path).with_name(Path(fp32_path).stem + '_prep.onnx')
+    quant_pre_process(str(fp32_path), str(prepared_path), skip_symbolic_shape=True)
+
+    session = ort.InferenceSession(str(prepared_path), providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+    del session
+
+    print(f"Calibrating on {len(calib_images)} validation images...")
+    reader = ValCalibrationReader(calib_images, input_name, imgsz)
+    quantize_static(
+        str(prepared_path),
+        str(int8_path),
+        reader,
+        quant_format=QuantFormat.QDQ,
+        per_channel=per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax
+    )
+    prepared_path.unlink(missing_ok=True)
+    print(f"INT8 model saved at: {int8_path}")
+    return Path(int8_path)
+
+
+def evaluate(model_path, data_yaml, imgsz):
+    """mAP@50 and per-class AP@50 on the validation split"""
+    from ultralytics import YOLO
+
+    metrics = YOLO(str(model_path), task='detect').val(
+        data=data_yaml, split='val', imgsz=imgsz, batch=1, device='cpu',
+        plots=False, verbose=False
+    )
+    per_class = {name: 0.0 for name in CLASS_NAMES}
+    for i, cls in enumerate(metrics.box.ap_class_index):
+        per_class[CLASS_NAMES[int(cls)]] = float(metrics.box.ap50[i])
+    return {'map50': float(metrics.box.map50), 'ap50': per_class}
+
+
+def measure_latency(detector, image_paths, conf=0.5, warmup=3):
+    """Mean and p90 single-image latency in milliseconds"""
+    images = [cv2.imread(str(p)) for p in image_paths]
+    images = [img for img in images if img is not None]
+    for img in images[:warmup]:
+        detector.model.predict(img, conf=conf, imgsz=detector.imgsz, verbose=False)
+
+    timings = []
+    for img in images:
+        start = time.perf_counter()
+        detector.model.predict(img, conf=conf, imgsz=detector.imgsz, verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'mean_ms': float(np.mean(timings)), 'p90_ms': float(np.percentile(timings, 90))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='INT8 quantization for accident severity detection')
+    parser.add_argument('--model', type=str,
+                       default='runs/train/accident_severity_yolov11/weights/best.pt',
+                       help='Path to FP32 .pt weights')
+    parser.add_argument('--data', type=str, default='data.yaml',
+                       help='Dataset config (calibration uses the val split)')
+    parser.add_argument('--output', type=str, default=None,
+                       help='INT8 model path (default: best_int8.onnx next to the weights)')
+    parser.add_argument('--imgsz', type=int, default=640,
+                       help='Model input size')
+    parser.add_argument('--num-calib', type=int, default=200,
+                       help='Number of validation images used for calibration')
+    parser.add_argument('--num-latency', type=int, default=50,
+                       help='Number of validation images used for latency measurement')
+    parser.add_argument('--threads', type=int, default=None,
+                       help='ONNX Runtime intra-op threads for both models (default: runtime default)')
+    parser.add_argument('--skip-eval', action='store_true',
+                       help='Only quantize, skip the accuracy comparison')
+    parser.add_argument('--report', type=str, default='runs/quantize/quantization_report.json',
+                       help='Where to write the comparison report')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("YOLOv11 Accident Severity Detection - INT8 Quantization")
+    print("=" * 60)
+
+    val_dir = resolve_split(args.data, 'val')
+    calib_images = list_images(val_dir, args.num_calib)
+    if not calib_images:
+        print(f"No validation images found in {val_dir}")
+        return
+    print(f"\nValidation images: {val_dir}")
+
+    int8_path = Path(args.output) if args.output else \
+        Path(args.model).with_name(Path(args.model).stem + '_int8.onnx')
+    fp32_path = export_fp32(args.model, args.imgsz)
+    quantize(fp32_path, int8_path, calib_images, args.imgsz)
+
+    if args.skip_eval:
+        return
+
+    from inference import AccidentSeverityDetector
+
+    print("\n" + "=" * 60)
+    print("Evaluating FP32 vs INT8")
+    print("=" * 60)
+    latency_images = list_images(val_dir, args.num_latency, seed=0)
+    report = {}
+    # Both models run on ONNX Runtime with the same threads, so only quantization differs
+    for label, path in [('fp32', fp32_path), ('int8', int8_path)]:
+        print(f"\n[{label}] {path}")
+        detector = AccidentSeverityDetector(str(path), backend='onnx', imgsz=args.imgsz,
+                                            intra_op_threads=args.threads)
+        report[label] = evaluate(path, args.data, args.imgsz)
+        report[label]['latency'] = measure_latency(detector, latency_images)
+        report[label]['model'] = str(path)
+        report[label]['size_mb'] = Path(path).stat().st_size / 1e6
+
+    fp32, int8 = report['fp32'], report['int8']
+    print("\n" + "=" * 60)
+    print("Quantization Report")
+    print("=" * 60)
+    print(f"  {'':14s}{'FP32 (onnx)':>16s}{'INT8 (onnx)':>16s}{'Delta':>10s}")
+    print(f"  {'mAP@50':14s}{fp32['map50']:16.4f}{int8['map50']:16.4f}{int8['map50'] - fp32['map50']:+10.4f}")
+    for name in CLASS_NAMES:
+        a, b = fp32['ap50'][name], int8['ap50'][name]
+        print(f"  {'AP@50 ' + name:14s}{a:16.4f}{b:16.4f}{b - a:+10.4f}")
+    a, b = fp32['latency']['mean_ms'], int8['latency']['mean_ms']
+    print(f"  {'latency (ms)':14s}{a:16.1f}{b:16.1f}{b - a:+10.1f}")
+    print(f"  {'size (MB)':14s}{fp32['size_mb']:16.1f}{int8['size_mb']:16.1f}")
+    print(f"\n  Speedup: {a / b:.2f}x")
+
+    report_path = Path(args.report)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nReport saved at: {report_path}")
+    print(f"Use it with: python inference.py --source video.mp4 --backend onnx --model {int8_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Pipelined Real-time Detection
+Capture, inference and display run as separate stages so the shown
+detections never fall behind the camera
+"""
+
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from stage_timer import StageTimer
+
+
+class LatestQueue:
+    """
+    Size-1 hand-off between stages where the newest item always wins
+
+    A put() replaces any item the consumer has not picked up yet, so a slow
+    consumer always sees the most recent frame instead of a growing backlog.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._has_item = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """Store item, dropping the previous one if it was never read"""
+        with self._cond:
+            if self._has_item:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Wait for the next item
+
+        Returns:
+            The newest item, or None if the queue was closed or the wait timed out
+        """
+        with self._cond:
+            if not self._has_item and not self._closed:
+                self._cond.wait(timeout)
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def close(self):
+        """Wake up any waiting consumer; get() returns None from now on once empty"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class StageMeter:
+    """Counts events for one stage and reports its average FPS"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.start = None
+        self.last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        self.count += 1
+        self.last = now
+
+    def fps(self):
+        if self.count < 2 or self.last == self.start:
+            return 0.0
+        return (self.count - 1) / (self.last - self.start)
+
+
+class RealtimePipeline:
+    """
+    Three-stage real-time detection: capture -> inference -> render
+
+    Capture and inference run in background threads; rendering (cv2.imshow)
+    stays on the calling thread as OpenCV's HighGUI requires. Stages are
+    connected by LatestQueue so stale frames are dropped instead of queued.
+    """
+
+    def __init__(self, detector, source=0, conf_threshold=0.5, motion_gate=None,
+                 window_name='Accident Severity Detection', timer=None, tiler=None):
+        """
+        Args:
+            detector: AccidentSeverityDetector instance
+            source: Video source (0 for webcam, or video path / stream URL)
+            conf_threshold: Confidence threshold for detections
+            motion_gate: Optional MotionGate; static frames reuse the last result
+            window_name: Name of the display window
+            timer: Optional StageTimer (stages are recorded from all three threads)
+            tiler: Optional RegionTiler; only ROI crops / tiles are run
+        """
+        self.detector = detector
+        self.source = source
+        self.conf_threshold = conf_threshold
+        self.motion_gate = motion_gate
+        self.window_name = window_name
+        self.tiler = tiler
+        self.timer = timer if timer is not None else StageTimer(enabled=False)
+
+        self.frames = LatestQueue()
+        self.results = LatestQueue()
+        self.stop_event = threading.Event()
+
+        self.capture_meter = StageMeter('capture')
+        self.inference_meter = StageMeter('inference')
+        self.display_meter = StageMeter('display')
+        self.latencies = deque(maxlen=10000)  # Most recent capture-to-display latencies
+
+    def _capture_loop(self, cap, frame_interval):
+        """Read frames as fast as the source delivers them"""
+        try:
+            while not self.stop_event.is_set():
+                with self.timer.stage('decode'):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                self.capture_meter.tick()
+                self.frames.put((frame, time.perf_counter()))
+                if frame_interval:
+                    # Video files: play back at their native rate like a camera would
+                    time.sleep(frame_interval)
+        finally:
+            self.frames.close()
+
+    def _inference_loop(self):
+        """Run the detector on the newest captured frame"""
+        result = None
+        try:
+            while not self.stop_event.is_set():
+                item = self.frames.get(timeout=0.5)
+                if item is None:
+                    if self.frames.closed:
+                        break
+                    continue
+                frame, captured_at = item
+                if self.motion_gate is None or self.motion_gate.should_infer(frame) or result is None:
+                    result = self.detector._predict_frame(frame, self.conf_threshold, self.tiler)
+                    self.timer.record_speed(result.speed)
+                self.inference_meter.tick()
+                self.results.put((frame, result, captured_at))
+        finally:
+            self.results.close()
+
+    def stats(self):
+        """Per-stage FPS, dropped frames and capture-to-display latency (ms)"""
+        latencies = sorted(self.latencies)
+        stats = {
+            'capture_fps': self.capture_meter.fps(),
+            'inference_fps': self.inference_meter.fps(),
+            'display_fps': self.display_meter.fps(),
+            'dropped_before_inference': self.frames.dropped,
+            'dropped_before_display': self.results.dropped,
+            'latency_ms_mean': 0.0,
+            'latency_ms_p95': 0.0
+        }
+        if latencies:
+            stats['latency_ms_mean'] = sum(latencies) / len(latencies)
+            stats['latency_ms_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return stats
+
+    def run(self):
+        """Run until 'q' is pressed or the source ends; returns stats()"""
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            print(f"Could not open source: {self.source}")
+            return self.stats()
+        # Keep the driver-side buffer as small as possible so reads are fresh
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        frame_interval = 0
+        if isinstance(self.source, str) and not self.source.startswith(('rtsp://', 'http://', 'https://')):
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_interval = 1.0 / fps if fps and fps > 0 else 0
+
+        capture_thread = threading.Thread(target=self._capture_loop, args=(cap, frame_interval), daemon=True)
+        inference_thread = threading.Thread(target=self._inference_loop, daemon=True)
+        capture_thread.start()
+        inference_thread.start()
+
+        try:
+            while True:
+                item = self.results.get(timeout=0.1)
+                if item is None:
+                    if self.results.closed:
+                        break
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                    continue
+
+                frame, result, captured_at = item
+                with self.timer.stage('plot'):
+                    annotated = result.plot(img=frame)
+                self.display_meter.tick()
+                latency = (time.perf_counter() - captured_at) * 1000
+                self.latencies.append(latency)
+
+                info = (f"cap {self.capture_meter.fps():.0f} | inf {self.inference_meter.fps():.0f} | "
+                        f"disp {self.display_meter.fps():.0f} FPS | latency {latency:.0f} ms")
+                cv2.putText(annotated, info, (10, annotated.shape[0] - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                with self.timer.stage('display'):
+                    cv2.imshow(self.window_name, annotated)
+                    key = cv2.waitKey(1) & 0xFF
+                self.timer.end_frame()
+
+                if key == ord('q'):
+                    break
+        finally:
+            self.stop_event.set()
+            self.frames.close()
+            capture_thread.join(timeout=2)
+            inference_thread.join(timeout=2)
+            cap.release()
+            cv2.destroyAllWindows()
+
+        stats = self.stats()
+        print("\nPipeline Summary:")
+        print(f"  Capture:   {stats['capture_fps']:.1f} FPS")
+        print(f"  Inference: {stats['inference_fps']:.1f} FPS "
+              f"({stats['dropped_before_inference']} stale frames dropped)")
+        print(f"  Display:   {stats['display_fps']:.1f} FPS "
+              f"({stats['dropped_before_display']} stale results dropped)")
+        print(f"  Capture-to-display latency: {stats['latency_ms_mean']:.1f} ms mean, "
+              f"{stats['latency_ms_p95']:.1f} ms p95")
+        return stats
@@ -0,0 +1,186 @@
+"""
+Persistent Detection Result Cache
+SQLite cache of per-image detections keyed by image content, model weights,
+confidence threshold and input size, so unchanged images skip inference
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# SQLite allows at most 999 bound parameters per statement on older builds
+_MAX_PARAMS = 500
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents (hex)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk LRU cache of detection lists
+
+    Entries live in one SQLite table in WAL mode, so several worker
+    processes can read and write the same file at once (writers wait up to
+    timeout seconds for the lock). Every hit refreshes the entry's
+    last_used time; when the table grows past max_entries the least
+    recently used entries are deleted, down to 90% of max_entries so the
+    next eviction is some inserts away. The row count is only read from the
+    table when this process's running estimate passes max_entries. Hit/miss
+    counters cover this process only.
+    """
+
+    def __init__(self, path='runs/cache/results.sqlite', max_entries=100000, timeout=30.0):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            max_entries: Maximum number of cached images before LRU eviction
+            timeout: Seconds to wait for another process holding the write lock
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._weights = {}
+        self._lock = threading.Lock()
+
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout,
+                                     isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, detections TEXT NOT NULL, last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used)')
+        # Upper bound for this process (replacements count as inserts); exact after every eviction
+        self._count = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def weights_hash(self, model_path):
+        """Hash of the model weights file (memoized per path, size and mtime)"""
+        stat = os.stat(model_path)
+        memo_key = (str(model_path), stat.st_size, stat.st_mtime)
+        if memo_key not in self._weights:
+            self._weights[memo_key] = file_hash(model_path)
+        return self._weights[memo_key]
+
+    @staticmethod
+    def make_key(content_hash, weights_hash, conf_threshold, imgsz):
+        """Cache key for one image under one model configuration"""
+        return f"{content_hash}:{weights_hash}:{conf_threshold:.4f}:{imgsz}"
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once
+
+        Args:
+            keys: Iterable of cache keys
+
+        Returns:
+            Dict mapping each found key to its list of detection dicts
+        """
+        keys = list(keys)
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(unique), _MAX_PARAMS):
+                chunk = unique[i:i + _MAX_PARAMS]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT key, detections FROM results WHERE key IN ({placeholders})', chunk
+                ).fetchall()
+                for key, detections in rows:
+                    found[key] = json.loads(detections)
+            if found:
+                now = time.time()
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    self._conn.executemany('UPDATE results SET last_used = ? WHERE key = ?',
+                                           [(now, key) for key in found])
+                    self._conn.execute('COMMIT')
+                except Exception:
+                    self._conn.execute('ROLLBACK')
+                    raise
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def get(self, key):
+        """Detections for key, or None on a miss"""
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        """
+        Store detections and evict the least recently used entries if over max_entries
+
+        Args:
+            items: Iterable of (key, detections) pairs
+        """
+        now = time.time()
+        rows = [(key, json.dumps(detections), now) for key, detections in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO results (key, detections, last_used) VALUES (?, ?, ?)', rows
+                )
+                count = self._count + len(rows)
+                if count > self.max_entries:
+                    count = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+                    if count > self.max_entries:
+                        excess = count - (self.max_entries - self.max_entries // 10)
+                        self._conn.execute(
+                            'DELETE FROM results WHERE key IN '
+                            '(SELECT key FROM results ORDER BY last_used LIMIT ?)', (excess,)
+                        )
+                        self.evicted += excess
+                        count -= excess
+                self._conn.execute('COMMIT')
+                self._count = count
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def put(self, key, detections):
+        """Store the detections of one image"""
+        self.put_many([(key, detections)])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def stats(self):
+        """Hits, misses, hit rate, evictions and stored entries"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evicted': self.evicted,
+            'entries': len(self)
+        }
+
+    def summary(self):
+        """One-line summary of the counters"""
+        s = self.stats()
+        return (f"[Cache] {s['hits']} hits, {s['misses']} misses ({s['hit_rate']:.1%} hit rate), "
+                f"{s['entries']} entries, {s['evicted']} evicted")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
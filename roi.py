@@ -0,0 +1,227 @@
+"""
+Region-of-Interest and Tiled Inference
+Runs the detector only on crops that cover the roadway (optionally tiled with
+overlap), batches the crops and merges boxes back into full-frame coordinates
+"""
+
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from onnx_backend import OnnxBoxes, OnnxResults, nms
+
+
+def _to_numpy(values):
+    """Tensor (torch) or array-like to a numpy array"""
+    if hasattr(values, 'cpu'):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+
+def tile_ranges(start, stop, tile, overlap):
+    """Start offsets of tiles of size tile covering [start, stop) with the given overlap fraction"""
+    length = stop - start
+    if length <= tile:
+        return [start]
+    step = max(1, int(tile * (1 - overlap)))
+    offsets = list(range(start, stop - tile, step))
+    offsets.append(stop - tile)  # Last tile flush with the edge
+    return offsets
+
+
+def merge_detections(boxes, conf, cls, iou_threshold=0.5, ios_threshold=0.8, max_wh=7680):
+    """
+    De-duplicate boxes coming from overlapping crops
+
+    Class-aware NMS (onnx_backend.nms) removes objects seen whole by two
+    tiles; a second pass drops boxes mostly contained in a higher-scoring box
+    of the same class (intersection over the smaller box), which catches
+    objects cut in half by a tile seam.
+
+    Returns:
+        Indices of kept boxes, highest score first
+    """
+    if len(conf) == 0:
+        return np.zeros(0, np.int64)
+    keep = nms(boxes + cls[:, None] * max_wh, conf, iou_threshold)
+    final = []
+    for i in keep:
+        if final:
+            kept = np.array(final)
+            same = cls[kept] == cls[i]
+            if same.any():
+                others = boxes[kept[same]]
+                x1 = np.maximum(boxes[i, 0], others[:, 0])
+                y1 = np.maximum(boxes[i, 1], others[:, 1])
+                x2 = np.minimum(boxes[i, 2], others[:, 2])
+                y2 = np.minimum(boxes[i, 3], others[:, 3])
+                inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+                area_i = (boxes[i, 2] - boxes[i, 0]) * (boxes[i, 3] - boxes[i, 1])
+                areas = (others[:, 2] - others[:, 0]) * (others[:, 3] - others[:, 1])
+                if (inter / (np.minimum(area_i, areas) + 1e-9) > ios_threshold).any():
+                    continue
+        final.append(i)
+    return np.array(final, dtype=np.int64)
+
+
+class RegionTiler:
+    """
+    Crops for one source: ROI polygons and/or a tile grid
+
+    The crop plan depends only on the frame size, so it is computed once
+    and cached. Without polygons the whole frame is the region; without
+    tile_size each polygon's bounding rectangle is one crop. Tiles that
+    don't touch any polygon are never run, and boxes whose centre falls
+    outside the polygons are discarded.
+    """
+
+    def __init__(self, polygons=None, tile_size=None, overlap=0.2,
+                 iou_threshold=0.5, ios_threshold=0.8):
+        """
+        Args:
+            polygons: List of polygons, each a list of [x, y] points in pixels,
+                      or in 0-1 fractions of the frame size
+            tile_size: Tile edge in pixels (None = one crop per polygon)
+            overlap: Fraction of overlap between neighbouring tiles
+            iou_threshold: IoU above which boxes from different crops are merged
+            ios_threshold: Intersection over the smaller box above which a box cut
+                           by a tile seam is merged into the bigger one
+        """
+        self.polygons = [np.asarray(p, dtype=np.float32) for p in (polygons or [])]
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self.ios_threshold = ios_threshold
+        self._shape = None
+        self._crops = None
+        self._mask = None
+
+    def _plan(self, shape):
+        """Compute crops and the ROI mask for a frame shape"""
+        h, w = shape[:2]
+        mask = None
+        if self.polygons:
+            mask = np.zeros((h, w), np.uint8)
+            regions = []
+            for polygon in self.polygons:
+                points = polygon * [w, h] if polygon.max() <= 1.0 else polygon
+                points = points.round().astype(np.int32)
+                cv2.fillPoly(mask, [points], 1)
+                x, y, bw, bh = cv2.boundingRect(points)
+                regions.append((max(0, x), max(0, y), min(w, x + bw), min(h, y + bh)))
+        else:
+            regions = [(0, 0, w, h)]
+
+        crops = []
+        for x1, y1, x2, y2 in regions:
+            if not self.tile_size:
+                crops.append((x1, y1, x2, y2))
+                continue
+            for ty in tile_ranges(y1, y2, self.tile_size, self.overlap):
+                for tx in tile_ranges(x1, x2, self.tile_size, self.overlap):
+                    crop = (tx, ty, min(tx + self.tile_size, x2), min(ty + self.tile_size, y2))
+                    if mask is None or mask[crop[1]:crop[3], crop[0]:crop[2]].any():
+                        crops.append(crop)
+
+        self._shape = (h, w)
+        self._crops = list(dict.fromkeys(crops))  # Drop duplicates, keep order
+        self._mask = mask
+
+    def crops(self, shape):
+        """(x1, y1, x2, y2) crop rectangles for a frame of this shape"""
+        if self._shape != tuple(shape[:2]):
+            self._plan(shape)
+        return self._crops
+
+    def predict(self, detector, frame, conf_threshold=0.5):
+        """
+        Run the detector on all crops as one batch and merge the boxes
+
+        Args:
+            detector: AccidentSeverityDetector
+            frame: Full BGR frame
+            conf_threshold: Confidence threshold
+
+        Returns:
+            OnnxResults (same API as an ultralytics result) in full-frame coordinates
+        """
+        crops = self.crops(frame.shape)
+        images = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in crops]
+        results = detector.model.predict(images, conf=conf_threshold, imgsz=detector.imgsz, verbose=False)
+
+        start = time.perf_counter()
+        speed = {'preprocess': 0.0, 'inference': 0.0, 'postprocess': 0.0}
+        all_boxes, all_conf, all_cls = [], [], []
+        for (x1, y1, _, _), r in zip(crops, results):
+            for key in speed:
+                speed[key] += (r.speed or {}).get(key) or 0.0
+            if len(r.boxes):
+                all_boxes.append(_to_numpy(r.boxes.xyxy).reshape(-1, 4) + [x1, y1, x1, y1])
+                all_conf.append(_to_numpy(r.boxes.conf).reshape(-1))
+                all_cls.append(_to_numpy(r.boxes.cls).reshape(-1))
+
+        if all_boxes:
+            boxes = np.concatenate(all_boxes).astype(np.float32)
+            conf = np.concatenate(all_conf).astype(np.float32)
+            cls = np.concatenate(all_cls).astype(np.float32)
+            if self._mask is not None:
+                # Keep boxes whose centre lies on the roadway
+                cx = ((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int64).clip(0, self._shape[1] - 1)
+                cy = ((boxes[:, 1] + boxes[:, 3]) / 2).astype(np.int64).clip(0, self._shape[0] - 1)
+                inside = self._mask[cy, cx] > 0
+                boxes, conf, cls = boxes[inside], conf[inside], cls[inside]
+            keep = merge_detections(boxes, conf, cls, self.iou_threshold, self.ios_threshold)
+            boxes, conf, cls = boxes[keep], conf[keep], cls[keep]
+        else:
+            boxes, conf, cls = np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.float32)
+
+        speed['postprocess'] += (time.perf_counter() - start) * 1000
+        return OnnxResults(frame, OnnxBoxes(boxes, conf, cls), detector.classes,
+                           detector.colors, speed)
+
+
+class RoiConfig:
+    """
+    Per-source ROI / tiling settings loaded from JSON
+
+    Example:
+        {
+          "cam_junction.mp4": {"polygons": [[[0, 0.45], [1, 0.45], [1, 1], [0, 1]]],
+                               "tile_size": 640, "overlap": 0.2},
+          "0":                {"polygons": [[[100, 300], [1800, 300], [1900, 1080], [0, 1080]]]},
+          "default":          {"tile_size": 960}
+        }
+
+    Sources are matched by full path / URL, then file name, then file stem,
+    then "default".
+    """
+
+    def __init__(self, sources):
+        """
+        Args:
+            sources: Dict mapping source name to RegionTiler keyword arguments
+        """
+        self.sources = sources
+        self._tilers = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def for_source(self, source):
+        """RegionTiler for a video path, camera index or URL (None if not configured)"""
+        source = str(source)
+        candidates = [source]
+        if '://' not in source:
+            candidates += [Path(source).name, Path(source).stem]
+        candidates.append('default')
+        for key in candidates:
+            if key in self.sources:
+                if key not in self._tilers:
+                    self._tilers[key] = RegionTiler(**self.sources[key])
+                return self._tilers[key]
+        return None
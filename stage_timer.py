@@ -0,0 +1,220 @@
+"""
+Per-stage Timing Instrumentation
+Records wall time per pipeline stage (decode, preprocess, inference,
+postprocess, plot, encode, ...) into fixed-size log-scale histograms
+"""
+
+import json
+import math
+import threading
+import time
+
+# Ultralytics (and the ONNX backend) report these in result.speed, in ms
+SPEED_STAGES = ('preprocess', 'inference', 'postprocess')
+
+
+class StageHistogram:
+    """
+    Log-scale latency histogram with O(1) record and fixed memory
+
+    Buckets grow by `growth` from min_ms up to max_ms, so percentiles are
+    accurate to within one bucket (~10% with the default growth).
+    """
+
+    def __init__(self, min_ms=0.01, max_ms=60000.0, growth=1.1):
+        self.min_ms = min_ms
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.buckets = [0] * (int(math.log(max_ms / min_ms) / self._log_growth) + 2)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms):
+        if ms <= self.min_ms:
+            index = 0
+        else:
+            index = min(len(self.buckets) - 1, int(math.log(ms / self.min_ms) / self._log_growth) + 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def mean(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile (0-100)"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                edge = self.min_ms * self.growth ** index
+                return min(edge, self.max_ms)
+        return self.max_ms
+
+
+class _StageContext:
+    """Context manager returned by StageTimer.stage()"""
+
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class _NullContext:
+    """No-op stage used when timing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class StageTimer:
+    """
+    Collects per-stage timings for a run
+
+    Usage:
+        timer = StageTimer()
+        with timer.stage('decode'):
+            ret, frame = cap.read()
+        r = model.predict(frame)[0]
+        timer.record_speed(r.speed)
+        timer.end_frame()
+        timer.print_summary()
+
+    Sinks are callables that receive (frame_index, {stage: ms}) at every
+    end_frame(), e.g. to stream timings to a log or a UI. A disabled timer
+    turns every call into a cheap no-op so callers don't need to branch.
+    """
+
+    def __init__(self, enabled=True, sinks=None):
+        """
+        Args:
+            enabled: Record timings (False makes every call a no-op)
+            sinks: Optional list of callables(frame_index, timings)
+        """
+        self.enabled = enabled
+        self.sinks = list(sinks or [])
+        self.histograms = {}
+        self.frames = 0
+        self.last_frame = {}
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        """Register a callable(frame_index, timings) called at every end_frame()"""
+        self.sinks.append(sink)
+        return sink
+
+    def stage(self, name):
+        """Context manager that times the enclosed block as stage `name`"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _StageContext(self, name)
+
+    def record(self, name, ms):
+        """Add ms to stage `name` for the current frame"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = StageHistogram()
+            histogram.record(ms)
+            self._current[name] = self._current.get(name, 0.0) + ms
+
+    def record_speed(self, speed):
+        """Record preprocess/inference/postprocess from an Ultralytics result.speed dict"""
+        if not self.enabled or not speed:
+            return
+        for name in SPEED_STAGES:
+            value = speed.get(name)
+            if value is not None:
+                self.record(name, value)
+
+    def end_frame(self):
+        """Close the current frame and pass its timings to the sinks"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.frames += 1
+            frame_index = self.frames
+            timings = self._current
+            self._current = {}
+            self.last_frame = timings
+        for sink in self.sinks:
+            try:
+                sink(frame_index, timings)
+            except Exception as e:
+                print(f"[Timing] Sink error: {e}")
+
+    def summary(self):
+        """Dict mapping stage to {'count', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms'}"""
+        with self._lock:
+            return {
+                name: {
+                    'count': h.count,
+                    'mean_ms': h.mean(),
+                    'p50_ms': h.percentile(50),
+                    'p95_ms': h.percentile(95),
+                    'max_ms': h.max_ms,
+                    'total_ms': h.total_ms
+                }
+                for name, h in self.histograms.items()
+            }
+
+    def format_line(self):
+        """Compact 'stage ms' line of per-frame means, e.g. for a status label"""
+        summary = self.summary()
+        if not summary:
+            return ""
+        frames = max(1, self.frames)
+        parts = [f"{name} {entry['total_ms'] / frames:.1f}" for name, entry in summary.items()]
+        return "ms per frame: " + " | ".join(parts)
+
+    def print_summary(self, title="Stage Timing"):
+        """Print mean / p50 / p95 / max per stage and each stage's share of the total"""
+        if not self.enabled:
+            return
+        summary = self.summary()
+        if not summary:
+            return
+        grand_total = sum(entry['total_ms'] for entry in summary.values()) or 1.0
+        print(f"\n{title} ({self.frames} frames):")
+        print(f"  {'stage':14s} {'mean':>8s} {'p50':>8s} {'p95':>8s} {'max':>8s} {'share':>7s}")
+        for name, entry in summary.items():
+            print(f"  {name:14s} {entry['mean_ms']:7.2f}ms {entry['p50_ms']:7.2f}ms "
+                  f"{entry['p95_ms']:7.2f}ms {entry['max_ms']:7.2f}ms {entry['total_ms'] / grand_total:6.1%}")
+
+
+class JsonLinesSink:
+    """Timing sink that appends one JSON line per frame to a file"""
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def __call__(self, frame_index, timings):
+        self.file.write(json.dumps({'frame': frame_index, **timings}) + '\n')
+
+    def close(self):
+        self.file.close()
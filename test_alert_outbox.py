@@ -0,0 +1,95 @@
+"""
+Check the alert outbox against a local fake SMS endpoint (no Twilio account needed)
+"""
+
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from alert_outbox import AlertOutbox, DEAD, PENDING, SENT, http_sender
+
+
+class FakeSMSHandler(BaseHTTPRequestHandler):
+    """Fails the first request per idempotency key with 503, rejects +910000000000 with 400"""
+
+    seen = {}
+    delivered = []
+
+    def do_POST(self):
+        message = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        key = message['idempotency_key']
+        attempts = self.seen[key] = self.seen.get(key, 0) + 1
+        if message['to'] == '+910000000000':
+            status, body = 400, {'code': 21211, 'message': 'Invalid To number'}
+        elif attempts == 1:
+            status, body = 503, {'message': 'Try again'}
+        else:
+            status, body = 201, {'sid': f"SM{len(self.delivered):032d}"}
+            self.delivered.append(key)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_alert_outbox():
+    """Retry with backoff, dead letter, idempotency and replay after a restart"""
+
+    print("=" * 60)
+    print("Testing alert outbox with a local fake SMS endpoint")
+    print("=" * 60)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSMSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/sms"
+    db = Path(tempfile.mkdtemp()) / 'outbox.sqlite'
+    contacts = [('Contact 1', '+919000000001'), ('Contact 2', '+919000000002'),
+                ('Bad Number', '+910000000000')]
+
+    try:
+        # Queue before any sender runs, as if the process died right after the detection
+        outbox = AlertOutbox(db, sender=http_sender(url), base_delay=0.05)
+        start = time.perf_counter()
+        added = outbox.enqueue(contacts, "Test alert", alert_key="cam1:event-1")
+        enqueue_ms = (time.perf_counter() - start) * 1000
+        duplicate = outbox.enqueue(contacts, "Test alert", alert_key="cam1:event-1")
+        outbox.close()
+        print(f"\nQueued {added} messages in {enqueue_ms:.2f} ms, duplicate enqueue added {duplicate}")
+        assert added == 3, f"expected 3 queued messages, got {added}"
+        assert duplicate == 0, "queueing the same alert_key twice added messages"
+
+        # "Restart": a new outbox on the same file replays the pending messages
+        outbox = AlertOutbox(db, sender=http_sender(url), base_delay=0.05)
+        print(f"After restart: {outbox.counts()}")
+        assert outbox.counts()[PENDING] == 3, "pending messages were not replayed after the restart"
+        outbox.start()
+        outbox.flush(timeout=10)
+        sent = outbox.messages(SENT)
+        dead = outbox.messages(DEAD)
+        counts = outbox.counts()
+        outbox.close()
+        print(f"After sending: {counts}")
+    finally:
+        server.shutdown()
+
+    # The two good numbers went out once each after one retry; the bad one was not retried
+    assert sorted(m['phone'] for m in sent) == ['+919000000001', '+919000000002']
+    assert all(m['message_sid'] and m['attempts'] == 2 for m in sent), sent
+    assert [m['phone'] for m in dead] == ['+910000000000']
+    assert dead[0]['attempts'] == 1 and '21211' in dead[0]['last_error'], dead[0]
+    assert counts[PENDING] == 0
+    assert len(FakeSMSHandler.delivered) == len(set(FakeSMSHandler.delivered)) == 2
+
+    print("\n✅ Outbox retried, dead-lettered and replayed as expected")
+
+
+if __name__ == "__main__":
+    test_alert_outbox()
@@ -0,0 +1,55 @@
+"""
+Check AlertPolicy deduplication with a fake clock (no model or SMS account needed)
+"""
+
+from alert_policy import AlertPolicy
+
+
+def test_reacquired_event():
+    """A track lost and picked up again under a new id must not alert twice"""
+
+    print("=" * 60)
+    print("Testing alert deduplication across tracker re-acquisition")
+    print("=" * 60)
+
+    policy = AlertPolicy(window=300.0, batch_window=0.0, clock=lambda: 0.0)
+
+    first = policy.observe('cam1', 1, {'severe': 5}, now=0.0)
+    assert first is not None and first['events'][0]['reason'] == 'new', first
+
+    # Same crash, tracker lost it for a few frames and gave it id 2
+    again = policy.observe('cam1', 2, {'severe': 4}, now=20.0)
+    print(f"\nRe-acquired under a new id: {again}")
+    assert again is None, "re-acquired event alerted again"
+    assert policy.suppressed == 1
+
+    # The re-acquired event still escalates when it catches fire
+    fire = policy.observe('cam1', 2, {'severe': 6, 'fire': 1}, now=30.0)
+    assert fire is not None and fire['escalation'], fire
+    assert fire['events'][0]['new_classes'] == ['fire'], fire
+
+    # Another camera is unaffected, and the window still ends
+    other = policy.observe('cam2', 1, {'severe': 3}, now=40.0)
+    assert other is not None and other['events'][0]['reason'] == 'new', other
+    later = policy.observe('cam1', 3, {'severe': 3}, now=400.0)
+    assert later is not None, "a new event after the window did not alert"
+
+    print(f"Policy stats: {policy.stats()}")
+    print("\n✅ Re-acquired event was deduplicated")
+
+
+def test_flush_pending():
+    """flush() sends a batched alert that poll() is still holding back"""
+
+    policy = AlertPolicy(window=300.0, batch_window=60.0, clock=lambda: 0.0)
+    assert policy.observe('cam1', 1, {'severe': 3}, now=0.0) is not None
+    assert policy.observe('cam2', 1, {'severe': 3}, now=5.0) is None
+    assert policy.poll(now=10.0) is None
+    flushed = policy.flush(now=10.0)
+    assert flushed is not None and flushed['sources'] == ['cam2'], flushed
+    assert policy.pending() == 0
+
+
+if __name__ == "__main__":
+    test_reacquired_event()
+    test_flush_pending()
@@ -0,0 +1,51 @@
+"""
+Check that the ONNX Runtime backend matches the PyTorch model
+"""
+
+from pathlib import Path
+from onnx_backend import compare_with_torch
+
+try:
+    import pytest
+    PYTEST_AVAILABLE = True
+except ImportError:
+    PYTEST_AVAILABLE = False
+
+
+def skip(reason):
+    """Skip under pytest; just report when run as a script"""
+    print(f"\n⚠️  Skipped: {reason}")
+    if PYTEST_AVAILABLE and __name__ != "__main__":
+        pytest.skip(reason)
+
+def test_onnx_backend(num_images=20):
+    """Compare torch and ONNX detections on a sample of test images"""
+    
+    print("=" * 60)
+    print("Comparing ONNX Runtime backend with PyTorch")
+    print("=" * 60)
+    
+    pt_path = 'runs/train/accident_severity_yolov11/weights/best.pt'
+    onnx_path = 'runs/train/accident_severity_yolov11/weights/best.onnx'
+    images = sorted(Path('test/images').glob('*.jpg'))[:num_images]
+    
+    if not Path(pt_path).exists():
+        return skip(f"{pt_path} not found - train the model first")
+    if not Path(onnx_path).exists():
+        return skip(f"{onnx_path} not found - run train_yolov11.py or export the model first")
+    if not images:
+        return skip("No test images found in test/images")
+    
+    print(f"\nComparing on {len(images)} images...")
+    mismatches = compare_with_torch(pt_path, onnx_path, images, ['fire', 'moderate', 'severe'])
+    
+    if mismatches:
+        print(f"\n❌ {len(mismatches)} mismatch(es):")
+        for m in mismatches:
+            print(f"  {m}")
+    assert not mismatches, f"{len(mismatches)} ONNX/PyTorch mismatch(es), first: {mismatches[0]}"
+    
+    print("\n✅ ONNX detections match PyTorch within tolerance")
+
+if __name__ == "__main__":
+    test_onnx_backend()
@@ -0,0 +1,239 @@
+"""
+Accident Event Tracking
+Lightweight ByteTrack-style tracker that links per-frame detections into
+accident events (start/end frame, peak confidence, severity timeline)
+"""
+
+from collections import deque
+
+import numpy as np
+
+from detection_stats import CLASS_NAMES
+
+# Least to most urgent; an event's severity is the worst class it was seen as
+SEVERITY_ORDER = ['moderate', 'fire', 'severe']
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def greedy_match(ious, threshold):
+    """Pairs (row, col) taken in order of decreasing IoU, each row/col used once"""
+    matches = []
+    if ious.size == 0:
+        return matches
+    rows, cols = np.where(ious >= threshold)
+    order = np.argsort(-ious[rows, cols])
+    used_rows, used_cols = set(), set()
+    for k in order:
+        r, c = int(rows[k]), int(cols[k])
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matches.append((r, c))
+    return matches
+
+
+class Track:
+    """One object followed across frames with a constant-velocity motion model"""
+
+    def __init__(self, track_id, detection, frame_index):
+        self.id = track_id
+        self.box = np.asarray(detection['box'], dtype=np.float32)
+        self.velocity = np.zeros(4, np.float32)  # Per-frame change of x1, y1, x2, y2
+        self.start_frame = frame_index
+        self.last_frame = frame_index
+        self.hits = 1
+        self.peak_confidence = detection['confidence']
+        self.peak_class = detection['class']
+        self.severity = detection['class']
+        self.class_counts = {detection['class']: 1}
+        self.timeline = [(frame_index, detection['class'])]
+
+    def predict(self, frame_index):
+        """Expected box at frame_index"""
+        return self.box + self.velocity * (frame_index - self.last_frame)
+
+    def update(self, detection, frame_index):
+        box = np.asarray(detection['box'], dtype=np.float32)
+        gap = max(1, frame_index - self.last_frame)
+        # Smoothed velocity; a light stand-in for a Kalman filter
+        self.velocity = 0.5 * self.velocity + 0.5 * (box - self.box) / gap
+        self.box = box
+        self.last_frame = frame_index
+        self.hits += 1
+
+        cls = detection['class']
+        self.class_counts[cls] = self.class_counts.get(cls, 0) + 1
+        if detection['confidence'] > self.peak_confidence:
+            self.peak_confidence = detection['confidence']
+            self.peak_class = cls
+        if SEVERITY_ORDER.index(cls) > SEVERITY_ORDER.index(self.severity):
+            self.severity = cls
+        if cls != self.timeline[-1][1]:
+            self.timeline.append((frame_index, cls))
+
+    def to_event(self, fps=None):
+        """Event dict for this track"""
+        event = {
+            'id': self.id,
+            'severity': self.severity,
+            'start_frame': self.start_frame,
+            'end_frame': self.last_frame,
+            'frames_seen': self.hits,
+            'peak_confidence': self.peak_confidence,
+            'peak_class': self.peak_class,
+            'class_counts': dict(self.class_counts),
+            'severity_timeline': [{'frame': frame, 'class': cls} for frame, cls in self.timeline],
+            'last_box': [float(v) for v in self.box]
+        }
+        if fps:
+            event['start_time'] = self.start_frame / fps
+            event['end_time'] = self.last_frame / fps
+        return event
+
+
+class AccidentTracker:
+    """
+    Turns per-frame detections into accident events
+
+    Association follows ByteTrack: confident detections are matched to the
+    motion-predicted track boxes first, then low-confidence detections may
+    keep unmatched tracks alive; only confident detections start new tracks.
+    Matching is class-agnostic so a crash that turns from moderate to severe
+    (or catches fire) stays one event with a severity timeline. Work per
+    frame is O(active tracks x detections); finished events are handed to
+    on_event and kept in self.events (the most recent max_events of them).
+    """
+
+    def __init__(self, classes=None, iou_threshold=0.3, high_confidence=0.5, min_hits=3,
+                 max_age=30, fps=None, on_event=None, max_events=None):
+        """
+        Args:
+            classes: Class names (defaults to fire/moderate/severe)
+            iou_threshold: Minimum IoU between a predicted track box and a detection
+            high_confidence: Detections at or above this start tracks and are matched first
+            min_hits: Frames a track needs before it counts as an event (filters flicker)
+            max_age: Frames without a match before a track's event ends
+            fps: Optional frame rate for start/end times in events
+            on_event: Optional callback(event) when an event ends
+            max_events: Keep only this many finished events (None keeps all); set it
+                        for live streams, event_counts() still counts every event
+        """
+        self.classes = list(classes or CLASS_NAMES)
+        self.iou_threshold = iou_threshold
+        self.high_confidence = high_confidence
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.fps = fps
+        self.on_event = on_event
+
+        self.tracks = []
+        self.events = deque(maxlen=max_events)
+        self._closed_counts = {cls: 0 for cls in self.classes}
+        self._next_id = 1
+
+    def _associate(self, tracks, detections, frame_index):
+        """Match detections to tracks; returns (matches, unmatched track idx, unmatched det idx)"""
+        if not tracks or not detections:
+            return [], list(range(len(tracks))), list(range(len(detections)))
+        predicted = np.stack([t.predict(frame_index) for t in tracks])
+        boxes = np.asarray([d['box'] for d in detections], dtype=np.float32)
+        matches = greedy_match(iou_matrix(predicted, boxes), self.iou_threshold)
+        matched_tracks = {r for r, _ in matches}
+        matched_dets = {c for _, c in matches}
+        return (matches,
+                [i for i in range(len(tracks)) if i not in matched_tracks],
+                [j for j in range(len(detections)) if j not in matched_dets])
+
+    def update(self, frame_index, detections):
+        """
+        Feed the detections of one frame
+
+        Args:
+            frame_index: Frame number (may skip frames, e.g. with frame_stride)
+            detections: List of dicts with 'class', 'confidence' and 'box'
+
+        Returns:
+            List of active confirmed tracks (Track objects)
+        """
+        high = [d for d in detections if d['confidence'] >= self.high_confidence]
+        low = [d for d in detections if d['confidence'] < self.high_confidence]
+
+        # First pass: confident detections against all tracks
+        matches, unmatched_tracks, unmatched_high = self._associate(self.tracks, high, frame_index)
+        for r, c in matches:
+            self.tracks[r].update(high[c], frame_index)
+
+        # Second pass: low-confidence detections only keep existing tracks alive
+        remaining = [self.tracks[i] for i in unmatched_tracks]
+        low_matches, _, _ = self._associate(remaining, low, frame_index)
+        for r, c in low_matches:
+            remaining[r].update(low[c], frame_index)
+
+        for j in unmatched_high:
+            self.tracks.append(Track(self._next_id, high[j], frame_index))
+            self._next_id += 1
+
+        # Retire tracks that have not been seen for max_age frames
+        alive = []
+        for track in self.tracks:
+            if frame_index - track.last_frame > self.max_age:
+                self._close(track)
+            else:
+                alive.append(track)
+        self.tracks = alive
+        return [t for t in self.tracks if t.hits >= self.min_hits]
+
+    def _close(self, track):
+        if track.hits < self.min_hits:
+            return  # Flicker, not an event
+        event = track.to_event(self.fps)
+        self.events.append(event)
+        self._closed_counts[event['severity']] += 1
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def finish(self):
+        """End all open tracks (call at the end of a video); returns all events"""
+        for track in self.tracks:
+            self._close(track)
+        self.tracks = []
+        return list(self.events)
+
+    def active_events(self):
+        """Events for confirmed tracks that are still open"""
+        return [t.to_event(self.fps) for t in self.tracks if t.hits >= self.min_hits]
+
+    def all_events(self):
+        """Finished plus still-open events"""
+        return list(self.events) + self.active_events()
+
+    def event_counts(self):
+        """Number of events per severity (including open ones)"""
+        counts = dict(self._closed_counts)
+        for track in self.tracks:
+            if track.hits >= self.min_hits:
+                counts[track.severity] += 1
+        return counts
+
+    def summary(self):
+        """Printable multi-line summary of events"""
+        events = self.all_events()
+        lines = [f"Accident events: {len(events)}"]
+        for event in events:
+            timeline = " -> ".join(f"{e['class']}@{e['frame']}" for e in event['severity_timeline'])
+            lines.append(f"  #{event['id']} {event['severity']}: frames {event['start_frame']}-"
+                         f"{event['end_frame']}, peak {event['peak_class']} "
+                         f"{event['peak_confidence']:.2f} ({timeline})")
+        return "\n".join(lines)
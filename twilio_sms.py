@@ -5,10 +5,62 @@ Sends SMS alerts when severe accidents are detected
 
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioException
+from twilio.http.http_client import TwilioHttpClient
 import json
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from urllib.parse import urlsplit
+
+from delivery_tracker import DeliveryTracker
+
+# Alert message - SHORT format for better delivery
+ALERT_MESSAGE = "🚨 SEVERE ACCIDENT DETECTED! Immediate attention required-loc:sathyabama."
+
+class RedirectingHttpClient(TwilioHttpClient):
+    """
+    TwilioHttpClient that sends every request to another base URL
+    
+    The SDK always builds https://api.twilio.com/... URLs (also for the
+    next page of a list); only the scheme and host are swapped, so a local
+    stand-in such as mock_twilio_server.py sees the normal REST paths.
+    """
+    
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip('/')
+    
+    def request(self, method, url, *args, **kwargs):
+        parts = urlsplit(url)
+        url = self.base_url + parts.path + (f"?{parts.query}" if parts.query else '')
+        return super().request(method, url, *args, **kwargs)
+
+
+def create_client(config):
+    """
+    Twilio Client for a twilio_config.json dict
+    
+    Uses one pooled HTTP session with a per-request timeout
+    (config 'request_timeout', default 10 s); requests go to config
+    'api_base_url' instead of api.twilio.com when it is set.
+    """
+    options = {'pool_connections': True, 'timeout': config.get('request_timeout', 10)}
+    if config.get('api_base_url'):
+        http_client = RedirectingHttpClient(config['api_base_url'], **options)
+    else:
+        http_client = TwilioHttpClient(**options)
+    return Client(config['account_sid'], config['auth_token'], http_client=http_client)
+
+
+def alert_severity(fire_count=0, moderate_count=0, severe_count=0):
+    """Severity label stored with tracked messages ('severe', 'fire' or 'moderate')"""
+    if severe_count:
+        return 'severe'
+    return 'fire' if fire_count else 'moderate'
+
 
 class TwilioSMSAlert:
     """Handles SMS alerts via Twilio"""
@@ -24,15 +76,26 @@ class TwilioSMSAlert:
         self.config = self.load_config()
         self.client = None
         self.enabled = False
+        self.deliveries = None
+        
+        # Contacts are sent concurrently from this pool (see dispatch_accident_alert)
+        settings = self.config or {}
+        self._executor = ThreadPoolExecutor(max_workers=settings.get('max_workers', 8),
+                                            thread_name_prefix='twilio-sms')
         
         if self.config and self.validate_config():
             try:
-                self.client = Client(
-                    self.config['account_sid'],
-                    self.config['auth_token']
-                )
+                # One pooled HTTP session shared by all sends; every request has a timeout
+                self.client = create_client(self.config)
                 self.enabled = True
-                print(f"[Twilio] SMS alerts enabled")
+                # Every SID sent is recorded for delivery_tracker polling
+                self.deliveries = DeliveryTracker(
+                    self.config.get('delivery_db', 'runs/alerts/deliveries.sqlite'), self.client,
+                    verified_ttl=self.config.get('verified_numbers_ttl', 3600))
+                if self.config.get('api_base_url'):
+                    print(f"[Twilio] SMS alerts enabled (API at {self.config['api_base_url']})")
+                else:
+                    print(f"[Twilio] SMS alerts enabled")
             except Exception as e:
                 print(f"[Twilio] Failed to initialize: {e}")
                 self.enabled = False
@@ -96,10 +159,200 @@ class TwilioSMSAlert:
         
         return True
     
+    def _normalize_phone(self, phone):
+        """Ensure phone number has + prefix for India"""
+        if not phone.startswith('+'):
+            if phone.startswith('91'):
+                phone = '+' + phone
+            elif phone.startswith('0'):
+                phone = '+91' + phone[1:]
+            else:
+                phone = '+91' + phone
+        return phone
+    
+    def contact_numbers(self):
+        """(name, phone) for every configured contact with a number, phones normalized"""
+        numbers = []
+        for contact in self.config.get('contacts', []):
+            phone = contact.get('phone', '')
+            if phone:
+                numbers.append((contact.get('name', 'Contact'), self._normalize_phone(phone)))
+        return numbers
+    
+    def _track(self, message_obj, name, phone, severity, source):
+        """Record a created message in the delivery tracker (never fails the send)"""
+        if self.deliveries is None:
+            return
+        try:
+            self.deliveries.record(message_obj.sid, phone, name, message_obj.status, severity, source)
+        except Exception as e:
+            print(f"[Twilio] Could not record {message_obj.sid} for delivery tracking: {e}")
+    
+    def _send_to_contact(self, name, phone, message, severity=None, source=None):
+        """
+        Send one SMS (runs on a pool thread)
+        
+        Args:
+            name: Contact name
+            phone: Normalized phone number
+            message: Message text
+            severity: Alert severity recorded with the SID (see alert_severity)
+            source: Video / camera recorded with the SID
+        
+        Returns:
+            Result dict for this contact, including 'latency_ms' of the API call
+        """
+        from_number = self.config['from_number']
+        start = time.perf_counter()
+        try:
+            print(f"[Twilio] Sending SMS to {name} ({phone})...")
+            
+            message_obj = self.client.messages.create(
+                body=message,
+                from_=from_number,
+                to=phone
+            )
+            latency_ms = (time.perf_counter() - start) * 1000
+            self._track(message_obj, name, phone, severity, source)
+            
+            # Check message status
+            status = message_obj.status
+            error_code = message_obj.error_code
+            error_message = message_obj.error_message
+            
+            if status in ['queued', 'sending', 'sent', 'delivered']:
+                if status == 'queued':
+                    print(f"[Twilio] SMS queued for {name} (SID: {message_obj.sid})")
+                    print(f"[Twilio] ⚠️  WARNING: Status is 'queued' - message may not be delivered!")
+                    print(f"[Twilio] ⚠️  For TRIAL accounts, phone number MUST be verified")
+                    print(f"[Twilio] ⚠️  Verify {phone} at: https://console.twilio.com/us1/develop/phone-numbers/manage/verified")
+                    print(f"[Twilio] ⚠️  Check message status in Twilio Console: Monitor → Logs → Messaging")
+                elif status == 'delivered':
+                    print(f"[Twilio] ✅ SMS DELIVERED to {name} (SID: {message_obj.sid})")
+                else:
+                    print(f"[Twilio] SMS sent to {name} (SID: {message_obj.sid}, Status: {status})")
+                
+                # Warn if account is trial and number might not be verified
+                if error_code == 21211:  # Invalid 'To' Phone Number
+                    print(f"[Twilio] ⚠️ WARNING: Phone number may not be verified in Twilio")
+                    print(f"[Twilio] Go to: https://console.twilio.com/us1/develop/phone-numbers/manage/verified")
+                
+                return {
+                    'contact': name,
+                    'phone': phone,
+                    'status': 'success',
+                    'message_sid': message_obj.sid,
+                    'delivery_status': status,
+                    'latency_ms': latency_ms
+                }
+            
+            print(f"[Twilio] SMS failed: Status={status}, Error={error_message}")
+            return {
+                'contact': name,
+                'phone': phone,
+                'status': 'failed',
+                'error': f"Status: {status}, Error: {error_message or 'Unknown'}",
+                'latency_ms': latency_ms
+            }
+                
+        except TwilioException as e:
+            error_msg = str(e)
+            error_code = getattr(e, 'code', None)
+            print(f"[Twilio] Failed to send SMS to {name}: {error_msg}")
+            
+            # Check for common trial account errors
+            if error_code == 21211:
+                print(f"[Twilio] ⚠️ This phone number needs to be verified in Twilio Console")
+                print(f"[Twilio] Verify at: https://console.twilio.com/us1/develop/phone-numbers/manage/verified")
+            elif 'trial' in error_msg.lower() or error_code == 20003:
+                print(f"[Twilio] ⚠️ Trial account restriction - verify phone number first")
+            
+            return {
+                'contact': name,
+                'phone': phone,
+                'status': 'failed',
+                'error': error_msg,
+                'error_code': error_code,
+                'latency_ms': (time.perf_counter() - start) * 1000
+            }
+        except Exception as e:
+            error_msg = str(e)
+            print(f"[Twilio] Unexpected error sending to {name}: {error_msg}")
+            return {
+                'contact': name,
+                'phone': phone,
+                'status': 'failed',
+                'error': error_msg,
+                'latency_ms': (time.perf_counter() - start) * 1000
+            }
+    
+    def dispatch_accident_alert(self, video_name="Unknown", frame_count=0,
+                                fire_count=0, moderate_count=0, severe_count=0, message=None):
+        """
+        Start sending the alert to all contacts concurrently and return immediately
+        
+        Every contact is sent on the pool over the shared HTTP session, so the
+        alert takes about one round trip no matter how many contacts there are.
+        Safe to call from a frame loop: it only queues work.
+        
+        Args:
+            video_name: Name of the video file
+            frame_count: Total frames processed
+            fire_count: Number of fire detections
+            moderate_count: Number of moderate detections
+            severe_count: Number of severe detections
+            message: Custom text (e.g. from alert_policy.format_alert); it is sent
+                     whatever the counts, since the caller's policy decided to alert
+        
+        Returns:
+            Future resolving to the list of per-contact result dicts (in contact
+            order, each with 'latency_ms'), or None if nothing is sent
+        """
+        if not self.enabled or not self.client:
+            print("[Twilio] SMS alerts not enabled")
+            return None
+        
+        if severe_count < 1 and message is None:
+            print("[Twilio] No severe accident - SMS not sent")
+            return None
+        
+        message = message or ALERT_MESSAGE
+        severity = alert_severity(fire_count, moderate_count, severe_count)
+        contact_futures = [self._executor.submit(self._send_to_contact, name, phone, message,
+                                                 severity, video_name)
+                           for name, phone in self.contact_numbers()]
+        
+        # One future for the whole alert, completed when the last contact is done
+        alert_future = Future()
+        if not contact_futures:
+            alert_future.set_result([])
+            return alert_future
+        remaining = [len(contact_futures)]
+        lock = threading.Lock()
+        
+        def contact_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            results = [f.result() for f in contact_futures]
+            sent = sum(1 for r in results if r['status'] == 'success')
+            slowest = max(r['latency_ms'] for r in results)
+            print(f"[Twilio] Alert sent to {sent}/{len(results)} contact(s) "
+                  f"(slowest {slowest:.0f} ms)")
+            alert_future.set_result(results)
+        
+        for f in contact_futures:
+            f.add_done_callback(contact_done)
+        return alert_future
+    
     def send_accident_alert(self, video_name="Unknown", frame_count=0, 
                            fire_count=0, moderate_count=0, severe_count=0):
         """
-        Send SMS alert to all configured contacts when severe accident detected
+        Send SMS alert to all configured contacts and wait for the results
+        
+        Blocking wrapper around dispatch_accident_alert; contacts are still
+        sent concurrently.
         
         Args:
             video_name: Name of the video file
@@ -107,126 +360,96 @@ class TwilioSMSAlert:
             fire_count: Number of fire detections
             moderate_count: Number of moderate detections
             severe_count: Number of severe detections
+        
+        Returns:
+            List of per-contact result dicts, or False if nothing was sent
+        """
+        future = self.dispatch_accident_alert(video_name, frame_count, fire_count,
+                                              moderate_count, severe_count)
+        if future is None:
+            return False
+        return future.result()
+    
+    def queue_accident_alert(self, outbox, video_name="Unknown", frame_count=0,
+                             fire_count=0, moderate_count=0, severe_count=0, alert_key=None,
+                             message=None):
+        """
+        Write the alert to a durable AlertOutbox instead of sending it here
+        
+        Returns as soon as the rows are stored; the outbox sender delivers
+        them (see outbox_sender) and retries failures, also after a restart.
+        
+        Args:
+            outbox: alert_outbox.AlertOutbox
+            video_name: Name of the video file or camera
+            frame_count: Total frames processed
+            fire_count: Number of fire detections
+            moderate_count: Number of moderate detections
+            severe_count: Number of severe detections
+            alert_key: Idempotency key; queueing the same key again is ignored
+            message: Custom text, sent whatever the counts (see dispatch_accident_alert)
+        
+        Returns:
+            Number of messages queued
         """
         if not self.enabled or not self.client:
             print("[Twilio] SMS alerts not enabled")
-            return False
+            return 0
         
-        if severe_count < 1:
+        if severe_count < 1 and message is None:
             print("[Twilio] No severe accident - SMS not sent")
-            return False
+            return 0
         
-        # Create alert message - SHORT format for better delivery
-        message = "🚨 SEVERE ACCIDENT DETECTED! Immediate attention required-loc:sathyabama."
+        details = {
+            'video_name': video_name,
+            'frame_count': frame_count,
+            'fire_count': fire_count,
+            'moderate_count': moderate_count,
+            'severe_count': severe_count
+        }
+        return outbox.enqueue(self.contact_numbers(), message or ALERT_MESSAGE, alert_key, details)
+    
+    def outbox_sender(self):
+        """
+        Sender callable for AlertOutbox that delivers through this Twilio client
         
-        results = []
-        from_number = self.config['from_number']
+        Errors that can't succeed on retry (unverified number, auth failure,
+        see alert_outbox.PERMANENT_ERROR_CODES) are raised as PermanentSendError.
+        Created messages are recorded in the delivery tracker with the
+        severity from the queued alert details.
+        Twilio has no idempotency key for messages, so a crash between
+        create() and the outbox marking the row sent repeats that SMS on
+        restart (at-least-once delivery).
+        """
+        from alert_outbox import PERMANENT_ERROR_CODES, PermanentSendError
         
-        # Send to all contacts
-        for contact in self.config['contacts']:
-            name = contact.get('name', 'Contact')
-            phone = contact.get('phone', '')
-            
-            if not phone:
-                continue
-            
-            # Ensure phone number has + prefix for India
-            if not phone.startswith('+'):
-                if phone.startswith('91'):
-                    phone = '+' + phone
-                elif phone.startswith('0'):
-                    phone = '+91' + phone[1:]
-                else:
-                    phone = '+91' + phone
-            
+        def send(message):
             try:
-                print(f"[Twilio] Sending SMS to {name} ({phone})...")
-                
                 message_obj = self.client.messages.create(
-                    body=message,
-                    from_=from_number,
-                    to=phone
+                    body=message['body'],
+                    from_=self.config['from_number'],
+                    to=message['phone']
                 )
-                
-                # Check message status
-                status = message_obj.status
-                error_code = message_obj.error_code
-                error_message = message_obj.error_message
-                
-                if status in ['queued', 'sending', 'sent', 'delivered']:
-                    results.append({
-                        'contact': name,
-                        'phone': phone,
-                        'status': 'success',
-                        'message_sid': message_obj.sid,
-                        'delivery_status': status
-                    })
-                    
-                    if status == 'queued':
-                        print(f"[Twilio] SMS queued for {name} (SID: {message_obj.sid})")
-                        print(f"[Twilio] ⚠️  WARNING: Status is 'queued' - message may not be delivered!")
-                        print(f"[Twilio] ⚠️  For TRIAL accounts, phone number MUST be verified")
-                        print(f"[Twilio] ⚠️  Verify {phone} at: https://console.twilio.com/us1/develop/phone-numbers/manage/verified")
-                        print(f"[Twilio] ⚠️  Check message status in Twilio Console: Monitor → Logs → Messaging")
-                    elif status == 'delivered':
-                        print(f"[Twilio] ✅ SMS DELIVERED to {name} (SID: {message_obj.sid})")
-                    else:
-                        print(f"[Twilio] SMS sent to {name} (SID: {message_obj.sid}, Status: {status})")
-                    
-                    # Warn if account is trial and number might not be verified
-                    if error_code == 21211:  # Invalid 'To' Phone Number
-                        print(f"[Twilio] ⚠️ WARNING: Phone number may not be verified in Twilio")
-                        print(f"[Twilio] Go to: https://console.twilio.com/us1/develop/phone-numbers/manage/verified")
-                else:
-                    results.append({
-                        'contact': name,
-                        'phone': phone,
-                        'status': 'failed',
-                        'error': f"Status: {status}, Error: {error_message or 'Unknown'}"
-                    })
-                    print(f"[Twilio] SMS failed: Status={status}, Error={error_message}")
-                    
             except TwilioException as e:
-                error_msg = str(e)
-                error_code = getattr(e, 'code', None)
-                
-                results.append({
-                    'contact': name,
-                    'phone': phone,
-                    'status': 'failed',
-                    'error': error_msg,
-                    'error_code': error_code
-                })
-                
-                print(f"[Twilio] Failed to send SMS to {name}: {error_msg}")
-                
-                # Check for common trial account errors
-                if error_code == 21211:
-                    print(f"[Twilio] ⚠️ This phone number needs to be verified in Twilio Console")
-                    print(f"[Twilio] Verify at: https://console.twilio.com/us1/develop/phone-numbers/manage/verified")
-                elif 'trial' in error_msg.lower() or error_code == 20003:
-                    print(f"[Twilio] ⚠️ Trial account restriction - verify phone number first")
-                
-            except TwilioException as e:
-                error_msg = str(e)
-                results.append({
-                    'contact': name,
-                    'phone': phone,
-                    'status': 'failed',
-                    'error': error_msg
-                })
-                print(f"[Twilio] Failed to send SMS to {name}: {error_msg}")
-            except Exception as e:
-                error_msg = str(e)
-                results.append({
-                    'contact': name,
-                    'phone': phone,
-                    'status': 'failed',
-                    'error': error_msg
-                })
-                print(f"[Twilio] Unexpected error sending to {name}: {error_msg}")
-        
-        return results
+                if getattr(e, 'code', None) in PERMANENT_ERROR_CODES:
+                    raise PermanentSendError(f"Twilio error {e.code}: {e}")
+                raise
+            details = json.loads(message['details']) if message.get('details') else {}
+            self._track(message_obj, message.get('contact'), message['phone'],
+                        alert_severity(details.get('fire_count', 0), details.get('moderate_count', 0),
+                                       details.get('severe_count', 0)),
+                        details.get('video_name'))
+            if message_obj.status in ['failed', 'undelivered']:
+                raise RuntimeError(f"Status: {message_obj.status}, "
+                                   f"Error: {message_obj.error_message or 'Unknown'}")
+            return message_obj.sid
+        return send
+    
+    def close(self, wait=True):
+        """Shut down the send pool (waits for alerts in flight by default)"""
+        self._executor.shutdown(wait=wait)
+        if self.deliveries is not None and wait:
+            self.deliveries.close()
     
     def test_connection(self):
         """Test Twilio connection"""
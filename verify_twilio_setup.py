@@ -2,7 +2,7 @@
 Verify Twilio Setup and Check Phone Number Verification Status
 """
 
-from twilio.rest import Client
+from twilio_sms import create_client
 import json
 
 print("=" * 70)
@@ -26,7 +26,7 @@ print()
 
 # Initialize client
 try:
-    client = Client(config['account_sid'], config['auth_token'])
+    client = create_client(config)
     print("✅ Twilio client initialized")
 except Exception as e:
     print(f"❌ Failed to initialize client: {e}")
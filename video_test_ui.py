@@ -7,9 +7,16 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from pathlib import Path
 import threading
-from ultralytics import YOLO
+import time
 import cv2
 import os
+from motion_gate import MotionGate
+from detection_stats import DetectionAggregator
+from detection_store import DetectionTable
+from model_registry import get_registry
+from stage_timer import StageTimer
+from async_writer import AsyncVideoWriter
+from tracker import AccidentTracker
 # Import Twilio SMS (optional - UI will work without it)
 try:
     from twilio_sms import TwilioSMSAlert
@@ -18,6 +25,8 @@ except Exception as e:
     print(f"[Warning] Twilio SMS not available: {e}")
     TWILIO_AVAILABLE = False
     TwilioSMSAlert = None
+from alert_outbox import AlertOutbox
+from alert_policy import AlertPolicy, format_alert
 
 class AccidentDetectionUI:
     def __init__(self, root):
@@ -32,6 +41,22 @@ class AccidentDetectionUI:
         self.output_path = None
         self.live_detection_active = False
         self.live_detection_thread = None
+        # Video and live detection share one model, so only one of them runs at a time
+        self.video_processing_active = False
+        
+        # Live detection motion gate (skip inference on static frames)
+        self.motion_gate_enabled = True
+        self.motion_sensitivity = 0.02    # Fraction of changed pixels that counts as motion
+        self.motion_refresh_interval = 30  # Force an inference after this many skipped frames
+        
+        # Live alert policy: same accident not re-alerted within the window,
+        # escalations (moderate -> severe, fire) sent at once, bursts batched
+        self.alert_window = 300.0          # Seconds before the same event is alerted again
+        self.alert_batch_window = 10.0     # Minimum seconds between two SMS messages
+        # Processed videos share one policy, so re-running a video within the window
+        # doesn't alert the same events again
+        self.video_alert_policy = AlertPolicy(self.alert_window, self.alert_batch_window)
+        self.alert_session = int(time.time())
         
         # Initialize Twilio SMS alert system
         self.sms_alert = None
@@ -42,8 +67,26 @@ class AccidentDetectionUI:
                 print(f"[SMS] Failed to initialize SMS alerts: {e}")
                 self.sms_alert = None
         
+        # Live alerts go through a durable outbox: queued instantly, retried on
+        # failure and replayed if the app is closed before they are sent
+        self.alert_outbox = None
+        if self.sms_alert and self.sms_alert.enabled:
+            try:
+                self.alert_outbox = AlertOutbox('runs/alerts/outbox.sqlite',
+                                                sender=self.sms_alert.outbox_sender())
+                self.alert_outbox.start()
+            except Exception as e:
+                print(f"[SMS] Alert outbox unavailable, sending directly: {e}")
+                self.alert_outbox = None
+        
         # Create UI
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Load and warm up the model in the background so the first click is fast
+        self.model_registry = get_registry()
+        self.model_registry.preload(self.model_path)
+        self.fallback_warning_shown = False
         
     def create_widgets(self):
         # Title
@@ -147,6 +190,26 @@ class AccidentDetectionUI:
         
         self.conf_var.trace('w', self.update_conf_label)
         
+        # Headless mode: detections only, no annotated output video
+        self.headless_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            conf_frame,
+            text="Detections only (no output video)",
+            variable=self.headless_var,
+            font=("Arial", 9),
+            bg='#f0f0f0'
+        ).pack(side=tk.LEFT, padx=10)
+        
+        # Export every detection with its box to <video>_detections.npz (like --export)
+        self.export_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            conf_frame,
+            text="Export detections (.npz)",
+            variable=self.export_var,
+            font=("Arial", 9),
+            bg='#f0f0f0'
+        ).pack(side=tk.LEFT, padx=10)
+        
         # Process button
         self.process_btn = tk.Button(
             self.root,
@@ -183,6 +246,16 @@ class AccidentDetectionUI:
         )
         self.status_label.pack(pady=10)
         
+        # Per-stage timing line (ms per frame for decode / inference / plot / ...)
+        self.timing_label = tk.Label(
+            self.root,
+            text="",
+            font=("Arial", 8),
+            bg='#f0f0f0',
+            fg='#888888'
+        )
+        self.timing_label.pack()
+        
         # Results label
         self.results_label = tk.Label(
             self.root,
@@ -215,6 +288,9 @@ class AccidentDetectionUI:
         if self.live_detection_active:
             messagebox.showinfo("Already Running", "Live detection is already active!")
             return
+        if self.video_processing_active:
+            messagebox.showinfo("Busy", "Wait for the video to finish processing first!")
+            return
         
         # Confirm camera access
         response = messagebox.askyesno(
@@ -233,6 +309,7 @@ class AccidentDetectionUI:
         # Update status
         self.status_label.config(text="🔴 Live Detection Active - Camera opening...", fg='#FF5722')
         self.results_label.config(text="", fg='#333333')
+        self.timing_label.config(text="")
         self.progress.start(10)
         
         # Start live detection in separate thread
@@ -247,20 +324,8 @@ class AccidentDetectionUI:
         model = None
         
         try:
-            # Load model
-            self.update_status("Loading model for live detection...")
-            try:
-                model = YOLO(self.model_path)
-            except (AttributeError, RuntimeError, Exception) as model_error:
-                error_str = str(model_error)
-                if 'C3k2' in error_str or 'Can\'t get attribute' in error_str:
-                    fallback_model = 'yolo11n.pt'
-                    if os.path.exists(fallback_model):
-                        model = YOLO(fallback_model)
-                    else:
-                        raise Exception("Could not load model")
-                else:
-                    raise model_error
+            # Get the shared, warmed-up model
+            model = self.get_model("Loading model for live detection...")
             
             # Open camera (front camera - index 0)
             self.update_status("Opening front camera...")
@@ -284,29 +349,41 @@ class AccidentDetectionUI:
             cv2.moveWindow(window_name, 100, 100)  # Position window
             
             frame_count = 0
-            detections = []
-            severe_detected = False
-            sms_sent = False
+            detections = DetectionAggregator(window_seconds=60.0)
+            # One event per accident instead of one per box; keep recent events only on a live feed
+            tracker = AccidentTracker(max_events=1000)
+            timer = StageTimer()
+            policy = AlertPolicy(self.alert_window, self.alert_batch_window)
+            session = int(time.time())
+            results = None
+            motion_gate = None
+            if self.motion_gate_enabled:
+                motion_gate = MotionGate(self.motion_sensitivity,
+                                         refresh_interval=self.motion_refresh_interval)
             
             # Process frames
             while self.live_detection_active:
-                ret, frame = cap.read()
+                with timer.stage('decode'):
+                    ret, frame = cap.read()
                 if not ret:
                     break
                 
                 frame_count += 1
                 
-                # Run inference on frame
-                results = model.predict(
-                    source=frame,
-                    conf=conf_threshold,
-                    verbose=False
-                )
+                # Run inference on frame (static frames reuse the last result)
+                if motion_gate is None or motion_gate.should_infer(frame) or results is None:
+                    results = model.predict(
+                        source=frame,
+                        conf=conf_threshold,
+                        verbose=False
+                    )
+                    timer.record_speed(results[0].speed)
                 
                 # Process detections
                 for r in results:
                     boxes = r.boxes
                     frame_severe = False
+                    frame_detections = []
                     
                     for box in boxes:
                         cls = int(box.cls[0])
@@ -314,18 +391,29 @@ class AccidentDetectionUI:
                         class_names = ['fire', 'moderate', 'severe']
                         class_name = class_names[cls]
                         
-                        detections.append({
+                        detections.add({
                             'frame': frame_count,
                             'class': class_name,
                             'confidence': conf
                         })
+                        frame_detections.append({
+                            'class': class_name,
+                            'confidence': conf,
+                            'box': [float(v) for v in box.xyxy[0]]
+                        })
                         
                         if class_name == 'severe':
                             frame_severe = True
-                            severe_detected = True
                     
-                    # Draw detections on frame
-                    annotated_frame = r.plot()
+                    # Alert on accident events once tracked for a few frames (see AlertPolicy)
+                    confirmed = tracker.update(frame_count, frame_detections)
+                    alerts = [policy.observe("Live Camera Feed", track.id, track.class_counts)
+                              for track in confirmed]
+                    alerts = [a for a in alerts + [policy.poll()] if a]
+                    
+                    # Draw detections on the current frame
+                    with timer.stage('plot'):
+                        annotated_frame = r.plot(img=frame)
                     
                     # Add status text overlay on video
                     status_text = "LIVE DETECTION - Press 'Q' to stop"
@@ -346,7 +434,8 @@ class AccidentDetectionUI:
                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
                     
                     # Display frame in the named window
-                    cv2.imshow(window_name, annotated_frame)
+                    with timer.stage('display'):
+                        cv2.imshow(window_name, annotated_frame)
                     
                     # Bring window to front (Windows specific)
                     try:
@@ -362,33 +451,25 @@ class AccidentDetectionUI:
                     except:
                         pass  # If win32gui not available, continue without it
                     
-                    # Check for severe accident and send SMS (once)
-                    if severe_detected and not sms_sent:
-                        # Calculate counts
-                        fire_count = sum(1 for d in detections if d['class'] == 'fire')
-                        moderate_count = sum(1 for d in detections if d['class'] == 'moderate')
-                        severe_count = sum(1 for d in detections if d['class'] == 'severe')
+                    # Send SMS for each alert the policy let through
+                    for alert in alerts:
+                        # Current accident event counts
+                        event_counts = tracker.event_counts()
+                        fire_count = event_counts['fire']
+                        moderate_count = event_counts['moderate']
+                        severe_count = event_counts['severe']
                         
                         # Update UI with accident alert
                         self.root.after(0, self.update_live_accident_detected, 
                                       frame_count, fire_count, moderate_count, severe_count)
                         
-                        # Send SMS alert
-                        if self.sms_alert and self.sms_alert.enabled:
-                            try:
-                                self.sms_alert.send_accident_alert(
-                                    video_name="Live Camera Feed",
-                                    frame_count=frame_count,
-                                    fire_count=fire_count,
-                                    moderate_count=moderate_count,
-                                    severe_count=severe_count
-                                )
-                                sms_sent = True
-                            except Exception as e:
-                                print(f"[SMS] Error sending SMS: {e}")
+                        # Send SMS alert (only queued here - the camera loop never waits on Twilio)
+                        self.send_live_alert(alert, session, frame_count, event_counts)
                 
                 # Check for 'q' or ESC key to stop (waitKey is needed to update window)
-                key = cv2.waitKey(1) & 0xFF
+                with timer.stage('display'):
+                    key = cv2.waitKey(1) & 0xFF
+                timer.end_frame()
                 if key == ord('q') or key == 27:  # 'q' or ESC to stop
                     break
                 
@@ -402,20 +483,33 @@ class AccidentDetectionUI:
                 
                 # Update UI with current stats every 30 frames
                 if frame_count % 30 == 0:
-                    fire_count = sum(1 for d in detections if d['class'] == 'fire')
-                    moderate_count = sum(1 for d in detections if d['class'] == 'moderate')
-                    severe_count = sum(1 for d in detections if d['class'] == 'severe')
+                    event_counts = tracker.event_counts()
+                    fire_count = event_counts['fire']
+                    moderate_count = event_counts['moderate']
+                    severe_count = event_counts['severe']
                     
+                    skipped = motion_gate.skipped if motion_gate is not None else None
                     self.root.after(0, self.update_live_status, 
-                                  frame_count, fire_count, moderate_count, severe_count)
+                                  frame_count, fire_count, moderate_count, severe_count, skipped,
+                                  detections.window_counts()['severe'])
+                    self.update_timing(timer)
             
             # Cleanup
             cv2.destroyAllWindows()
+            if motion_gate is not None:
+                print(f"[Live Detection] {motion_gate.summary()}")
+            timer.print_summary("[Live Detection] Stage Timing")
             
             # Final update
-            fire_count = sum(1 for d in detections if d['class'] == 'fire')
-            moderate_count = sum(1 for d in detections if d['class'] == 'moderate')
-            severe_count = sum(1 for d in detections if d['class'] == 'severe')
+            tracker.finish()
+            print(f"[Live Detection] {tracker.summary()}")
+            event_counts = tracker.event_counts()
+            # Alerts still waiting for their batch window go out now rather than never
+            while policy.pending():
+                self.send_live_alert(policy.flush(), session, frame_count, event_counts)
+            fire_count = event_counts['fire']
+            moderate_count = event_counts['moderate']
+            severe_count = event_counts['severe']
             
             self.root.after(0, self.live_detection_complete, 
                           frame_count, fire_count, moderate_count, severe_count)
@@ -430,9 +524,42 @@ class AccidentDetectionUI:
             cv2.destroyAllWindows()
             self.live_detection_active = False
     
-    def update_live_status(self, frame_count, fire_count, moderate_count, severe_count):
+    def send_live_alert(self, alert, session, frame_count, event_counts):
+        """Queue (outbox) or dispatch the SMS for a live camera alert; called from the capture thread"""
+        if not (self.sms_alert and self.sms_alert.enabled):
+            return
+        try:
+            if self.alert_outbox is not None:
+                self.sms_alert.queue_accident_alert(
+                    self.alert_outbox,
+                    video_name="Live Camera Feed",
+                    frame_count=frame_count,
+                    fire_count=event_counts['fire'],
+                    moderate_count=event_counts['moderate'],
+                    severe_count=event_counts['severe'],
+                    alert_key=f"live:{session}:{alert['id']}",
+                    message=format_alert(alert)
+                )
+            else:
+                self.sms_alert.dispatch_accident_alert(
+                    video_name="Live Camera Feed",
+                    frame_count=frame_count,
+                    fire_count=event_counts['fire'],
+                    moderate_count=event_counts['moderate'],
+                    severe_count=event_counts['severe'],
+                    message=format_alert(alert)
+                )
+        except Exception as e:
+            print(f"[SMS] Error sending SMS: {e}")
+    
+    def update_live_status(self, frame_count, fire_count, moderate_count, severe_count,
+                           skipped_inferences=None, recent_severe=None):
         """Update UI with live detection status"""
-        status_text = f"🔴 Live: {frame_count} frames | Fire: {fire_count} | Moderate: {moderate_count} | Severe: {severe_count}"
+        status_text = f"🔴 Live: {frame_count} frames | Events - Fire: {fire_count} | Moderate: {moderate_count} | Severe: {severe_count}"
+        if recent_severe is not None:
+            status_text += f" (severe boxes last 60s: {recent_severe})"
+        if skipped_inferences is not None:
+            status_text += f" | Inferences saved: {skipped_inferences}"
         self.status_label.config(text=status_text, fg='#FF5722')
     
     def update_live_accident_detected(self, frame_count, fire_count, moderate_count, severe_count):
@@ -443,7 +570,7 @@ class AccidentDetectionUI:
             f"{accident_alert}\n\n"
             f"🔴 LIVE DETECTION\n"
             f"📊 Frames processed: {frame_count}\n"
-            f"🔍 Total detections: {fire_count + moderate_count + severe_count}\n"
+            f"🔍 Accident events: {fire_count + moderate_count + severe_count}\n"
             f"🔥 Fire: {fire_count} | ⚠️ Moderate: {moderate_count} | 🚨 Severe: {severe_count}"
         )
         
@@ -541,10 +668,17 @@ class AccidentDetectionUI:
             messagebox.showwarning("No File", "Please select a video file first!")
             return
         
+        if self.live_detection_active:
+            messagebox.showinfo("Busy", "Stop live detection first!")
+            return
+        
         # Disable buttons during processing
+        self.video_processing_active = True
         self.upload_btn.config(state=tk.DISABLED)
         self.process_btn.config(state=tk.DISABLED)
+        self.live_detection_btn.config(state=tk.DISABLED)
         self.status_label.config(text="Processing video... Please wait", fg='#2196F3')
+        self.timing_label.config(text="")
         self.progress.start(10)
         
         # Run in thread to keep UI responsive
@@ -554,97 +688,142 @@ class AccidentDetectionUI:
     
     def run_inference(self):
         try:
-            # Load model with error handling for version compatibility
-            self.update_status("Loading model...")
-            try:
-                model = YOLO(self.model_path)
-            except (AttributeError, RuntimeError, Exception) as model_error:
-                error_str = str(model_error)
-                # Check if it's a version compatibility issue
-                if 'C3k2' in error_str or 'Can\'t get attribute' in error_str:
-                    self.update_status("Model version mismatch - using default model...")
-                    # Fallback to pretrained model
-                    fallback_model = 'yolo11n.pt'
-                    if os.path.exists(fallback_model):
-                        model = YOLO(fallback_model)
-                        self.root.after(0, lambda: messagebox.showwarning(
-                            "Model Compatibility Warning",
-                            f"Your trained model requires a different Ultralytics version.\n"
-                            f"Using default model ({fallback_model}) for now.\n\n"
-                            f"To fix: Update ultralytics to match training version:\n"
-                            f"pip install --upgrade ultralytics"
-                        ))
-                    else:
-                        raise Exception("Could not load model and fallback not available")
-                else:
-                    raise model_error
+            # Get the shared, warmed-up model (handles version compatibility fallback)
+            model = self.get_model("Loading model...")
             
             # Run inference
             self.update_status("Detecting accidents in video...")
             conf_threshold = self.conf_var.get()
             
-            results = model.predict(
-                source=self.video_path,
-                conf=conf_threshold,
-                save=True,
-                project='runs/detect',
-                name='video_results',
-                exist_ok=True,
-                stream=True
-            )
+            headless = self.headless_var.get()
+            table = DetectionTable() if self.export_var.get() else None
+            
+            cap = cv2.VideoCapture(self.video_path)
+            if not cap.isOpened():
+                raise Exception(f"Could not open video: {self.video_path}")
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30
             
-            # Process results
+            output_dir = Path('runs/detect/video_results')
+            output_dir.mkdir(parents=True, exist_ok=True)
+            self.output_path = None
+            writer = None
+            timer = StageTimer()
+            if not headless:
+                # Drawing and encoding run on the writer thread, not in this loop
+                self.output_path = str(output_dir / f"{Path(self.video_path).stem}.mp4")
+                writer = AsyncVideoWriter(self.output_path, fps, timer=timer)
+            
+            # Process frames
             frame_count = 0
-            detections = []
+            detections = DetectionAggregator()
+            tracker = AccidentTracker(fps=fps)
+            try:
+                while True:
+                    with timer.stage('decode'):
+                        ret, frame = cap.read()
+                    if not ret:
+                        break
+                    frame_count += 1
+                    
+                    r = model.predict(source=frame, conf=conf_threshold, verbose=False)[0]
+                    timer.record_speed(r.speed)
+                    if table is not None:
+                        table.append_result(frame_count, frame_count / fps, r)
+                    
+                    frame_detections = []
+                    for box in r.boxes:
+                        cls = int(box.cls[0])
+                        conf = float(box.conf[0])
+                        class_names = ['fire', 'moderate', 'severe']
+                        class_name = class_names[cls]
+                        detections.add({
+                            'frame': frame_count,
+                            'class': class_name,
+                            'confidence': conf
+                        })
+                        frame_detections.append({
+                            'class': class_name,
+                            'confidence': conf,
+                            'box': [float(v) for v in box.xyxy[0]]
+                        })
+                    tracker.update(frame_count, frame_detections)
+                    
+                    if writer is not None:
+                        writer.write(frame, r)
+                    timer.end_frame()
+                    if frame_count % 30 == 0:
+                        self.update_timing(timer)
+            finally:
+                cap.release()
+                if writer is not None:
+                    writer.close()
             
-            for r in results:
-                frame_count += 1
-                boxes = r.boxes
-                
-                for box in boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    class_names = ['fire', 'moderate', 'severe']
-                    class_name = class_names[cls]
-                    detections.append({
-                        'frame': frame_count,
-                        'class': class_name,
-                        'confidence': conf
-                    })
+            self.update_timing(timer)
+            timer.print_summary("[Video] Stage Timing")
             
-            # Find output video
-            output_dir = Path('runs/detect/video_results')
-            video_files = list(output_dir.glob('*.mp4')) + list(output_dir.glob('*.avi'))
-            if video_files:
-                self.output_path = str(video_files[0])
+            # Save every detection with its box for offline analysis
+            if table is not None:
+                table.to_npz(output_dir / f"{Path(self.video_path).stem}_detections.npz")
             
-            # Calculate statistics
-            fire_count = sum(1 for d in detections if d['class'] == 'fire')
-            moderate_count = sum(1 for d in detections if d['class'] == 'moderate')
-            severe_count = sum(1 for d in detections if d['class'] == 'severe')
+            # Calculate statistics - one event per tracked accident, not per box
+            tracker.finish()
+            print(f"[Video] {tracker.summary()}")
+            event_counts = tracker.event_counts()
+            fire_count = event_counts['fire']
+            moderate_count = event_counts['moderate']
+            severe_count = event_counts['severe']
             
             # Build results text with accident alert
             results_text = (
                 f"✅ Processing complete!\n"
                 f"📊 Frames processed: {frame_count}\n"
-                f"🔍 Total detections: {len(detections)}\n"
+                f"🔍 Accident events: {len(tracker.events)} ({len(detections)} detections)\n"
                 f"🔥 Fire: {fire_count} | ⚠️ Moderate: {moderate_count} | 🚨 Severe: {severe_count}"
             )
             
             # Pass all parameters to processing_complete
             video_name = Path(self.video_path).name if self.video_path else "Unknown"
             self.root.after(0, self.processing_complete, results_text, severe_count, 
-                          fire_count, moderate_count, frame_count, video_name)
+                          fire_count, moderate_count, frame_count, video_name, list(tracker.events))
             
         except Exception as e:
             error_msg = f"Error: {str(e)}"
             self.root.after(0, self.processing_error, error_msg)
     
+    def get_model(self, loading_message):
+        """Wait for the shared model from the registry and report how it was loaded"""
+        if not self.model_registry.is_ready(self.model_path):
+            self.update_status(loading_message)
+        model = self.model_registry.get(self.model_path)
+        info = self.model_registry.info(self.model_path)
+        
+        if info['used_fallback'] and not self.fallback_warning_shown:
+            # The fallback decision is cached by the registry - warn only once
+            self.fallback_warning_shown = True
+            fallback_model = info['loaded_path']
+            self.root.after(0, lambda: messagebox.showwarning(
+                "Model Compatibility Warning",
+                f"Your trained model requires a different Ultralytics version.\n"
+                f"Using default model ({fallback_model}) for now.\n\n"
+                f"To fix: Update ultralytics to match training version:\n"
+                f"pip install --upgrade ultralytics"
+            ))
+        
+        print(f"[Model] Using {info['loaded_path']} "
+              f"(load {info['load_time']:.2f}s, warm-up {info['warmup_time']:.2f}s)")
+        return model
+    
     def update_status(self, message):
         self.root.after(0, lambda: self.status_label.config(text=message))
     
+    def update_timing(self, timer):
+        """Show the per-stage ms line under the status label"""
+        line = timer.format_line()
+        self.root.after(0, lambda: self.timing_label.config(text=line))
+    
     def processing_complete(self, results_text, severe_count=0, 
-                          fire_count=0, moderate_count=0, frame_count=0, video_name="Unknown"):
+                          fire_count=0, moderate_count=0, frame_count=0, video_name="Unknown",
+                          events=()):
         self.progress.stop()
         self.status_label.config(text="✅ Success!", fg='#4CAF50')
         
@@ -670,67 +849,40 @@ class AccidentDetectionUI:
                 justify=tk.LEFT
             )
         
+        self.video_processing_active = False
         self.upload_btn.config(state=tk.NORMAL)
         self.process_btn.config(state=tk.NORMAL)
+        self.live_detection_btn.config(state=tk.NORMAL)
         
         if self.output_path:
             self.open_btn.pack(pady=10)
         
-        # Handle SMS alerts when severe accident detected
-        if severe_count >= 1:
+        # Handle SMS alerts: the video's accident events go through the alert policy
+        # (no repeat alert for events already alerted, escalations sent at once)
+        if severe_count >= 1 or events:
             if self.sms_alert and self.sms_alert.enabled:
-                # SMS is enabled - send alert
-                try:
-                    # Send SMS alert in background thread to avoid blocking UI
-                    import threading
-                    def send_sms():
-                        print("\n[SMS] Severe accident detected - Sending SMS alerts...")
-                        sms_results = self.sms_alert.send_accident_alert(
-                            video_name=video_name,
-                            frame_count=frame_count,
-                            fire_count=fire_count,
-                            moderate_count=moderate_count,
-                            severe_count=severe_count
+                alerts = [self.video_alert_policy.observe(video_name, event['id'], event['class_counts'])
+                          for event in events]
+                alerts = [a for a in alerts + [self.video_alert_policy.flush()] if a]
+                for alert in alerts:
+                    try:
+                        self.send_video_alert(alert, video_name, frame_count,
+                                              fire_count, moderate_count, severe_count)
+                    except Exception as e:
+                        print(f"[SMS] Error sending SMS: {e}")
+                        self.status_label.config(
+                            text=f"❌ SMS Error: {str(e)[:50]}",
+                            fg='#FF0000'
                         )
-                        
-                        # Update UI with SMS status
-                        if sms_results:
-                            success_count = sum(1 for r in sms_results if r['status'] == 'success')
-                            failed_count = sum(1 for r in sms_results if r['status'] == 'failed')
-                            
-                            if success_count > 0:
-                                sms_message = f"✅ Success! SMS sent to {success_count} contact(s)"
-                                if failed_count > 0:
-                                    sms_message += f" (Failed: {failed_count})"
-                                
-                                # Get contact names
-                                contact_phones = [r['phone'] for r in sms_results if r['status'] == 'success']
-                                if contact_phones:
-                                    sms_message += f"\n📱 Sent to: {', '.join(contact_phones)}"
-                                
-                                self.root.after(0, lambda msg=sms_message: self.status_label.config(
-                                    text=msg,
-                                    fg='#4CAF50',
-                                    font=("Arial", 10, "bold")
-                                ))
-                            elif failed_count > 0:
-                                # All failed
-                                self.root.after(0, lambda: self.status_label.config(
-                                    text=f"❌ SMS failed to send to {failed_count} contact(s). Check Twilio credentials.",
-                                    fg='#FF0000',
-                                    font=("Arial", 10, "bold")
-                                ))
-                    
-                    sms_thread = threading.Thread(target=send_sms)
-                    sms_thread.daemon = True
-                    sms_thread.start()
-                except Exception as e:
-                    print(f"[SMS] Error sending SMS: {e}")
-                    self.root.after(0, lambda: self.status_label.config(
-                        text=f"❌ SMS Error: {str(e)[:50]}",
-                        fg='#FF0000'
-                    ))
-            else:
+                if not alerts and severe_count >= 1:
+                    print(f"[SMS] {video_name}: accidents already alerted within "
+                          f"{self.alert_window:.0f}s - SMS not sent again")
+                    self.status_label.config(
+                        text="ℹ️ Already alerted for this video recently - SMS not sent again",
+                        fg='#FF8800',
+                        font=("Arial", 9, "bold")
+                    )
+            elif severe_count >= 1:
                 # SMS is disabled - show warning in UI
                 sms_status = "⚠️ SMS Alerts Disabled - Twilio not configured"
                 if self.sms_alert:
@@ -764,11 +916,89 @@ class AccidentDetectionUI:
                 "Video processing complete!\n\n" + results_text
             )
     
+    def send_video_alert(self, alert, video_name, frame_count, fire_count, moderate_count, severe_count):
+        """Queue (outbox) or dispatch the SMS for a video alert; never waits on Twilio"""
+        message = format_alert(alert)
+        print(f"\n[SMS] Accident alert for {video_name}: {message}")
+        if self.alert_outbox is not None:
+            queued = self.sms_alert.queue_accident_alert(
+                self.alert_outbox,
+                video_name=video_name,
+                frame_count=frame_count,
+                fire_count=fire_count,
+                moderate_count=moderate_count,
+                severe_count=severe_count,
+                alert_key=f"video:{self.alert_session}:{alert['id']}",
+                message=message
+            )
+            if queued:
+                self.status_label.config(
+                    text=f"📤 SMS alert queued for {queued} contact(s)",
+                    fg='#4CAF50',
+                    font=("Arial", 10, "bold")
+                )
+            return
+        
+        future = self.sms_alert.dispatch_accident_alert(
+            video_name=video_name,
+            frame_count=frame_count,
+            fire_count=fire_count,
+            moderate_count=moderate_count,
+            severe_count=severe_count,
+            message=message
+        )
+        if future is not None:
+            future.add_done_callback(
+                lambda f: self.root.after(0, self.show_sms_results, f.result() if not f.exception() else [])
+            )
+    
+    def show_sms_results(self, sms_results):
+        """Show how many contacts a dispatched alert reached"""
+        success_count = sum(1 for r in sms_results if r['status'] == 'success')
+        failed_count = sum(1 for r in sms_results if r['status'] == 'failed')
+        
+        if success_count > 0:
+            sms_message = f"✅ Success! SMS sent to {success_count} contact(s)"
+            if failed_count > 0:
+                sms_message += f" (Failed: {failed_count})"
+            
+            # Get contact names
+            contact_phones = [r['phone'] for r in sms_results if r['status'] == 'success']
+            if contact_phones:
+                sms_message += f"\n📱 Sent to: {', '.join(contact_phones)}"
+            
+            self.status_label.config(
+                text=sms_message,
+                fg='#4CAF50',
+                font=("Arial", 10, "bold")
+            )
+        elif failed_count > 0:
+            # All failed
+            self.status_label.config(
+                text=f"❌ SMS failed to send to {failed_count} contact(s). Check Twilio credentials.",
+                fg='#FF0000',
+                font=("Arial", 10, "bold")
+            )
+    
+    def on_close(self):
+        """Stop live detection and shut down the SMS outbox and pool before closing"""
+        self.live_detection_active = False
+        if self.alert_outbox is not None:
+            # Unsent alerts stay in the outbox and are sent on the next start
+            self.alert_outbox.flush(timeout=5)
+            self.alert_outbox.close()
+            self.alert_outbox = None
+        if self.sms_alert is not None:
+            self.sms_alert.close(wait=False)
+        self.root.destroy()
+    
     def processing_error(self, error_msg):
         self.progress.stop()
         self.status_label.config(text="❌ Error occurred", fg='#f44336')
+        self.video_processing_active = False
         self.upload_btn.config(state=tk.NORMAL)
         self.process_btn.config(state=tk.NORMAL)
+        self.live_detection_btn.config(state=tk.NORMAL)
         messagebox.showerror("Error", error_msg)
     
     def open_output(self):